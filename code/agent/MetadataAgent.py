@@ -1,13 +1,34 @@
 import os
 import json
 import re
-import ast
+import asyncio
+import contextlib
+import contextvars
+import copy
+import functools
 import importlib
+import itertools
 import shutil
+import threading
+import time
+import weakref
 from tqdm import tqdm
 from typing import Any, Dict, List, Tuple, Union, Mapping, Callable, Literal
 
-from prompts.metadata_agent import ch_to_en_en, en_to_ch_en, generate_constant_based_on_induction_en, generate_cases_by_deduction_en, get_answer_en, check_answer_en, generate_variable_by_analogy_en, validate_variable_en
+from utils.llm_cache import LLMCache
+from utils.json_stream import IncrementalJSONExtractor
+from utils.json_extract import extract_last_complete_json
+from utils.json_repair import parse_structure, repair_json
+from utils.metadata_journal import MetadataJournal
+from utils.metadata_store import SQLiteBackend, SQLiteCaseIndex, SQLiteCaseList, get_metadata_store
+from utils.case_index import CaseIndex, NEAR_DUPLICATE_THRESHOLD
+from utils.variable_space import VariableSpace, CoverageTracker, assignment_key
+from utils.solver_registry import get_solver, get_solver_pool
+from utils.answer_structure import check_answer_structure
+from utils.verification_memo import VerificationMemo
+from utils.model_router import ModelRouter
+from models.rate_limit import backoff_delay
+from prompts.metadata_agent import ch_to_en_en, en_to_ch_en, generate_constant_based_on_induction_en, generate_cases_by_deduction_en, generate_cases_by_assignment_en, get_answer_en, check_answer_en, check_answers_batch_en, generate_variables_by_analogy_en as generate_variable_by_analogy_en, validate_variables_en as validate_variable_en
 
 # define the JSON-style data types that are accepted
 JSONType = Union[
@@ -17,11 +38,148 @@ JSONType = Union[
     str, int, float, bool, None
 ]
 
+# LLM响应缓存的默认位置，同一进程内的所有 MetadataAgent 实例共享同一个缓存对象
+LLM_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "llm_responses.sqlite3")
+_llm_caches = {}
+# 答案检查结论备忘录的默认位置，同样在进程内共享
+VERIFICATION_MEMO_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "verification_memo.sqlite3")
+_verification_memos = {}
+# 按流水线阶段选择模型的路由配置（候选模型、单价、各阶段的先验可用率）
+ROUTER_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "model_router.json")
+_model_routers = {}
+
+# storage="sqlite" 时所有元数据集共享的数据库文件（位于 metadata/ 目录下）
+METADATA_DB_NAME = "metadata.sqlite3"
+# 本地求解插件的预计算表目录（可选，例如 python -m utils.eight_puzzle --build-table agent/cache/solver_tables）
+SOLVER_TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "solver_tables")
+
+
+def get_llm_cache(path: str = LLM_CACHE_FILE) -> LLMCache:
+    """获取指定路径上的共享LLM响应缓存。"""
+    cache = _llm_caches.get(path)
+    if cache is None:
+        cache = _llm_caches.setdefault(path, LLMCache(path))
+    return cache
+
+
+_call_scope = None
+
+
+def get_call_scope_module():
+    """
+    models/call_scope.py（截止时间与取消）。provider_client 以顶层模块 call_scope 导入它（models 目录在 sys.path 中），
+    这里优先使用同一个模块对象，否则调用范围在两个模块副本之间不互通。
+    """
+    global _call_scope
+    if _call_scope is None:
+        try:
+            _call_scope = importlib.import_module("call_scope")
+        except ImportError:
+            _call_scope = importlib.import_module("models.call_scope")
+    return _call_scope
+
+
+def get_verification_memo(path: str = VERIFICATION_MEMO_FILE) -> VerificationMemo:
+    """获取指定路径上的共享答案检查结论备忘录。"""
+    memo = _verification_memos.get(path)
+    if memo is None:
+        memo = _verification_memos.setdefault(path, VerificationMemo(path))
+    return memo
+
+
+def get_model_router(path: str = ROUTER_CONFIG_FILE) -> ModelRouter:
+    """获取指定配置文件对应的共享模型路由器（同一进程内的实例共享各模型的耗时、失败与可用率统计）。"""
+    router = _model_routers.get(path)
+    if router is None:
+        router = _model_routers.setdefault(path, ModelRouter.from_config(path))
+    return router
+
+
+# 单进程内同时在途的LLM请求上限，所有 MetadataAgent 实例共享
+LLM_CONCURRENCY = 32
+# 按变量取值生成样例时，提示词中附带的已有样例数量
+CASE_PROMPT_EXAMPLES = 3
+# 批量检查答案时每个提示词中的样例数量上限，以及样例部分的字符数上限（按模型的上下文窗口调整）
+CHECK_BATCH_SIZE = 10
+CHECK_BATCH_MAX_CHARS = 24000
+# 每个事件循环一个全局信号量（asyncio.Semaphore 只能在创建它的事件循环中使用）
+_llm_semaphores = weakref.WeakKeyDictionary()
+
+
+def set_llm_concurrency(limit: int):
+    """设置单进程内同时在途的LLM请求上限，对之后新建的事件循环生效。"""
+    global LLM_CONCURRENCY
+    LLM_CONCURRENCY = limit
+    _llm_semaphores.clear()
+
+
+def get_llm_semaphore() -> asyncio.Semaphore:
+    """获取当前事件循环上的全局LLM并发信号量。"""
+    loop = asyncio.get_running_loop()
+    semaphore = _llm_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+        _llm_semaphores[loop] = semaphore
+    return semaphore
+
+
+def synchronized(method):
+    """在实例的可重入锁 self._lock 中执行方法：状态修改与持久化在线程间串行化，LLM 调用不持有该锁。"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class MetadataAgent:
-    def __init__(self, metadata_name: str, model_name: str = "glm-4-air"):
-        """初始化元数据智能体。"""
+    def __init__(self, metadata_name: str, model_name: str = "glm-4-air", llm_cache: Union[LLMCache, bool] = True, stream_responses: bool = False,
+                 near_duplicate: Literal["reject", "flag", "off"] = "reject", near_duplicate_threshold: float = NEAR_DUPLICATE_THRESHOLD,
+                 storage: Literal["json", "sqlite"] = "json", local_solver: bool = True,
+                 verification_memo: Union[VerificationMemo, bool] = True, call_timeout: float = None,
+                 router: Union[ModelRouter, bool] = False):
+        """
+        初始化元数据智能体。
+        :param llm_cache: LLM响应缓存；True 使用默认共享缓存，False/None 不使用缓存。
+        :param stream_responses: 模型支持时以流式方式请求，一旦收到包含所需键的完整JSON对象就提前结束。
+        :param near_duplicate: 生成的样例与已有样例近似重复时的处理方式：reject 丢弃，flag 保留并记录到 case_dedup_stats，off 不检测。
+        :param near_duplicate_threshold: 近似重复的相似度（MinHash 估计的 Jaccard）阈值。
+        :param storage: 存储后端：json 为 metadata/<name>.json 快照加日志；sqlite 为 metadata/metadata.sqlite3，
+                        样例按页懒加载，首次打开时自动导入同名的 JSON 文件。
+        :param local_solver: 元数据注册了本地求解插件（utils/solver_registry.py）时，答案由插件求解、答案检查由插件完成，不调用LLM。
+        :param verification_memo: 答案检查结论备忘录；True 使用默认共享备忘录，False/None 不使用。
+        :param call_timeout: 单次LLM调用（含provider层的重试）的最长秒数，超时视为该次调用失败；None 表示只受任务截止时间（见 deadline）限制。
+        :param router: 按流水线阶段选择模型（utils/model_router.py）；True 使用 agent/config/model_router.json 的共享路由器，
+                       False/None 时所有阶段都使用 model_name。
+        """
 
         self.model_name = model_name
+        self.llm_cache = get_llm_cache() if llm_cache is True else (llm_cache or None)
+        self.verification_memo = get_verification_memo() if verification_memo is True else (verification_memo or None)
+        self.stream_responses = stream_responses
+        self.call_timeout = call_timeout
+        self.router = get_model_router() if router is True else (router or None)
+        self.llm_semaphore = None # 异步调用使用的并发信号量，None 表示使用进程级全局信号量
+        self.llm_call_stats = {"calls": 0, "cache_hits": 0, "errors": 0} # 实际发出的LLM请求数、缓存命中数、请求异常数
+        self.json_repair_stats = {"attempts": 0, "repaired": 0, "failed": 0, "errors": {}, "fixes": {}} # 本地JSON修复统计，repaired 即避免的重试次数
+        self.near_duplicate = near_duplicate
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.case_dedup_stats = {"exact": 0, "near": 0, "flagged": []} # 生成阶段发现的重复样例，flagged 记录被保留的近似重复
+        self._case_index = None # 样例索引，按需创建
+        self._assignment_index = {} # 变量取值（assignment_key）-> 样例位置，按需增量更新
+        self._assignment_index_cases = None # _assignment_index 对应的样例列表
+        self._assignment_index_len = 0 # _assignment_index 已索引的样例数
+        self._assignments_attempted = set() # 本会话中已经尝试生成过的变量取值，不会重复生成
+        self.local_solver = local_solver
+        self.solver = get_solver(metadata_name, SOLVER_TABLE_DIR) if local_solver else None # 本地求解插件，None 表示使用LLM
+        self.solver_stats = {"answers": 0, "checks": 0} # 由本地插件完成（即节省了LLM调用）的答案生成和答案检查次数
+        # 答案的格式预检查：rejected 为不符合问题格式骨架、未调用LLM直接判错的次数（即节省的检查调用），
+        # regenerated 为生成样例时给出的答案不符合格式、改为单独生成答案的次数
+        self.answer_precheck_stats = {"checked": 0, "rejected": 0, "regenerated": 0}
+        # 批量检查答案：batches 为批量请求数，cases 为批量请求给出结论的样例数，fallbacks 为退回逐个检查的样例数
+        self.batch_check_stats = {"batches": 0, "cases": 0, "fallbacks": 0}
+        # 保护 metadata / constant / variable / cases、样例索引、统计信息和持久化；批量修改期间一直持有
+        self._lock = threading.RLock()
 
         # 当前文件（MetadataAgent.py）所在目录
         self.CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -29,19 +187,24 @@ class MetadataAgent:
         self.metadata_name = metadata_name # 元数据的名称
         temp_metadata_name = re.sub(r'[^a-zA-Z0-9]', '_', metadata_name).lower()
 
-        self.metadata_file = f"{self.CURRENT_DIR}/metadata/{temp_metadata_name}.json"     # 保存路径
+        self.metadata_file = f"{self.CURRENT_DIR}/metadata/{temp_metadata_name}.json"     # 保存路径（快照）
         if not os.path.exists(self.metadata_file):
             os.makedirs(os.path.dirname(self.metadata_file), exist_ok=True)
 
-        if os.path.exists(self.metadata_file):
-            try:
-                with open(self.metadata_file, "r", encoding="utf-8") as f:
-                    self.metadata = json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError) as e:
-                print(f"Warning: Failed to load {self.metadata_file}: {e}")
-                self.metadata = {}
+        if storage == "sqlite":
+            self.store = SQLiteBackend(get_metadata_store(os.path.join(self.CURRENT_DIR, "metadata", METADATA_DB_NAME)), temp_metadata_name)
+            if os.path.exists(self.metadata_file) and not self.store.load():
+                # 首次以 sqlite 打开已有的 JSON 元数据（含未压缩的日志）时导入
+                self.store.compact(MetadataJournal(self.metadata_file).load())
         else:
-            self.metadata = {} # 元数据字典
+            # 修改只追加到日志，日志过大时才压缩回快照；加载时读取快照并重放日志
+            self.store = MetadataJournal(self.metadata_file)
+        self._batch = None # 批量修改中暂存的日志记录，None 表示不在批量修改中
+        self._batch_save = False # 批量修改中是否调用过 save_metadata
+        self._batch_undo = None # 批量修改的回滚信息：开始时的样例列表、长度以及被原地修改过的样例
+        # 损坏的快照由存储层保留原文件并从备份恢复（见 self.store.recovery）；其他读取错误直接抛出，
+        # 避免以空元数据继续运行并在下次保存时覆盖原有内容
+        self.metadata = self.store.load() # 元数据字典
 
         if self.metadata:
             self.constant = self.metadata.get("constant", "")
@@ -58,86 +221,322 @@ class MetadataAgent:
             self.variable = [] # 泛化性变量列表，每个元素为字典
             self.cases = [] # 特定问题样例列表，每个元素为字典
     
-    def get_llm_response(self, prompt, model_name):
+    def get_llm_response(self, prompt, model_name, use_cache: bool = True, required_keys: List[str] = None):
         """
         直接处理LLM响应的函数
+        :param use_cache: 是否读取响应缓存；需要重新采样时传 False（新响应仍会写入缓存）。
+        :param required_keys: 流式模式下，收到包含这些键的完整JSON对象后立即结束请求。
         """
-        model_name_str = re.sub(r'[^a-zA-Z0-9]', '_', model_name).lower()
+        cached = self._get_cached_response(prompt, model_name, use_cache)
+        if cached is not None:
+            self._count_llm_call("cache_hits")
+            return cached
+        call_scope = get_call_scope_module()
+        call_scope.check_current()
+        self._count_llm_call("calls")
+        start = time.perf_counter()
         try:
-            model_module = importlib.import_module(f"models.{model_name_str}")
-            return model_module.llm_response(prompt)
+            model_module = self._load_model_module(model_name)
+            with self._llm_call_scope():
+                if self.stream_responses and hasattr(model_module, "llm_response_stream"):
+                    response = self._call_in_scope(self._stream_llm_response, model_module, prompt, required_keys)
+                else:
+                    response = self._call_in_scope(model_module.llm_response, prompt)
         except Exception as e:
+            if isinstance(e, (TimeoutError, call_scope.CallCancelled)):
+                call_scope.check_current()  # 任务的截止时间已到或任务被取消时向上抛出，否则只是本次调用超时
             print(f"Error in get_llm_response: {e}")
+            self._count_llm_call("errors")
+            self._record_model_call(model_name, start, None)
             return None
-    
-    def extract_last_complete_json(self, text: str):
+        self._record_model_call(model_name, start, response)
+        self._put_cached_response(prompt, model_name, response)
+        return response
+
+    async def get_llm_response_async(self, prompt, model_name, use_cache: bool = True, required_keys: List[str] = None):
+        """
+        get_llm_response 的异步版本，受全局并发信号量限制。
+        模型模块提供 llm_response_async 时直接使用，否则在线程池中执行 llm_response。
+        """
+        cached = self._get_cached_response(prompt, model_name, use_cache)
+        if cached is not None:
+            self._count_llm_call("cache_hits")
+            return cached
+        call_scope = get_call_scope_module()
+        call_scope.check_current()
+        self._count_llm_call("calls")
+        semaphore = self.llm_semaphore or get_llm_semaphore()
+
+        async def request(model_module):
+            async with semaphore:
+                if self.stream_responses and hasattr(model_module, "llm_response_stream"):
+                    return await asyncio.to_thread(self._stream_llm_response, model_module, prompt, required_keys)
+                if hasattr(model_module, "llm_response_async"):
+                    return await model_module.llm_response_async(prompt)
+                return await asyncio.to_thread(model_module.llm_response, prompt)
+
+        start = time.perf_counter()
+        try:
+            model_module = self._load_model_module(model_name)
+            with self._llm_call_scope():
+                # 等待并发名额的时间也计入；超时后取消请求（run_async 会通知I/O线程中的请求停止）
+                scope = call_scope.current_scope()
+                response = await asyncio.wait_for(request(model_module), None if scope is None else scope.remaining())
+        except Exception as e:
+            if isinstance(e, (TimeoutError, call_scope.CallCancelled)):
+                call_scope.check_current()
+            print(f"Error in get_llm_response_async: {e}")
+            self._count_llm_call("errors")
+            self._record_model_call(model_name, start, None)
+            return None
+        self._record_model_call(model_name, start, response)
+        self._put_cached_response(prompt, model_name, response)
+        return response
+
+    def deadline(self, timeout: float = None):
+        """
+        任务级的截止时间与取消：
+            with agent.deadline(600) as scope:
+                agent.generate_cases_by_deduction(3)
+        范围内的全部LLM调用（包括生成→答案→检查的各层重试、异步链路和I/O线程中的请求）共享同一个截止时间，
+        到期后正在进行的调用立即返回，并抛出 DeadlineExceeded（TimeoutError 的子类）；
+        在其他线程中调用 scope.cancel() 会以 CallCancelled 中止。范围可以嵌套，截止时间取较早的一个。
+        :param timeout: 最长秒数，None 表示不限时间（仍可取消）。
+        """
+        return get_call_scope_module().call_scope(timeout)
+
+    def _llm_call_scope(self):
+        """单次LLM调用的范围：设置了 call_timeout 时新建一个内层范围，否则沿用当前范围。"""
+        if self.call_timeout is None:
+            return contextlib.nullcontext()
+        return get_call_scope_module().call_scope(self.call_timeout)
+
+    def _call_in_scope(self, func, *args):
         """
-        提取文本中的最后一个完整的JSON对象
+        执行阻塞的模型调用。处于调用范围中时在守护线程中执行并等待，范围被取消或到期时立即返回
+        （阻塞的 socket 读取无法从外部中断，线程中的请求在下一个检查点停止，每次尝试的超时也不超过剩余时间）。
         """
-        _CODE_BLOCK_RE = re.compile(r"```json\s*(.*?)\s*```", re.S)
+        call_scope = get_call_scope_module()
+        scope = call_scope.current_scope()
+        if scope is None:
+            return func(*args)
+        result = {}
+        # 线程中的请求使用一个内层范围，放弃等待时只取消它，不影响当前范围的其他调用
+        worker_scope = call_scope.CallScope(parent=scope)
+        context = contextvars.copy_context()
+        context.run(call_scope.set_current_scope, worker_scope)
 
-        def _try_load(blob: str):
+        def target():
             try:
-                return json.loads(blob)
-            except json.JSONDecodeError:
+                result["value"] = context.run(func, *args)
+            except BaseException as e:
+                result["error"] = e
+
+        thread = threading.Thread(target=target, daemon=True, name="llm-call")
+        thread.start()
+        try:
+            while thread.is_alive():
+                thread.join(scope.clip(0.1))
+                scope.check()
+        except BaseException:
+            worker_scope.cancel()
+            raise
+        if "error" in result:
+            raise result["error"]
+        return result["value"]
+
+    def _sleep(self, seconds: float):
+        """重试前的等待，在调用范围内可被取消。"""
+        get_call_scope_module().sleep(seconds)
+
+    def _choose_model(self, stage: str, prompt: str, exclude=()) -> str:
+        """
+        为一次调用选择模型：使用路由器时按阶段选择，否则为 model_name。
+        :param exclude: 本次请求中已经失败的模型。
+        """
+        if self.router is None or stage is None:
+            return self.model_name
+        return self.router.choose(stage, len(prompt), exclude)
+
+    def _record_model_call(self, model_name: str, start: float, response):
+        """向路由器报告一次实际发出的请求的耗时与是否失败（模型模块返回None也视为失败）。"""
+        if self.router is not None:
+            self.router.record_call(model_name, time.perf_counter() - start, response is None)
+
+    def _record_stage_result(self, stage: str, model_name: str, accepted: bool):
+        """向路由器报告一次调用的结果在该阶段是否可用。"""
+        if self.router is not None and stage is not None:
+            self.router.record_result(stage, model_name, accepted)
+
+    def _count_llm_call(self, key: str):
+        with self._lock:
+            self.llm_call_stats[key] += 1
+
+    def _stream_llm_response(self, model_module, prompt, required_keys: List[str] = None):
+        """
+        流式读取响应，一旦出现包含 required_keys 的完整JSON对象就关闭流，返回截至该对象结尾的文本。
+        """
+        extractor = IncrementalJSONExtractor(required_keys)
+        stream = model_module.llm_response_stream(prompt)
+        try:
+            for chunk in stream:
+                if extractor.feed(chunk) is not None:
+                    break
+        finally:
+            stream.close()  # 提前结束时关闭连接，服务端不再继续生成
+        return extractor.text.strip() or None
+
+    def _get_cached_response(self, prompt, model_name, use_cache: bool = True):
+        if not use_cache or self.llm_cache is None:
+            return None
+        return self.llm_cache.get(model_name, [{"role": "user", "content": prompt}])
+
+    def _put_cached_response(self, prompt, model_name, response):
+        if response and self.llm_cache is not None:
+            self.llm_cache.put(model_name, [{"role": "user", "content": prompt}], response)
+
+    def _load_model_module(self, model_name):
+        """根据模型名称导入 models 下对应的模块。"""
+        model_name_str = re.sub(r'[^a-zA-Z0-9]', '_', model_name).lower()
+        return importlib.import_module(f"models.{model_name_str}")
+
+    def _request_json(self, prompt, required_key: str, desc: str = None, fail_message: str = None, attempts: int = 10, validate: Callable[[dict], bool] = None,
+                      stage: str = None, return_model: bool = False):
+        """
+        调用LLM并提取包含 required_key 的JSON对象，失败时重试。
+        :param prompt: 提示词。
+        :param required_key: 结果中必须存在（且不为None）的键。
+        :param desc: 进度条描述，为None时不显示进度条。
+        :param fail_message: 每次失败时打印的信息，为None时不打印。
+        :param attempts: 最多尝试次数。
+        :param validate: 额外的校验函数，返回False时视为失败。
+        :param stage: 流水线阶段（见 utils/model_router.py），使用路由器时据此选择模型，请求失败时换用其他候选模型。
+        :param return_model: 为True时返回 (JSON对象, 给出该结果的模型)，全部失败时为 (None, None)。
+        :return: 提取到的JSON对象，全部失败时返回None。
+        """
+        failed = set()
+        for i in (tqdm(range(attempts), desc=desc) if desc else range(attempts)):
+            model_name = self._choose_model(stage, prompt, failed)
+            # 只有第一次尝试读取缓存，重试时需要重新采样
+            response = self.get_llm_response(prompt, model_name, use_cache=(i == 0), required_keys=[required_key])
+            result = self._accept_json(response, required_key, validate)
+            self._record_stage_result(stage, model_name, result is not None)
+            if response is None:
+                failed.add(model_name)
+            if result is not None:
+                return (result, model_name) if return_model else result
+            if fail_message:
+                print(f"{fail_message}，尝试第{i+1}次")
+            if i + 1 < attempts:
+                delay = self._retry_delay(i, response)
+                if delay is None:
+                    break
+                self._sleep(delay)
+        return (None, None) if return_model else None
+
+    async def _request_json_async(self, prompt, required_key: str, desc: str = None, fail_message: str = None, attempts: int = 10, validate: Callable[[dict], bool] = None,
+                                  stage: str = None, return_model: bool = False):
+        """_request_json 的异步版本。"""
+        failed = set()
+        for i in (tqdm(range(attempts), desc=desc) if desc else range(attempts)):
+            model_name = self._choose_model(stage, prompt, failed)
+            response = await self.get_llm_response_async(prompt, model_name, use_cache=(i == 0), required_keys=[required_key])
+            result = self._accept_json(response, required_key, validate)
+            self._record_stage_result(stage, model_name, result is not None)
+            if response is None:
+                failed.add(model_name)
+            if result is not None:
+                return (result, model_name) if return_model else result
+            if fail_message:
+                print(f"{fail_message}，尝试第{i+1}次")
+            if i + 1 < attempts:
+                delay = self._retry_delay(i, response)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+        return (None, None) if return_model else None
+
+    def get_provider_client(self):
+        """
+        返回模型模块共用的 provider_client（限流、重试预算、对冲请求与耗时统计的配置入口）。
+        模型模块加载后 provider_client 才可导入。
+        """
+        self._load_model_module(self.model_name)
+        return importlib.import_module("provider_client")
+
+    def _retry_delay(self, attempt: int, response):
+        """
+        一次尝试失败后的等待时间。响应为None说明请求本身失败（provider层已按退避重试过），
+        此时消耗进程级重试预算并退避；只是内容不合格时立即重试。
+        :return: 等待秒数，重试预算耗尽时返回None。
+        """
+        scope = get_call_scope_module().current_scope()
+        if scope is not None:
+            scope.check()
+        if response is not None:
+            return 0.0
+        if not self.get_provider_client().get_retry_budget().try_spend():
+            print("重试预算已耗尽，放弃本次请求")
+            return None
+        delay = backoff_delay(attempt)
+        if scope is not None and scope.remaining() is not None and delay >= scope.remaining():
+            raise get_call_scope_module().DeadlineExceeded("退避等待会超过截止时间")
+        return delay
+
+    def _accept_json(self, response, required_key: str, validate: Callable[[dict], bool] = None):
+        """从LLM响应中提取JSON对象，不满足要求时返回None。严格解析失败时先在本地修复格式，再交给调用方重试。"""
+        if not response:
+            return None
+        result = self.extract_last_complete_json(response)
+        if not isinstance(result, dict) or result.get(required_key, None) is None:
+            result = self._repair_json(response, required_key)
+            if result is None:
                 return None
+        if validate is not None and not validate(result):
+            return None
+        return result
 
-        # ---------- 1) 先看 ```json``` 代码块 ----------
-        for block in reversed(_CODE_BLOCK_RE.findall(text)):
-            obj = _try_load(block)
-            if obj is not None:
-                return obj                    # 嵌套无限制
-
-        # ---------- 2) 从后往前定位 {...} ----------
-        dec = json.JSONDecoder()
-        i = len(text)                         # 右端游标
-        depth = 0
-        in_string = False
-        escape = False
-
-        # 反向扫描，找到最外层 '{' 对应的索引 start
-        for i in range(len(text) - 1, -1, -1):
-            ch = text[i]
-
-            # 维护 in_string / escape 状态，忽略字符串内部的大括号
-            if in_string:
-                escape = (ch == '\\') and not escape
-                if ch == '"' and not escape:
-                    in_string = False
-                continue
-            else:
-                if ch == '"':
-                    in_string = True
-                    continue
-
-            if ch == '}':
-                depth += 1
-            elif ch == '{':
-                depth -= 1
-                if depth == 0:                # 找到闭合
-                    candidate = text[i:]
-                    obj = _try_load(candidate)
-                    if obj is not None:
-                        return obj            # 支持任意嵌套
-                    # 否则继续向左找上一层可能的 '{'
+    def _repair_json(self, response: str, required_key: str):
+        """本地修复近似合法的JSON（尾随逗号、单引号、未转义换行、None/True等），并记录修复统计。"""
+        result, info = repair_json(response, [required_key])
+        with self._lock:
+            stats = self.json_repair_stats
+            stats["attempts"] += 1
+            if result is None:
+                stats["failed"] += 1
+                return None
+            stats["repaired"] += 1  # 每次成功修复都省下一次LLM重试
+            for name in info["errors"]:
+                stats["errors"][name] = stats["errors"].get(name, 0) + 1
+            for name in info["fixes"]:
+                stats["fixes"][name] = stats["fixes"].get(name, 0) + 1
+        return result
 
-        return None
+    def extract_last_complete_json(self, text: str):
+        """
+        提取文本中的最后一个完整的JSON对象（实现见 utils/json_extract.py）
+        """
+        return extract_last_complete_json(text)
 
     def ch_to_en(self, text: str):
         """
         将中文翻译为英文
         """
         prompt = ch_to_en_en.format(text=text)
-        for _ in range(5):  # 最多尝试5次，避免死循环
-            response = self.get_llm_response(prompt, self.model_name)
-            if not response:
-                continue
-            extracted_json = self.extract_last_complete_json(response)
-            if not extracted_json:
-                continue
-            en_text = extracted_json.get("en")
-            if en_text:
-                return en_text
+        # 最多尝试5次，避免死循环
+        extracted_json = self._request_json(prompt, "en", attempts=5, validate=lambda r: bool(r.get("en")), stage="translate")
+        if extracted_json is not None:
+            return extracted_json["en"]
+        raise RuntimeError("翻译失败：无法从LLM响应中提取英文内容。")
+
+    async def ch_to_en_async(self, text: str):
+        """
+        ch_to_en 的异步版本
+        """
+        prompt = ch_to_en_en.format(text=text)
+        extracted_json = await self._request_json_async(prompt, "en", attempts=5, validate=lambda r: bool(r.get("en")), stage="translate")
+        if extracted_json is not None:
+            return extracted_json["en"]
         raise RuntimeError("翻译失败：无法从LLM响应中提取英文内容。")
     
     def en_to_ch(self, text: str):
@@ -145,45 +544,53 @@ class MetadataAgent:
         将英文转换为中文
         """
         prompt = en_to_ch_en.format(text=text)
-        for _ in range(5):  # 最多尝试5次，避免死循环
-            response = self.get_llm_response(prompt, self.model_name)
-            if not response:
-                continue
-            extracted_json = self.extract_last_complete_json(response)
-            if not extracted_json:
-                continue
-            ch_text = extracted_json.get("ch")
-            if ch_text:
-                return ch_text
+        # 最多尝试5次，避免死循环
+        extracted_json = self._request_json(prompt, "ch", attempts=5, validate=lambda r: bool(r.get("ch")), stage="translate")
+        if extracted_json is not None:
+            return extracted_json["ch"]
+        raise RuntimeError("翻译失败：无法从LLM响应中提取中文内容。")
+
+    async def en_to_ch_async(self, text: str):
+        """
+        en_to_ch 的异步版本
+        """
+        prompt = en_to_ch_en.format(text=text)
+        extracted_json = await self._request_json_async(prompt, "ch", attempts=5, validate=lambda r: bool(r.get("ch")), stage="translate")
+        if extracted_json is not None:
+            return extracted_json["ch"]
         raise RuntimeError("翻译失败：无法从LLM响应中提取中文内容。")
 
+    @synchronized
     def set_metadata_name(self, metadata_name: str):
         """设置元数据的名称。"""
+        if self._batch is not None:
+            raise RuntimeError("批量修改中不能重命名元数据")
         self.metadata_name = metadata_name
         self.metadata["metadata_name"] = metadata_name
+        self._log_set("metadata_name")
         temp_metadata_name = re.sub(r'[^a-zA-Z0-9]', '_', metadata_name).lower()
-        # 将旧的文件重命名
-        if os.path.exists(self.metadata_file):
-            os.rename(self.metadata_file, f"{self.CURRENT_DIR}/metadata/{temp_metadata_name}.json")
+        # 先把修改全部写回，再将旧的元数据重命名
+        self._adopt(self.store.rename(temp_metadata_name, self.metadata))
         self.metadata_file = f"{self.CURRENT_DIR}/metadata/{temp_metadata_name}.json"     # 保存路径
-
-        self.save_metadata()
+        self.solver = get_solver(metadata_name, SOLVER_TABLE_DIR) if self.local_solver else None
     
     def get_metadata_name(self):
         """获取元数据的名称。"""
         return self.metadata_name
 
+    @synchronized
     def set_constant(self, constant: str):
         """设置元数据的基本常量描述。"""
         if constant != self.constant:
             self.constant = constant
             self.metadata["constant"] = constant
-            self.save_metadata()
+            self._log_set("constant")
     
     def get_constant(self):
         """获取元数据的基本常量描述。"""
         return self.constant
     
+    @synchronized
     def add_variable(self, name: str, description: str, min_value, max_value, step, variant=None):
         """添加一个泛化性变量。"""
         if min_value is None or max_value is None or step is None:
@@ -201,15 +608,16 @@ class MetadataAgent:
             param_info["variant"] = variant  # 如果提供了变体信息，则添加该字段
         
         # 如果变量列表中已经存在该变量，则更新该变量
-        for param in self.variable:
+        for index, param in enumerate(self.variable):
             if param["name"] == name:
                 param.update(param_info)  # 使用update方法一次性更新所有字段
                 break
         else:
             self.variable.append(param_info)
+            index = len(self.variable) - 1
         
         self.metadata["variable"] = self.variable
-        self.save_metadata()
+        self._log_set_item("variable", index)
     
     def add_variable_by_dict(self, param_info: dict):
         """添加一个泛化性变量。"""
@@ -217,68 +625,247 @@ class MetadataAgent:
     
     def add_variable_by_list(self, param_info_list: list):
         """添加多个泛化性变量。"""
-        for param_info in param_info_list:
-            self.add_variable_by_dict(param_info)
+        with self.batch():
+            for param_info in param_info_list:
+                self.add_variable_by_dict(param_info)
     
+    @synchronized
     def set_variable(self, variable: list):
         """设置元数据的泛化性变量列表。"""
         self.variable = variable
         self.metadata["variable"] = self.variable
-        self.save_metadata()
+        self._log_set("variable")
     
     def get_variable(self):
         """获取元数据的泛化性变量列表。"""
         return self.variable
+
+    @synchronized
+    def get_variable_space(self) -> VariableSpace:
+        """当前泛化性变量（min / max / step）张成的参数空间，用于枚举和采样变量取值。"""
+        return VariableSpace(copy.deepcopy(self.variable))
+
+    @synchronized
+    def get_variable_coverage(self, bins: int = None) -> CoverageTracker:
+        """
+        统计已有样例对参数空间的覆盖情况（只统计记录了变量取值 "variables" 的样例）。
+        :param bins: 覆盖率单元格中每个变量最多划分的段数，默认见 utils/variable_space.py。
+        """
+        space = self.get_variable_space()
+        tracker = CoverageTracker(space) if bins is None else CoverageTracker(space, bins=bins)
+        tracker.add_assignments([json.loads(key) for key in self.get_assignment_index()])
+        return tracker
+
+    @synchronized
+    def get_assignment_index(self) -> Dict[str, int]:
+        """变量取值（assignment_key）→ 第一个使用该取值的样例位置；样例列表只追加时增量更新。"""
+        if self._assignment_index_cases is not self.cases or len(self.cases) < self._assignment_index_len:
+            self._assignment_index, self._assignment_index_cases, self._assignment_index_len = {}, self.cases, 0
+        start = self._assignment_index_len
+        new_cases = self.cases.iter_from(start) if isinstance(self.cases, SQLiteCaseList) else itertools.islice(self.cases, start, None)
+        for position, case in enumerate(new_cases, start):
+            if isinstance(case.get("variables"), dict):
+                self._assignment_index.setdefault(assignment_key(case["variables"]), position)
+        self._assignment_index_len = len(self.cases)
+        return self._assignment_index
     
-    def add_case(self, metadata, question, answer):
-        """添加一个具体的元数据样例。"""
+    @synchronized
+    def add_case(self, metadata, question, answer, variables: dict = None):
+        """
+        添加一个具体的元数据样例。
+        :param variables: 样例对应的泛化性变量取值，记录在样例的 "variables" 键中。
+        """
         case = {"metadata": metadata, "question": question, "answer": answer}
+        if variables is not None:
+            case["variables"] = variables
         
-        # 如果样例列表中已经存在该样例，则更新该样例
-        for ex in self.cases:
-            if ex["metadata"] == metadata and ex["question"] == question:
-                if ex["answer"] == answer:
-                    return
-                else:
-                    ex.update(case)
-                    break
-    
-        self.cases.append(case)    
+        # 如果样例列表中已经存在该样例（规范化后相同），则更新该样例
+        index = self.get_case_index().find(metadata, question)
+        if index is not None:
+            ex = self.cases[index]
+            if ex["answer"] == answer:
+                return
+            self._touch_case(index)
+            ex.update(case)
+        else:
+            self.cases.append(case)
+            index = len(self.cases) - 1
         self.metadata["cases"] = self.cases
-        self.save_metadata()
+        self._log_set_item("cases", index)
     
     def add_case_by_dict(self, case_info: dict):
         """添加一个具体的元数据样例。"""
-        self.add_case(case_info["metadata"], case_info["question"], case_info["answer"])
+        self.add_case(case_info["metadata"], case_info["question"], case_info["answer"], case_info.get("variables", None))
     
     def add_case_by_list(self, case_info_list: list):
         """添加多个具体的元数据样例。"""
-        for case_info in case_info_list:
-            self.add_case_by_dict(case_info)
+        with self.batch():
+            for case_info in case_info_list:
+                self.add_case_by_dict(case_info)
             
     def get_cases(self):
         """获取元数据的样例列表。"""
         return self.cases
+
+    @synchronized
+    def get_case_index(self) -> CaseIndex:
+        """获取当前样例列表的索引（样例列表被整体替换时重新创建）。"""
+        if self._case_index is None or self._case_index.cases is not self.cases:
+            index_class = SQLiteCaseIndex if isinstance(self.cases, SQLiteCaseList) else CaseIndex
+            self._case_index = index_class(self.cases, threshold=self.near_duplicate_threshold)
+        return self._case_index
+
+    @synchronized
+    def _screen_case(self, new_case: dict, near: bool = True) -> bool:
+        """
+        在生成答案、检查答案之前筛查新样例：与已有样例重复时丢弃；近似重复时按 near_duplicate 丢弃或标记。
+        :param near: 是否检测近似重复（按变量取值生成的样例只检测完全重复）。
+        :return: 是否继续处理该样例。
+        """
+        index = self.get_case_index()
+        metadata, question = new_case.get("metadata", ""), new_case.get("question", "")
+        if index.find(metadata, question) is not None:
+            self.case_dedup_stats["exact"] += 1
+            print("生成的样例与已有样例重复，丢弃")
+            return False
+        if self.near_duplicate == "off" or not near:
+            return True
+        similar = index.find_similar(metadata, question)
+        if similar is None:
+            return True
+        similar_index, score = similar
+        self.case_dedup_stats["near"] += 1
+        if self.near_duplicate == "reject":
+            print(f"生成的样例与第{similar_index+1}个样例近似重复（相似度{score:.2f}），丢弃")
+            return False
+        print(f"Warning: 生成的样例与第{similar_index+1}个样例近似重复（相似度{score:.2f}）")
+        self.case_dedup_stats["flagged"].append({"metadata": metadata, "question": question, "similar_to": similar_index, "similarity": score})
+        return True
     
+    @synchronized
     def set_cases(self, cases: list):
         """设置元数据的样例列表。"""
+        if self._case_index is not None and self._case_index.cases is cases:
+            # 传入的是原地修改过的同一个列表，索引中的键可能已经过时
+            self._case_index.rebuild()
         self.cases = cases
         self.metadata["cases"] = self.cases
-        self.save_metadata()
+        self._log_set("cases")
+
+    @synchronized
+    def update_case(self, index: int, changes: dict = None):
+        """
+        修改第 index 个样例：更新样例索引，并只把该样例追加到日志。
+        :param changes: 要写入该样例的字段；批量修改中原地修改样例应通过此参数进行，回滚时才能还原。
+        """
+        if changes:
+            self._touch_case(index)
+            self.cases[index].update(changes)
+        if self._case_index is not None and self._case_index.cases is self.cases:
+            self._case_index.update(index)
+        self.metadata["cases"] = self.cases
+        self._log_set_item("cases", index)
     
+    @synchronized
     def save_metadata(self):
-        """保存元数据到 JSON 文件。"""
-        with open(self.metadata_file, "w", encoding="utf-8") as f:
-            json.dump(self.metadata, f, ensure_ascii=False, indent=4)
+        """保存元数据到 JSON 文件（压缩日志：写入完整快照并清空日志）。批量修改中推迟到提交时执行。"""
+        if self._batch is not None:
+            self._batch_save = True
+            return
+        self._adopt(self.store.compact(self.metadata))
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        批量修改：期间的修改只保存在内存中，正常退出时合并为一条日志记录一次性写入；
+        发生异常时回滚内存中的修改，不写入任何内容。可以嵌套，只有最外层提交。
+        多线程共享同一实例时，批量修改期间其他线程的修改会等待其提交或回滚。
+        用法：
+            with agent.batch():
+                agent.add_case(...)
+                agent.set_constant(...)
+        """
+        # 批量修改期间持有实例锁，其他线程的修改在提交（或回滚）之后进行，不会被混入本次批量修改
+        with self._lock:
+            if self._batch is not None:
+                yield self
+                return
+
+            # 不复制整个样例列表：只记录列表长度，样例在第一次被原地修改前才复制（见 _touch_case）
+            saved = (dict(self.metadata), self.metadata_name, self.constant, copy.deepcopy(self.variable))
+            cases = copy.deepcopy(self.cases) if isinstance(self.cases, SQLiteCaseList) else self.cases
+            self._batch_undo = {"cases": self.cases, "length": len(self.cases), "items": {}}
+            self._batch = []
+            self._batch_save = False
+            try:
+                yield self
+            except BaseException:
+                self._rollback_batch(saved, cases)
+                raise
+            finally:
+                self._batch_undo = None
+
+            records, self._batch = self._batch, None
+            # 记录引用的是内存中的对象，提交时序列化的就是最终值
+            self._adopt(self.store.append_batch(records, self.metadata))
+            if self._batch_save:
+                self.save_metadata()
+
+    def _log_set(self, key: str):
+        """把 self.metadata[key] 的当前值追加到日志（批量修改中先暂存）。"""
+        self._log({"op": "set", "key": key, "value": self.metadata[key]})
+
+    def _touch_case(self, index: int):
+        """批量修改中第 index 个样例即将被原地修改：第一次修改前复制原样例，回滚时还原。"""
+        undo = self._batch_undo
+        if undo is None or undo["cases"] is not self.cases or index >= undo["length"] or index in undo["items"]:
+            return
+        undo["items"][index] = copy.deepcopy(self.cases[index])
+
+    def _rollback_batch(self, saved: tuple, cases):
+        """回滚批量修改：还原元数据的各个字段，截掉新追加的样例，并还原被原地修改过的样例。"""
+        undo = self._batch_undo
+        if not isinstance(cases, SQLiteCaseList):
+            del cases[undo["length"]:]
+            for index, case in undo["items"].items():
+                cases[index] = case
+            if self._case_index is not None and self._case_index.cases is cases:
+                self._case_index.rebuild()
+        self.metadata, self.metadata_name, self.constant, self.variable = saved
+        self.metadata["variable"] = self.variable
+        self.metadata["cases"] = self.cases = cases
+        # 样例列表被截短后又追加到相同长度时，增量的取值索引无法察觉，直接作废
+        self._assignment_index_cases = None
+        self._batch = None
+
+    def _log_set_item(self, key: str, index: int):
+        """把 self.metadata[key][index] 的当前值追加到日志（批量修改中先暂存）。"""
+        self._log({"op": "set_item", "key": key, "index": index, "value": self.metadata[key][index]})
+
+    def _log(self, record: dict):
+        if self._batch is not None:
+            self._batch.append(record)
+        else:
+            self._adopt(self.store.append(record, self.metadata))
+
+    def _adopt(self, metadata: dict):
+        """存储层合并了其他进程的修改时，改用合并后的元数据（None 表示没有其他修改）。"""
+        if metadata is None:
+            return
+        self.metadata = metadata
+        self.constant = metadata.get("constant", "")
+        self.variable = metadata.get("variable", [])
+        self.cases = metadata.get("cases", [])
 
     def get_metadata(self):
         """获取元数据。"""
         return self.metadata
     
+    @synchronized
     def add_key_value(self, key: str, value):
         """添加一个键值对。"""
         self.metadata[key] = value
-        self.save_metadata()
+        self._log_set(key)
 
     def collect_metadata(self, url: str):
         """从指定网页收集元数据，模拟网页解析。更新基础常量、变量列表和样例列表。"""
@@ -378,81 +965,316 @@ class MetadataAgent:
         :param extra_other_info: 额外其他信息。
         :return: 新常量。
         """
-        new_constant_prompt = generate_constant_based_on_induction_en.format(metadata_name=self.metadata_name, his_constant=self.constant, his_case=self.cases, reference_constant=extra_constant, reference_case=extra_case, reference_other_info=extra_other_info)
+        new_constant_prompt = self._build_constant_prompt(extra_constant, extra_case, extra_other_info)
+        response = self._request_json(new_constant_prompt, "metadata_constant", desc="Generate new constant", fail_message="生成新常量失败", stage="induction")
+        return self._apply_new_constant(response)
 
-        new_constant = None
-        for i in tqdm(range(10), desc="Generate new constant"):
-            response = self.get_llm_response(new_constant_prompt, self.model_name)
-            new_constant = self.extract_last_complete_json(response)
-            if new_constant is not None and new_constant.get("metadata_constant", None) is not None:
-                new_constant = new_constant["metadata_constant"]
-                break
-            else:
-                print(f"生成新常量失败，尝试第{i+1}次")
-                continue
-        
-        if new_constant is None:
-            print("生成新常量失败")
-        else:
-            self.set_constant(new_constant)
+    async def generate_constant_based_on_induction_async(self, extra_constant: str = None, extra_case: list = None, extra_other_info: dict = None):
+        """
+        generate_constant_based_on_induction 的异步版本。
+        """
+        new_constant_prompt = self._build_constant_prompt(extra_constant, extra_case, extra_other_info)
+        response = await self._request_json_async(new_constant_prompt, "metadata_constant", desc="Generate new constant", fail_message="生成新常量失败", stage="induction")
+        return self._apply_new_constant(response)
 
+    def _build_constant_prompt(self, extra_constant: str = None, extra_case: list = None, extra_other_info: dict = None):
+        return generate_constant_based_on_induction_en.format(metadata_name=self.metadata_name, his_constant=self.constant, his_example=self.cases, reference_constant=extra_constant, reference_example=extra_case, reference_other_info=extra_other_info)
+
+    def _apply_new_constant(self, response):
+        if response is None:
+            print("生成新常量失败")
+            return None
+        new_constant = response["metadata_constant"]
+        self.set_constant(new_constant)
         return new_constant
     
     def generate_cases_by_deduction(self, case_nums:int = 3,
-    extra_constant: str = None, extra_case: list = None, extra_other_info: dict = None):
+    extra_constant: str = None, extra_case: list = None, extra_other_info: dict = None, parallel: int = 1):
         """
         根据推理生成新的样例。
         :param case_nums: 生成样例的数量, 默认3个。
         :param extra_constant: 额外常量。
         :param extra_case: 额外样例。
         :param extra_other_info: 额外其他信息。
+        :param parallel: 同时进行的候选生成链路数量，大于1时并行生成（见 generate_cases_by_deduction_async）。
         :return: 新的样例。
         """
+        if parallel > 1:
+            return asyncio.run(self.generate_cases_by_deduction_async(case_nums, extra_constant, extra_case, extra_other_info, parallel=parallel))
         
         if extra_case is not None:
             self.add_case_by_list(extra_case)
         if len(self.cases) >= case_nums:
             return self.cases[:case_nums]
 
+        use_cache = True
         while len(self.cases) < case_nums:
-            new_case = self._generate_cases_by_deduction(extra_constant=extra_constant, extra_other_info=extra_other_info)
+            old_case_nums = len(self.cases)
+            new_case = self._generate_cases_by_deduction(extra_constant=extra_constant, extra_other_info=extra_other_info, use_cache=use_cache)
             if new_case is not None:
                 self.add_case_by_dict(new_case)
+            # 没有新增样例时，同一提示词的缓存响应只会得到同样的结果，下一轮需要重新采样
+            use_cache = len(self.cases) > old_case_nums
+        return self.cases
+
+    async def generate_cases_by_deduction_async(self, case_nums:int = 3,
+    extra_constant: str = None, extra_case: list = None, extra_other_info: dict = None, parallel: int = 1):
+        """
+        generate_cases_by_deduction 的异步版本。
+        :param parallel: 同时进行的候选生成链路（生成→答案→检查）数量。每条链路结束后立即补上一条，
+                         通过的样例经 add_case 去重后加入；达到 case_nums 后取消其余链路。
+        """
+        if extra_case is not None:
+            self.add_case_by_list(extra_case)
+        if len(self.cases) >= case_nums:
+            return self.cases[:case_nums]
+
+        async for _ in self.stream_cases_by_deduction_async(case_nums - len(self.cases), extra_constant, extra_other_info, parallel=parallel):
+            pass
         return self.cases
 
-    def _generate_cases_by_deduction(self, extra_constant: str = None, extra_other_info: dict = None):
+    async def stream_cases_by_deduction_async(self, case_nums: int = None, extra_constant: str = None, extra_other_info: dict = None, parallel: int = 1):
+        """
+        逐个产出新样例的异步迭代器：每个样例通过答案检查、加入样例列表后立即产出，不必等全部生成完。
+        生成在迭代器内部推进：消费方处理得慢时不会启动新的链路，在途的链路最多 parallel 条，已完成的结果不会堆积；
+        消费方提前结束迭代（break / aclose）或被取消时，取消仍在进行的链路及其LLM请求
+        （模型模块提供 llm_response_async 时请求随之中断；在线程池中执行的同步请求会跑完，但结果被丢弃）。
+        :param case_nums: 产出的新样例数量，None 表示一直生成，直到消费方停止迭代。
+        :param parallel: 同时进行的候选生成链路（生成→答案→检查）数量。
+        """
+        produced = 0
+        use_cache = True
+        chains = set()
+        try:
+            while case_nums is None or produced < case_nums:
+                limit = parallel if case_nums is None else min(parallel, case_nums - produced)
+                while len(chains) < limit:
+                    # 新链路使用最新的样例构造提示词；提示词没有变化时只有第一条链路读取缓存，其余链路需要重新采样
+                    chains.add(asyncio.ensure_future(self._generate_cases_by_deduction_async(extra_constant=extra_constant, extra_other_info=extra_other_info, use_cache=use_cache)))
+                    use_cache = False
+                done, chains = await asyncio.wait(chains, return_when=asyncio.FIRST_COMPLETED)
+                for chain in done:
+                    new_case = chain.result()
+                    if new_case is None or (case_nums is not None and produced >= case_nums):
+                        continue
+                    if self._add_generated_case(new_case):
+                        produced += 1
+                        use_cache = True
+                        yield new_case
+        finally:
+            # 已经达到数量、消费方停止迭代或出错时取消仍在进行的链路
+            for chain in chains:
+                chain.cancel()
+            if chains:
+                await asyncio.gather(*chains, return_exceptions=True)
+
+    def iter_cases_by_deduction(self, case_nums: int = None, extra_constant: str = None, extra_other_info: dict = None, parallel: int = 1):
+        """
+        stream_cases_by_deduction_async 的同步迭代器版本，在专用的事件循环中推进生成。
+        两次取值之间事件循环不运行，生成完全暂停；提前结束迭代（或 close）时取消在途的链路。
+        """
+        loop = asyncio.new_event_loop()
+        stream = self.stream_cases_by_deduction_async(case_nums, extra_constant, extra_other_info, parallel)
+        try:
+            while True:
+                step = asyncio.ensure_future(stream.__anext__(), loop=loop)
+                try:
+                    new_case = loop.run_until_complete(step)
+                except StopAsyncIteration:
+                    return
+                except BaseException:
+                    # 例如 KeyboardInterrupt：取消这一步，迭代器内部会取消在途的链路
+                    step.cancel()
+                    loop.run_until_complete(asyncio.gather(step, return_exceptions=True))
+                    raise
+                yield new_case
+        finally:
+            loop.run_until_complete(stream.aclose())
+            loop.run_until_complete(loop.shutdown_default_executor())
+            loop.close()
+
+    def _add_generated_case(self, new_case: dict) -> bool:
+        """加入生成的样例，返回是否真正新增（重复的样例不会增加数量）。"""
+        with self._lock:
+            old_case_nums = len(self.cases)
+            self.add_case_by_dict(new_case)
+            return len(self.cases) > old_case_nums
+
+    def generate_cases_by_assignment(self, case_nums: int = 10, assignments: List[dict] = None, method: str = "lhs",
+                                     parallel: int = 8, seed: int = None, extra_constant: str = None, extra_other_info: dict = None):
+        """
+        按泛化性变量的具体取值批量生成样例（见 generate_cases_by_assignment_async）。
+        :return: 本次新增的样例列表。
+        """
+        return asyncio.run(self.generate_cases_by_assignment_async(case_nums, assignments, method, parallel, seed, extra_constant, extra_other_info))
+
+    async def generate_cases_by_assignment_async(self, case_nums: int = 10, assignments: List[dict] = None, method: str = "lhs",
+                                                 parallel: int = 8, seed: int = None, extra_constant: str = None, extra_other_info: dict = None,
+                                                 max_rounds: int = 5):
+        """
+        按泛化性变量的具体取值批量生成样例：把取值写入提示词，同时为多个取值生成样例（生成→答案→检查），
+        通过的样例连同取值（"variables" 键）加入样例列表。已有样例使用过、或本会话中尝试过的取值不会再生成。
+        :param case_nums: 需要新增的样例数量（assignments 为 None 时有效）。
+        :param assignments: 指定的变量取值列表；为 None 时从参数空间中按 method 抽取尚未覆盖的取值，失败的取值由新的取值补上。
+        :param method: 参数空间的采样方法：lhs / sobol / stratified / random / grid（见 utils/variable_space.py）。
+        :param parallel: 同时生成的取值数量（另受全局LLM并发上限限制）。
+        :param seed: 采样的随机种子。
+        :param max_rounds: 抽取取值的最多轮数（每轮补足仍缺少的数量）。
+        :return: 本次新增的样例列表。
+        """
+        space = self.get_variable_space()
+        if assignments is None and space.dims == 0:
+            raise ValueError("没有可用于采样的泛化性变量（需要数值型的 min / max / step）")
+        tracker = self.get_variable_coverage()
+        tracker.add_assignments([json.loads(key) for key in self._assignments_attempted])
+        semaphore = asyncio.Semaphore(parallel)
+
+        async def run(assignment):
+            async with semaphore:
+                return await self._generate_case_for_assignment_async(assignment, extra_constant, extra_other_info)
+
+        created = []
+        for round_id in range(1 if assignments is not None else max_rounds):
+            if assignments is not None:
+                batch = assignments
+            else:
+                missing = case_nums - len(created)
+                if missing <= 0:
+                    break
+                levels = space.sample(missing, method, seed=None if seed is None else seed + round_id, coverage=tracker)
+                batch = space.assignments(levels)
+
+            with self._lock:
+                used = self.get_assignment_index()
+                batch = [assignment for assignment in batch if assignment_key(assignment) not in used and assignment_key(assignment) not in self._assignments_attempted]
+                self._assignments_attempted.update(assignment_key(assignment) for assignment in batch)
+            if not batch:
+                break
+            tracker.add_assignments(batch)
+
+            chains = [asyncio.ensure_future(run(assignment)) for assignment in batch]
+            try:
+                for chain in asyncio.as_completed(chains):
+                    new_case = await chain
+                    if new_case is not None:
+                        self.add_case_by_dict(new_case)
+                        created.append(new_case)
+            finally:
+                for chain in chains:
+                    chain.cancel()
+                await asyncio.gather(*chains, return_exceptions=True)
+        return created
+
+    async def _generate_case_for_assignment_async(self, assignment: dict, extra_constant: str = None, extra_other_info: dict = None, attempts: int = 3):
+        """
+        为一个变量取值生成样例。取值可以由新的取值替代，因此尝试次数少于 _generate_cases_by_deduction。
+        :return: 带有 "variables" 键的新样例，全部尝试失败时返回None。
+        """
+        prompt = self._build_assignment_case_prompt(assignment, extra_constant, extra_other_info)
+        failed = set()
+        for i in range(attempts):
+            model_name = self._choose_model("deduction", prompt, failed)
+            response = await self.get_llm_response_async(prompt, model_name, use_cache=(i == 0), required_keys=["metadata", "question"])
+            new_case = self._accept_case(response)
+            self._record_stage_result("deduction", model_name, new_case is not None)
+            if response is None:
+                failed.add(model_name)
+            if new_case is not None and self._screen_case(new_case, near=False):
+                if self._needs_answer(new_case):
+                    new_case["answer"] = await self._get_answer_async(new_case.get("metadata", ""), new_case.get("question", ""))
+                flag = await self._check_answer_async(new_case.get("metadata", ""), new_case.get("question", ""), new_case.get("answer", ""))
+                if flag:
+                    new_case["question"] = self._correct_question_format(new_case.get("question", ""), new_case.get("answer", ""))
+                    new_case["variables"] = assignment
+                    return new_case
+            print(f"按变量取值 {assignment} 生成样例失败，尝试第{i+1}次")
+            if i + 1 < attempts:
+                delay = self._retry_delay(i, response)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+        return (None, None) if return_model else None
+
+    def _build_assignment_case_prompt(self, assignment: dict, extra_constant: str = None, extra_other_info: dict = None):
+        variables = [param for param in self.variable if param.get("name") in assignment]
+        return generate_cases_by_assignment_en.format(
+            metadata_name=self.metadata_name, metadata_constant=self.constant,
+            variable=json.dumps(variables, ensure_ascii=False), variable_assignment=json.dumps(assignment, ensure_ascii=False),
+            metadata_example=self.cases[:CASE_PROMPT_EXAMPLES], extra_constant=extra_constant, extra_other_info=extra_other_info)
+
+    def _generate_cases_by_deduction(self, extra_constant: str = None, extra_other_info: dict = None, use_cache: bool = True):
         """
         根据推理生成新的样例。
         :param extra_constant: 额外常量。
         :param extra_other_info: 额外其他信息。
-        :return: 新的样例。
+        :param use_cache: 第一次尝试是否读取响应缓存。
+        :return: 新的样例，全部尝试失败时返回None。
         """
 
-        new_case_prompt = generate_cases_by_deduction_en.format(metadata_name=self.metadata_name, metadata_constant=self.constant, metadata_case=self.cases, extra_constant=extra_constant, extra_other_info=extra_other_info)
+        new_case_prompt = self._build_case_prompt(extra_constant, extra_other_info)
 
-        new_case = None
+        failed = set()
         for i in tqdm(range(10), desc="Generate new case"):
-            response = self.get_llm_response(new_case_prompt, self.model_name)
-            new_case = self.extract_last_complete_json(response)
-            # 确保生成了新的元数据
-            if new_case is not None and new_case.get("metadata", None) is not None and new_case.get("question", None):
-                # 如果没有答案则生成答案
-                if new_case.get("answer", None) is None or new_case.get("answer", "") == "":
+            model_name = self._choose_model("deduction", new_case_prompt, failed)
+            response = self.get_llm_response(new_case_prompt, model_name, use_cache=(use_cache and i == 0), required_keys=["metadata", "question"])
+            new_case = self._accept_case(response)
+            self._record_stage_result("deduction", model_name, new_case is not None)
+            if response is None:
+                failed.add(model_name)
+            # 确保生成了新的元数据，重复的样例不再花费生成答案和检查答案的调用
+            if new_case is not None and self._screen_case(new_case):
+                # 如果没有答案、或答案不符合问题格式则生成答案
+                if self._needs_answer(new_case):
                     new_case["answer"] = self._get_answer(new_case.get("metadata", ""), new_case.get("question", ""))
                 # 检查答案是否正确
                 flag = self._check_answer(new_case.get("metadata", ""), new_case.get("question", ""), new_case.get("answer", ""))
                 if flag:
-                    new_case = new_case
                     # 校正问题格式
                     new_case["question"] = self._correct_question_format(new_case.get("question", ""), new_case.get("answer", ""))
+                    return new_case
+            print(f"生成新样例失败，尝试第{i+1}次")
+            if i + 1 < 10:
+                delay = self._retry_delay(i, response)
+                if delay is None:
                     break
-                else:
-                    print(f"生成新样例失败，尝试第{i+1}次")
-                    continue
-            else:
-                print(f"生成新样例失败，尝试第{i+1}次")
-                continue
-        return new_case
+                self._sleep(delay)
+        return (None, None) if return_model else None
+
+    async def _generate_cases_by_deduction_async(self, extra_constant: str = None, extra_other_info: dict = None, use_cache: bool = True):
+        """
+        _generate_cases_by_deduction 的异步版本。
+        """
+        new_case_prompt = self._build_case_prompt(extra_constant, extra_other_info)
+
+        failed = set()
+        for i in tqdm(range(10), desc="Generate new case"):
+            model_name = self._choose_model("deduction", new_case_prompt, failed)
+            response = await self.get_llm_response_async(new_case_prompt, model_name, use_cache=(use_cache and i == 0), required_keys=["metadata", "question"])
+            new_case = self._accept_case(response)
+            self._record_stage_result("deduction", model_name, new_case is not None)
+            if response is None:
+                failed.add(model_name)
+            if new_case is not None and self._screen_case(new_case):
+                if self._needs_answer(new_case):
+                    new_case["answer"] = await self._get_answer_async(new_case.get("metadata", ""), new_case.get("question", ""))
+                flag = await self._check_answer_async(new_case.get("metadata", ""), new_case.get("question", ""), new_case.get("answer", ""))
+                if flag:
+                    new_case["question"] = self._correct_question_format(new_case.get("question", ""), new_case.get("answer", ""))
+                    return new_case
+            print(f"生成新样例失败，尝试第{i+1}次")
+            if i + 1 < 10:
+                delay = self._retry_delay(i, response)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+        return (None, None) if return_model else None
+
+    def _build_case_prompt(self, extra_constant: str = None, extra_other_info: dict = None):
+        return generate_cases_by_deduction_en.format(metadata_name=self.metadata_name, metadata_constant=self.constant, metadata_example=self.cases, extra_constant=extra_constant, extra_other_info=extra_other_info)
+
+    def _accept_case(self, response):
+        """从LLM响应中提取样例，缺少 metadata 或 question 时返回None。"""
+        return self._accept_json(response, "metadata", validate=lambda r: bool(r.get("question", None)))
     
     def _get_answer(self, metadata: str, question: str):
         """
@@ -461,16 +1283,70 @@ class MetadataAgent:
         :param question: 问题。
         :return: 答案。
         """
-        get_answer_prompt = get_answer_en.format(metadata_name=self.metadata_name, metadata_constant=self.constant, metadata=metadata, question=question)
-        for i in tqdm(range(10), desc="Get answer"):
-            answer = self.get_llm_response(get_answer_prompt, self.model_name)
-            answer = self.extract_last_complete_json(answer)
-            if answer is not None and answer.get("answer", None) is not None:
-                return answer.get("answer", "")
-            else:
-                print(f"生成答案失败，尝试第{i+1}次")
-                continue
-        return None
+        problem = self._parse_local_problem(metadata, question)
+        if problem is not None:
+            answer = self._format_local_answer(get_solver_pool().solve(self.solver, problem), question)
+            if answer is not None:
+                return answer
+        get_answer_prompt = self._build_answer_prompt(metadata, question)
+        response = self._request_json(get_answer_prompt, "answer", desc="Get answer", fail_message="生成答案失败", stage="answer")
+        return None if response is None else response["answer"]
+
+    async def _get_answer_async(self, metadata: str, question: str):
+        """
+        _get_answer 的异步版本。
+        """
+        problem = self._parse_local_problem(metadata, question)
+        if problem is not None:
+            answer = self._format_local_answer(await get_solver_pool().solve_async(self.solver, problem), question)
+            if answer is not None:
+                return answer
+        get_answer_prompt = self._build_answer_prompt(metadata, question)
+        response = await self._request_json_async(get_answer_prompt, "answer", desc="Get answer", fail_message="生成答案失败", stage="answer")
+        return None if response is None else response["answer"]
+
+    def _needs_answer(self, new_case: dict) -> bool:
+        """样例缺少答案，或生成样例时给出的答案不符合问题的格式骨架（重新生成答案，而不是调用LLM检查后丢弃整个样例）。"""
+        answer = new_case.get("answer", None)
+        if answer is None or answer == "":
+            return True
+        if check_answer_structure(new_case.get("question", ""), answer)[0] is False:
+            with self._lock:
+                self.answer_precheck_stats["regenerated"] += 1
+            return True
+        return False
+
+    def _precheck_answer(self, question: str, answer: str) -> bool:
+        """检查答案前的本地格式预检查；不符合问题格式骨架时直接判错，不调用LLM。"""
+        conforms, reason = check_answer_structure(question, answer)
+        with self._lock:
+            self.answer_precheck_stats["checked"] += 1
+            if conforms is False:
+                self.answer_precheck_stats["rejected"] += 1
+        if conforms is False:
+            print(f"答案不符合问题格式（{reason}），跳过LLM检查")
+            return False
+        return True
+
+    def _parse_local_problem(self, metadata: str, question: str):
+        """用本地求解插件解析样例；没有插件或插件无法解析时返回None（使用LLM）。"""
+        if self.solver is None:
+            return None
+        return self.solver.parse(metadata, question)
+
+    def _format_local_answer(self, solution, question: str):
+        """
+        把本地求解结果按问题的格式输出；插件无法按问题的格式骨架给出答案时返回None（改用LLM生成答案）。
+        """
+        answer = self.solver.format_answer(solution, question)
+        if answer is None or check_answer_structure(question, answer)[0] is False:
+            return None
+        with self._lock:
+            self.solver_stats["answers"] += 1
+        return answer
+
+    def _build_answer_prompt(self, metadata: str, question: str):
+        return get_answer_en.format(metadata_name=self.metadata_name, metadata_constant=self.constant, metadata=metadata, question=question)
 
     def _check_answer(self, metadata: str, question: str, answer: str):
         """
@@ -480,16 +1356,216 @@ class MetadataAgent:
         :param answer: 答案。
         :return: 是否正确。
         """
-        check_answer_prompt = check_answer_en.format(metadata_name=self.metadata_name, metadata_constant=self.constant, metadata=metadata, question=question, candidate_answer=answer)
-        for i in tqdm(range(10), desc="Check answer"):
-            response = self.get_llm_response(check_answer_prompt, self.model_name)
-            response = self.extract_last_complete_json(response)
-            if response is not None and response.get("is_correct", None) is not None:
-                return response.get("is_correct", False)
+        verdict = self._check_answer_locally(metadata, question, answer)
+        if verdict is not None:
+            return verdict
+        check_answer_prompt = self._build_check_prompt(metadata, question, answer)
+        response, model_name = self._request_json(check_answer_prompt, "is_correct", desc="Check answer", fail_message="检查答案失败",
+                                                  stage="check", return_model=True)
+        return self._put_memo_verdict(metadata, question, answer, response, model_name)
+
+    async def _check_answer_async(self, metadata: str, question: str, answer: str):
+        """
+        _check_answer 的异步版本。
+        """
+        verdict = await self._check_answer_locally_async(metadata, question, answer)
+        if verdict is not None:
+            return verdict
+        check_answer_prompt = self._build_check_prompt(metadata, question, answer)
+        response, model_name = await self._request_json_async(check_answer_prompt, "is_correct", desc="Check answer", fail_message="检查答案失败",
+                                                              stage="check", return_model=True)
+        return self._put_memo_verdict(metadata, question, answer, response, model_name)
+
+    def _check_answer_locally(self, metadata: str, question: str, answer: str):
+        """
+        不调用LLM的检查：答案格式预检查、本地求解插件、检查结论备忘录，依次进行。
+        格式预检查在前：求解插件只判断移动序列等内容是否正确，不判断答案是否符合问题的格式骨架。
+        :return: 是否正确，需要LLM检查时返回None。
+        """
+        if not self._precheck_answer(question, answer):
+            return False
+        problem = self._parse_local_problem(metadata, question)
+        if problem is not None:
+            flag = self.solver.verify(problem, answer, get_solver_pool().solve(self.solver, problem))
+            if flag is not None:
+                with self._lock:
+                    self.solver_stats["checks"] += 1
+                return flag
+        return self._get_memo_verdict(metadata, question, answer)
+
+    async def _check_answer_locally_async(self, metadata: str, question: str, answer: str):
+        """
+        _check_answer_locally 的异步版本（本地求解在进程池中运行，不阻塞事件循环）。
+        """
+        if not self._precheck_answer(question, answer):
+            return False
+        problem = self._parse_local_problem(metadata, question)
+        if problem is not None:
+            flag = self.solver.verify(problem, answer, await get_solver_pool().solve_async(self.solver, problem))
+            if flag is not None:
+                with self._lock:
+                    self.solver_stats["checks"] += 1
+                return flag
+        return self._get_memo_verdict(metadata, question, answer)
+
+    def check_answers_batch(self, items: List[Tuple[Any, Any, Any]], batch_size: int = CHECK_BATCH_SIZE,
+                            max_batch_chars: int = CHECK_BATCH_MAX_CHARS, parallel: int = 8):
+        """
+        批量检查答案（见 check_answers_batch_async）。
+        :return: 与 items 一一对应的检查结论列表。
+        """
+        return asyncio.run(self.check_answers_batch_async(items, batch_size, max_batch_chars, parallel))
+
+    async def check_answers_batch_async(self, items: List[Tuple[Any, Any, Any]], batch_size: int = CHECK_BATCH_SIZE,
+                                        max_batch_chars: int = CHECK_BATCH_MAX_CHARS, parallel: int = 8):
+        """
+        批量检查答案：不能在本地判断的样例每 batch_size 个打包进一个提示词（共享同一份模板和基本常量），
+        模型按 index 返回每个样例的结论；批量请求失败、或某个样例的结论缺失 / 不合法时，该样例退回逐个检查。
+        :param items: (metadata, question, answer) 列表。
+        :param batch_size: 每个提示词中最多的样例数量。
+        :param max_batch_chars: 每个提示词中样例部分的最大字符数，按模型的上下文窗口调整；单个样例超出时单独成批。
+        :param parallel: 同时进行的批量请求数量（另受全局LLM并发上限限制）。
+        :return: 与 items 一一对应的检查结论列表。
+        """
+        verdicts = [None] * len(items)
+        pending = []
+        for i, (metadata, question, answer) in enumerate(items):
+            verdicts[i] = await self._check_answer_locally_async(metadata, question, answer)
+            if verdicts[i] is None:
+                pending.append(i)
+
+        batches, batch, batch_chars = [], [], 0
+        for i in pending:
+            size = len(self._format_check_entry(0, *items[i]))
+            if batch and (len(batch) >= batch_size or batch_chars + size > max_batch_chars):
+                batches.append(batch)
+                batch, batch_chars = [], 0
+            batch.append(i)
+            batch_chars += size
+        if batch:
+            batches.append(batch)
+
+        semaphore = asyncio.Semaphore(parallel)
+
+        async def run(batch):
+            if len(batch) == 1:
+                results = [None]
             else:
-                print(f"检查答案失败，尝试第{i+1}次")
+                async with semaphore:
+                    results = await self._check_batch_async([items[i] for i in batch])
+            for i, verdict in zip(batch, results):
+                if verdict is None:
+                    async with semaphore:
+                        verdict = await self._check_answer_async(*items[i])
+                verdicts[i] = verdict
+
+        await asyncio.gather(*(run(batch) for batch in batches))
+        return verdicts
+
+    async def _check_batch_async(self, items: List[Tuple[Any, Any, Any]]):
+        """
+        一次请求检查多个样例。
+        :return: 与 items 一一对应的结论，请求失败或结论缺失的位置为None。
+        """
+        prompt = self._build_batch_check_prompt(items)
+        response, model_name = await self._request_json_async(prompt, "results", attempts=2, fail_message="批量检查答案失败",
+                                                              validate=lambda r: isinstance(r.get("results"), list), stage="check",
+                                                              return_model=True)
+        verdicts = [None] * len(items)
+        if response is None:
+            return verdicts
+        for result in response["results"]:
+            if not isinstance(result, dict) or not isinstance(result.get("is_correct", None), bool):
                 continue
-        return False
+            index = result.get("index", None)
+            if isinstance(index, int) and 0 <= index < len(items) and verdicts[index] is None:
+                verdicts[index] = result["is_correct"]
+                self._put_memo_verdict(*items[index], result, model_name)
+        with self._lock:
+            self.batch_check_stats["batches"] += 1
+            self.batch_check_stats["cases"] += sum(verdict is not None for verdict in verdicts)
+            self.batch_check_stats["fallbacks"] += sum(verdict is None for verdict in verdicts)
+        return verdicts
+
+    @staticmethod
+    def _format_check_entry(index: int, metadata: Any, question: Any, answer: Any) -> str:
+        return json.dumps({"index": index, "metadata": metadata, "question": question, "candidate_answer": answer}, ensure_ascii=False)
+
+    def _build_batch_check_prompt(self, items: List[Tuple[Any, Any, Any]]):
+        cases = ",\n".join(self._format_check_entry(index, *item) for index, item in enumerate(items))
+        return check_answers_batch_en.format(metadata_name=self.metadata_name, metadata_constant=self.constant, cases=f"[\n{cases}\n]")
+
+    def _memo_models(self) -> List[str]:
+        """可以复用其检查结论的模型：使用路由器时为检查阶段的候选模型（按配置顺序），否则为 model_name。"""
+        if self.router is None:
+            return [self.model_name]
+        return self.router.candidates("check")
+
+    def _get_memo_verdict(self, metadata: str, question: str, answer: str):
+        """备忘录中当前常量下该样例的检查结论（由 _memo_models 中的模型给出），没有记录时返回None。"""
+        if self.verification_memo is None:
+            return None
+        for model_name in self._memo_models():
+            verdict = self.verification_memo.get(model_name, self.constant, metadata, question, answer)
+            if verdict is not None:
+                return verdict
+        return None
+
+    def _put_memo_verdict(self, metadata: str, question: str, answer: str, response, model_name: str):
+        """
+        记录LLM给出的检查结论（请求失败时不记录）并返回结论。
+        :param model_name: 实际给出结论的模型（使用路由器时不一定是 model_name），结论记录在该模型名下。
+        """
+        if response is None:
+            return False
+        verdict = bool(response["is_correct"])
+        if self.verification_memo is not None:
+            self.verification_memo.put(model_name, self.constant, metadata, question, answer, verdict)
+        return verdict
+
+    def reverify_cases(self, parallel: int = 8, batch_size: int = CHECK_BATCH_SIZE):
+        """
+        增量地重新检查全部样例（见 reverify_cases_async）。
+        :return: 检查报告。
+        """
+        return asyncio.run(self.reverify_cases_async(parallel, batch_size))
+
+    async def reverify_cases_async(self, parallel: int = 8, batch_size: int = CHECK_BATCH_SIZE):
+        """
+        增量地重新检查全部样例：备忘录中已有当前模型、当前常量下结论的样例直接复用，
+        只有常量修改后、或 metadata / question / answer 改变过的样例才重新检查，调用次数与改动的样例数量成正比。
+        :param parallel: 同时进行的检查请求数量（另受全局LLM并发上限限制）。
+        :param batch_size: 每个检查请求中的样例数量（见 check_answers_batch_async），为 1 时逐个检查。
+        :return: {"total", "reused", "checked", "passed", "failed"}，failed 为检查未通过的样例位置列表。
+        """
+        with self._lock:
+            cases = list(enumerate(self.cases))
+        report = {"total": len(cases), "reused": 0, "checked": 0, "passed": 0, "failed": []}
+        pending = []
+        for position, case in cases:
+            verdict = self._get_memo_verdict(case.get("metadata", ""), case.get("question", ""), case.get("answer", ""))
+            if verdict is None:
+                pending.append((position, case))
+                continue
+            report["reused"] += 1
+            if verdict:
+                report["passed"] += 1
+            else:
+                report["failed"].append(position)
+
+        items = [(case.get("metadata", ""), case.get("question", ""), case.get("answer", "")) for _, case in pending]
+        verdicts = await self.check_answers_batch_async(items, batch_size=batch_size, parallel=parallel)
+        for (position, _), verdict in zip(pending, verdicts):
+            report["checked"] += 1
+            if verdict:
+                report["passed"] += 1
+            else:
+                report["failed"].append(position)
+        report["failed"].sort()
+        return report
+
+    def _build_check_prompt(self, metadata: str, question: str, answer: str):
+        return check_answer_en.format(metadata_name=self.metadata_name, metadata_constant=self.constant, metadata=metadata, question=question, candidate_answer=answer)
 
     def _correct_question_format(self, question: str, answer: str):
         """
@@ -550,44 +1626,79 @@ class MetadataAgent:
         :param extra_other_info: 额外其他信息。
         :return: 新的变量。
         """
+        self._generate_variable_by_analogy(extra_constant, extra_case, extra_variable, extra_other_info)
+        return self.variable
+
+    async def generate_variable_by_analogy_async(self, extra_constant: str = None, extra_case: list = None, extra_variable: list = None, extra_other_info: dict = None):
+        """
+        generate_variable_by_analogy 的异步版本。
+        """
+        await self._generate_variable_by_analogy_async(extra_constant, extra_case, extra_variable, extra_other_info)
+        return self.variable
+
+    def _generate_variable_by_analogy(self, extra_constant: str = None, extra_case: list = None, extra_variable: list = None, extra_other_info: dict = None) -> bool:
+        """generate_variable_by_analogy 的实现，返回是否得到了模型的结果（供批量运行判断阶段是否失败）。"""
+        generate_variable_by_analogy_prompt = self._build_analogy_prompt(extra_constant, extra_case, extra_variable, extra_other_info)
+        response = self._request_json(generate_variable_by_analogy_prompt, "variable", desc="Generate variable by analogy", fail_message="生成变量失败", stage="analogy")
+        if response is not None:
+            self.add_variable_by_list(response.get("variable", []))
+        return response is not None
+
+    async def _generate_variable_by_analogy_async(self, extra_constant: str = None, extra_case: list = None, extra_variable: list = None, extra_other_info: dict = None) -> bool:
+        generate_variable_by_analogy_prompt = self._build_analogy_prompt(extra_constant, extra_case, extra_variable, extra_other_info)
+        response = await self._request_json_async(generate_variable_by_analogy_prompt, "variable", desc="Generate variable by analogy", fail_message="生成变量失败", stage="analogy")
+        if response is not None:
+            self.add_variable_by_list(response.get("variable", []))
+        return response is not None
+
+    def _build_analogy_prompt(self, extra_constant: str = None, extra_case: list = None, extra_variable: list = None, extra_other_info: dict = None):
         if extra_variable is not None:
             self.add_variable_by_list(extra_variable)
         if extra_case is not None:
             self.add_case_by_list(extra_case)
     
-        generate_variable_by_analogy_prompt = generate_variable_by_analogy_en.format(metadata_name=self.metadata_name, metadata_constant=self.constant, cases=self.cases, extra_constant=extra_constant, extra_other_info=extra_other_info)
-        for i in tqdm(range(10), desc="Generate variable by analogy"):
-            response = self.get_llm_response(generate_variable_by_analogy_prompt, self.model_name)
-            response = self.extract_last_complete_json(response)
-            if response is not None and response.get("variable", None) is not None:
-                self.add_variable_by_list(response.get("variable", []))
-                break
-            else:
-                print(f"生成变量失败，尝试第{i+1}次")
-                continue
-        return self.variable
+        return generate_variable_by_analogy_en.format(metadata_name=self.metadata_name, metadata_constant=self.constant, cases=self.cases, extra_constant=extra_constant, extra_other_info=extra_other_info)
     
     def judge_variable(self, extra_info: dict = None):
         """
         判断变量是否合理,如果有不合理的地方,则进行修改。
         :return: 是否合理。
         """
-        judge_variable_prompt = validate_variable_en.format(metadata_name=self.metadata_name, metadata_constant=self.constant, cases=self.cases, variable=self.variable, extra_info=extra_info)
-        for i in tqdm(range(10), desc="Judge variable"):
-            response = self.get_llm_response(judge_variable_prompt, self.model_name)
-            response = self.extract_last_complete_json(response)
-            if response is not None and response.get("variable", None) is not None:
-                self.set_variable(response.get("variable", []))
-                break
-            else:
-                print(f"判断变量失败，尝试第{i+1}次")
-                continue
+        self._judge_variable(extra_info)
+        return self.variable
+
+    async def judge_variable_async(self, extra_info: dict = None):
+        """
+        judge_variable 的异步版本。
+        """
+        await self._judge_variable_async(extra_info)
+        return self.variable
+
+    def _judge_variable(self, extra_info: dict = None) -> bool:
+        """judge_variable 的实现，返回是否得到了模型的结果（供批量运行判断阶段是否失败）。"""
+        judge_variable_prompt = self._build_judge_variable_prompt(extra_info)
+        response = self._request_json(judge_variable_prompt, "variable", desc="Judge variable", fail_message="判断变量失败", stage="judge")
+        self._apply_judged_variable(response)
+        return response is not None
+
+    async def _judge_variable_async(self, extra_info: dict = None) -> bool:
+        judge_variable_prompt = self._build_judge_variable_prompt(extra_info)
+        response = await self._request_json_async(judge_variable_prompt, "variable", desc="Judge variable", fail_message="判断变量失败", stage="judge")
+        self._apply_judged_variable(response)
+        return response is not None
+
+    def _build_judge_variable_prompt(self, extra_info: dict = None):
+        return validate_variable_en.format(metadata_name=self.metadata_name, metadata_constant=self.constant, cases=self.cases, variables=self.variable, extra_info=extra_info)
+
+    @synchronized
+    def _apply_judged_variable(self, response):
+        if response is not None:
+            self.set_variable(response.get("variable", []))
         
         # 删除min、max和step不为数字的变量
         self.variable = [param for param in self.variable if param.get("min", None) is not None and param.get("max", None) is not None and param.get("step", None) is not None]
-        self.save_metadata()
-        
-        return self.variable
+        self.metadata["variable"] = self.variable
+        self._log_set("variable")
     
     def make_metadata_by_cmd(self):
         """
@@ -597,7 +1708,9 @@ class MetadataAgent:
         temp_input_data = None
         temp_old_data = None
         while True:
-            success, result, old_data, new_deepth_id, is_continue_input = self._make_metadata(deepth_id=temp_deepth_id, input_data=temp_input_data, old_data=temp_old_data)
+            # 每条编辑命令单独作为一次批量修改：出错时只回滚这一条，等待输入时不持有实例锁
+            with self.batch():
+                success, result, old_data, new_deepth_id, is_continue_input = self._make_metadata(deepth_id=temp_deepth_id, input_data=temp_input_data, old_data=temp_old_data)
             print(result)
             if success:
                 break
@@ -785,14 +1898,15 @@ class MetadataAgent:
                     else:
                         return False, f"【新增或者更新元数据】第{case_index+1}个元数据样例的元数据不存在。。。\n\n 【新增或者更新元数据】请输入新的元数据样例的元数据：", old_data, deepth_id + 1, True
                 elif case_sub_index == 1:
+                    changes = {}
                     if str(input_data).strip() != "":
-                        temp_case_info[case_index]["metadata"] = input_data
+                        changes["metadata"] = input_data
                     else:
                         if case_index < len(old_data):
                             if old_data[case_index].get("metadata", "") != "":
-                                temp_case_info[case_index]["metadata"] = old_data[case_index].get("metadata", "")
+                                changes["metadata"] = old_data[case_index].get("metadata", "")
 
-                    self.set_cases(temp_case_info)
+                    self.update_case(case_index, changes)
                     return False, f"【新增或者更新元数据】第{case_index+1}个元数据样例的元数据：{temp_case_info[case_index]['metadata']} \n\n", old_data, deepth_id + 1, False
                 elif case_sub_index == 2:
                     if case_index < len(old_data):
@@ -800,14 +1914,15 @@ class MetadataAgent:
                     else:
                         return False, f"【新增或者更新元数据】第{case_index+1}个元数据样例的问题不存在。。。\n\n 【新增或者更新元数据】请输入新的元数据样例的问题：", old_data, deepth_id + 1, True
                 elif case_sub_index == 3:
+                    changes = {}
                     if str(input_data).strip() != "":
-                        temp_case_info[case_index]["question"] = self.parse_structure(input_data)
+                        changes["question"] = self.parse_structure(input_data)
                     else:
                         if case_index < len(old_data):
                             if old_data[case_index].get("question", "") != "":
-                                temp_case_info[case_index]["question"] = old_data[case_index].get("question", "")
+                                changes["question"] = old_data[case_index].get("question", "")
 
-                    self.set_cases(temp_case_info)
+                    self.update_case(case_index, changes)
                     return False, f"【新增或者更新元数据】第{case_index+1}个元数据样例的问题：{temp_case_info[case_index]['question']} \n\n", old_data, deepth_id + 1, False
                 elif case_sub_index == 4:
                     if case_index < len(old_data):
@@ -815,14 +1930,15 @@ class MetadataAgent:
                     else:
                         return False, f"【新增或者更新元数据】第{case_index+1}个元数据样例的答案不存在。。。\n\n 【新增或者更新元数据】请输入新的元数据样例的答案：", old_data, deepth_id + 1, True
                 elif case_sub_index == 5:
+                    changes = {}
                     if str(input_data).strip() != "":
-                        temp_case_info[case_index]["answer"] = input_data
+                        changes["answer"] = input_data
                     else:
                         if case_index < len(old_data):
                             if old_data[case_index].get("answer", "") != "":
-                                temp_case_info[case_index]["answer"] = old_data[case_index].get("answer", "")
+                                changes["answer"] = old_data[case_index].get("answer", "")
 
-                    self.set_cases(temp_case_info)
+                    self.update_case(case_index, changes)
                     return False, f"【新增或者更新元数据】第{case_index+1}个元数据样例的答案：{temp_case_info[case_index]['answer']} \n\n", old_data, deepth_id + 1, False
         elif deepth_id == 2000000:
             temp_metadata = self.get_metadata()
@@ -835,37 +1951,9 @@ class MetadataAgent:
     def parse_structure(self, text: str) -> Any:
         """
         将字符串解析成对应的 Python 数据结构（list / dict / str / int / …）。
-
-        解析顺序：
-        1. json.loads（标准 JSON）
-        2. ast.literal_eval（Python 字面量）
-        3. 单引号→双引号替换后再次尝试 json.loads
+        解析顺序见 utils/json_repair.py 中的 parse_structure。
         """
-        # 已经是 Python 对象，直接返回
-        if not isinstance(text, str):
-            return text
-
-        # 尝试严格 JSON
-        try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            pass
-
-        # 尝试 Python 字面量
-        try:
-            return ast.literal_eval(text)
-        except (ValueError, SyntaxError):
-            pass
-
-        # 把单引号替换为双引号再试一次 JSON
-        text_fixed = re.sub(r"'", r'"', text)
-        try:
-            return json.loads(text_fixed)
-        except json.JSONDecodeError:
-            pass
-
-        # 全部失败，说明格式无法识别
-        raise ValueError("无法将输入解析为有效的数据结构")
+        return parse_structure(text)
 
     def read_multiline_until_sentinel(self, sentinel="##END##", systemp_prompt= "", prompt="> "):
         if systemp_prompt != "":
@@ -929,10 +2017,19 @@ class MetadataAgent:
         prompt = "\n".join(prompt_parts)
 
         # 2) 调用 LLM
+        failed = set()
         for i in range(10):
-            raw_response = self.get_llm_response(prompt, model_name=self.model_name)  # 你的 llm_response 可能只接 prompt
-            if raw_response is not None:
+            model_name = self._choose_model("judge", prompt, failed)
+            raw_response = self.get_llm_response(prompt, model_name=model_name)  # 你的 llm_response 可能只接 prompt
+            self._record_stage_result("judge", model_name, raw_response is not None)
+            if raw_response is None:
+                failed.add(model_name)
+            if raw_response is not None or i + 1 == 10:
+                break
+            delay = self._retry_delay(i, raw_response)
+            if delay is None:
                 break
+            self._sleep(delay)
 
         # 3) 整理 / 校验输出
         return raw_response
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+batch_runner.py
+按清单批量生成元数据：对清单中的每一项依次执行 归纳常量(induction) → 演绎样例(deduction) → 类比变量(analogy) → 校验变量(judge)，
+各项在进程池中并行处理。每个阶段完成（或失败）后立即追加一条检查点记录，中断后用同样的命令重新运行即从中断处继续：
+已完成的阶段跳过，演绎阶段只补足尚缺的样例数量，失败的阶段重新执行。
+清单格式：
+  - .jsonl：每行一个元数据名称字符串，或一个对象
+      {"metadata_name": "8_metadata", "extra_constant": "种子常量", "extra_case": [...], "extra_other_info": {...}, "case_nums": 3}
+  - 其他：每行一个元数据名称，可用制表符分隔附带种子常量；空行和 # 开头的行忽略
+用法（在 code 目录下）：
+  python -m agent.batch_runner manifest.jsonl [--workers 4] [--model glm-4-air] [--storage json|sqlite]
+                               [--stages induction,deduction,analogy,judge] [--case-nums 3] [--parallel 1] [--checkpoint PATH]
+                               [--timeout SECONDS] [--call-timeout SECONDS] [--hedge PERCENTILE] [--router [CONFIG]]
+检查点默认为 <清单>.checkpoint.jsonl。--timeout 为每一项的截止时间，到期后正在进行的LLM调用立即中止，该项记为失败（重新运行时从检查点继续）；
+--call-timeout 为单次LLM调用的最长时间。
+--hedge 开启对冲请求：请求耗时超过该模型最近耗时的该分位数（例如 0.95）后再发出一个相同的请求，取先完成的结果。
+--router 按阶段选择模型（默认配置 agent/config/model_router.json），此时 --model 只用于限流与重试预算的配置。
+运行中和结束时输出 items/hour 与 calls/item（每项实际发出的LLM请求数）。
+返回码：
+  0  全部完成
+  1  有失败的项（重新运行即可重试）
+"""
+
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List
+
+from agent.MetadataAgent import ROUTER_CONFIG_FILE, MetadataAgent, get_model_router
+from utils.file_lock import FileLock
+
+STAGES = ("induction", "deduction", "analogy", "judge")
+CHECKPOINT_SUFFIX = ".checkpoint.jsonl"
+
+
+def load_manifest(path: str) -> List[Dict[str, Any]]:
+    """读取清单，返回各项的参数字典；重复的元数据名称只保留第一个。"""
+    items, seen = [], set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.endswith(".jsonl"):
+                item = json.loads(line)
+                item = {"metadata_name": item} if isinstance(item, str) else item
+            else:
+                name, _, seed = line.partition("\t")
+                item = {"metadata_name": name.strip()}
+                if seed.strip():
+                    item["extra_constant"] = seed.strip()
+            if not item.get("metadata_name"):
+                raise ValueError(f"{path} 第{line_no}行缺少 metadata_name")
+            if item["metadata_name"] in seen:
+                print(f"清单中重复的元数据 {item['metadata_name']}（第{line_no}行），已忽略")
+                continue
+            seen.add(item["metadata_name"])
+            items.append(item)
+    return items
+
+
+def load_checkpoint(path: str) -> Dict[str, Dict[str, dict]]:
+    """元数据名称 → 阶段 → 该阶段最后一条检查点记录。被中断时写了一半的最后一行忽略。"""
+    state = {}
+    if not os.path.exists(path):
+        return state
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            state.setdefault(record["item"], {})[record["stage"]] = record
+    return state
+
+
+def append_checkpoint(path: str, record: dict):
+    """多个进程通过文件锁追加检查点记录，写入后立即落盘。"""
+    record = dict(record, time=time.time())
+    with FileLock(path + ".lock"):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def run_item(item: dict, stages: List[str], progress: Dict[str, dict], checkpoint: str, options: dict) -> dict:
+    """
+    在工作进程中处理清单中的一项。
+    :param progress: 该项已有的检查点记录（阶段 → 记录）。
+    :return: {"item", "status", "calls", "seconds", "stages"}，stages 为本次执行的阶段。
+    """
+    name = item["metadata_name"]
+    start = time.perf_counter()
+    agent = MetadataAgent(name, model_name=item.get("model_name", options["model"]), storage=options["storage"], call_timeout=options["call_timeout"],
+                          router=get_model_router(options["router"]) if options["router"] else False)
+    if options["hedge"]:
+        provider_client = agent.get_provider_client()
+        if provider_client.get_hedge_policy(agent.model_name) is None:   # 每个工作进程只配置一次，保留已学到的耗时
+            provider_client.configure_hedging(percentile=options["hedge"])
+    summary = {"item": name, "status": "done", "calls": 0, "seconds": 0.0, "stages": []}
+    with agent.deadline(options["timeout"]):
+        _run_stages(agent, item, stages, progress, checkpoint, options, summary)
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def _run_stages(agent: MetadataAgent, item: dict, stages: List[str], progress: Dict[str, dict], checkpoint: str, options: dict, summary: dict):
+    """依次执行尚未完成的阶段，每个阶段结束后写入检查点；某个阶段失败（包括截止时间已到）时停止。"""
+    name = item["metadata_name"]
+    case_nums = item.get("case_nums", options["case_nums"])
+    for stage in stages:
+        if progress.get(stage, {}).get("status") == "done":
+            continue
+        record = {"item": name, "stage": stage}
+        calls_before, stage_start = agent.llm_call_stats["calls"], time.perf_counter()
+        try:
+            # 各生成方法失败时不抛出异常（不修改元数据），需要检查结果，否则失败的阶段会被记为完成
+            if stage == "induction":
+                if not agent.generate_constant_based_on_induction(item.get("extra_constant"), item.get("extra_case"), item.get("extra_other_info")):
+                    raise RuntimeError("没有生成基本常量")
+            elif stage == "deduction":
+                # 中断或失败后只补足尚缺的样例：started 记录了本阶段第一次开始前的样例数
+                cases_before = progress.get(stage, {}).get("cases_before", None)
+                if cases_before is None:
+                    cases_before = len(agent.cases)
+                    append_checkpoint(checkpoint, dict(record, status="started", cases_before=cases_before))
+                record["cases_before"] = cases_before
+                # generate_cases_by_deduction 的 case_nums 是样例总数
+                if len(agent.cases) < cases_before + case_nums:
+                    agent.generate_cases_by_deduction(cases_before + case_nums, item.get("extra_constant"), None, item.get("extra_other_info"), parallel=options["parallel"])
+                record["cases"] = len(agent.cases)
+                if len(agent.cases) < cases_before + case_nums:
+                    raise RuntimeError(f"只生成了 {len(agent.cases) - cases_before}/{case_nums} 个样例")
+            elif stage == "analogy":
+                variables_before = copy.deepcopy(agent.variable)
+                if not agent._generate_variable_by_analogy(item.get("extra_constant"), None, None, item.get("extra_other_info")):
+                    raise RuntimeError("生成变量失败")
+                if not agent.variable or agent.variable == variables_before:
+                    raise RuntimeError("没有生成新的变量")
+            elif stage == "judge":
+                if not agent._judge_variable():
+                    raise RuntimeError("判断变量失败")
+                if not agent.variable:
+                    raise RuntimeError("判断后没有合理的变量")
+            agent.save_metadata()
+            record["status"] = "done"
+        except Exception as e:
+            record.update(status="failed", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc(limit=5))
+        record["calls"] = agent.llm_call_stats["calls"] - calls_before
+        record["seconds"] = round(time.perf_counter() - stage_start, 3)
+        append_checkpoint(checkpoint, record)
+        summary["stages"].append(stage)
+        summary["calls"] += record["calls"]
+        if record["status"] != "done":
+            summary["status"] = "failed"
+            summary["error"] = record["error"]
+            break
+
+
+def run(manifest: str, stages: List[str], workers: int, checkpoint: str, options: dict) -> int:
+    items = load_manifest(manifest)
+    state = load_checkpoint(checkpoint)
+    todo = [item for item in items if any(state.get(item["metadata_name"], {}).get(stage, {}).get("status") != "done" for stage in stages)]
+    print(f"清单共 {len(items)} 项，已完成 {len(items) - len(todo)} 项，本次处理 {len(todo)} 项（{workers} 个进程）")
+
+    completed, failed, calls = 0, 0, 0
+    start = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = {executor.submit(run_item, item, stages, state.get(item["metadata_name"], {}), checkpoint, options): item for item in todo}
+        for future in as_completed(futures):
+            name = futures[future]["metadata_name"]
+            try:
+                summary = future.result()
+            except Exception as e:  # 工作进程异常退出
+                summary = {"item": name, "status": "failed", "calls": 0, "error": f"{type(e).__name__}: {e}"}
+            calls += summary["calls"]
+            if summary["status"] == "done":
+                completed += 1
+            else:
+                failed += 1
+                print(f"失败：{name}：{summary.get('error', '')}")
+            hours = (time.perf_counter() - start) / 3600
+            finished = completed + failed
+            print(f"[{finished}/{len(todo)}] {name} {summary['status']}，{finished / hours:.1f} items/hour，"
+                  f"{calls / finished:.1f} calls/item")
+    except KeyboardInterrupt:
+        print("已中断，重新运行同样的命令即可从检查点继续")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    elapsed = time.perf_counter() - start
+    finished = completed + failed
+    print(f"完成 {completed} 项，失败 {failed} 项，耗时 {elapsed:.1f}s，"
+          f"{(finished / (elapsed / 3600)) if elapsed > 0 else 0:.1f} items/hour，{(calls / finished) if finished else 0:.1f} calls/item")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--model", default="glm-4-air")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--stages", default=",".join(STAGES), help="逗号分隔，按给出的顺序执行")
+    parser.add_argument("--case-nums", type=int, default=3, help="每项演绎生成的样例数量（清单中的 case_nums 优先）")
+    parser.add_argument("--parallel", type=int, default=1, help="每项演绎生成时同时进行的生成链路数量")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--timeout", type=float, default=None, help="每一项的截止时间（秒）")
+    parser.add_argument("--call-timeout", type=float, default=None, help="单次LLM调用的最长时间（秒）")
+    parser.add_argument("--router", nargs="?", const=ROUTER_CONFIG_FILE, default=None, help="按阶段选择模型的路由配置文件")
+    parser.add_argument("--hedge", type=float, default=None, help="触发对冲请求的耗时分位数，例如 0.95；默认不对冲")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"未知的阶段：{', '.join(unknown)}（可选：{', '.join(STAGES)}）")
+    checkpoint = args.checkpoint or args.manifest + CHECKPOINT_SUFFIX
+    options = {"model": args.model, "storage": args.storage, "case_nums": args.case_nums, "parallel": args.parallel,
+               "timeout": args.timeout, "call_timeout": args.call_timeout, "hedge": args.hedge, "router": args.router}
+    return run(args.manifest, stages, args.workers, checkpoint, options)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
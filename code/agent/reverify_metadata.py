@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+reverify_metadata.py
+增量地重新检查元数据的全部样例：答案检查结论备忘录（agent/cache/verification_memo.sqlite3）中已有
+当前模型、当前常量下结论的样例直接复用，只有修改过的样例（或修改常量后的全部样例）才调用模型重新检查。
+用法（在 code 目录下）：
+  python -m agent.reverify_metadata 8_metadata [8_metadata_v2 ...] [--model glm-4-air] [--storage json|sqlite] [--parallel 8] [--batch-size 10]
+返回码：
+  0  全部样例检查通过
+  1  有样例检查未通过（逐条输出）
+"""
+
+import argparse
+import sys
+
+from agent.MetadataAgent import MetadataAgent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("metadata_names", nargs="+")
+    parser.add_argument("--model", default="glm-4-air")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--parallel", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=10, help="每个检查请求中的样例数量，1 为逐个检查")
+    args = parser.parse_args()
+
+    failed = 0
+    for metadata_name in args.metadata_names:
+        agent = MetadataAgent(metadata_name, model_name=args.model, storage=args.storage)
+        report = agent.reverify_cases(args.parallel, args.batch_size)
+        print(f"{metadata_name}：{report['total']} 个样例，复用 {report['reused']} 个结论，重新检查 {report['checked']} 个，"
+              f"通过 {report['passed']} 个，未通过 {len(report['failed'])} 个")
+        for position in report["failed"]:
+            case = agent.cases[position]
+            print(f"  FAIL #{position}: {case.get('metadata', '')!r}")
+        failed += len(report["failed"])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
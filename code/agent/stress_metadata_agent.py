@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+stress_metadata_agent.py
+多线程共享同一个 MetadataAgent 的压力测试（不调用真实模型）：
+  1) 写线程并发调用 add_case / add_variable / set_constant / add_key_value，部分样例在线程间重复；
+  2) 批量修改线程并发执行 batch()，其中一部分故意抛出异常以验证回滚；
+  3) 生成线程并发调用 get_llm_response（模拟模型带随机延迟），对结果做 _screen_case 后 add_case；
+  4) 保存线程不断调用 save_metadata。
+结束后检查：没有异常；样例无重复且数量与预期一致；回滚的批量修改没有留下痕迹；
+重新从磁盘加载得到的样例、变量与内存中一致。
+用法（在 code 目录下）：
+  python -m agent.stress_metadata_agent [--threads 8] [--ops 300] [--storage json|sqlite] [--seed 0]
+返回码：
+  0  检查通过
+  1  发现问题
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import types
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from agent.MetadataAgent import MetadataAgent
+
+FAKE_MODEL = "stress_fake"
+
+
+def install_fake_model(seed: int):
+    """注册 models.stress_fake：随机延迟后返回一个样例，约一半与其他调用重复。"""
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    module = types.ModuleType(f"models.{FAKE_MODEL}")
+
+    def llm_response(user_dialogue=None, system_prompt=None, history_messages=None):
+        with rng_lock:
+            delay = rng.uniform(0, 0.005)
+            n = rng.randrange(200)
+        time.sleep(delay)
+        return "```json\n" + json.dumps({"metadata": f"generated state {n}", "question": f"solve {n}", "answer": f"answer {n}"}) + "\n```"
+
+    module.llm_response = llm_response
+    sys.modules[module.__name__] = module
+
+
+def run(threads: int, ops: int, storage: str, seed: int) -> list:
+    install_fake_model(seed)
+    name = f"stress_{uuid.uuid4().hex[:8]}"
+    agent = MetadataAgent(name, model_name=FAKE_MODEL, llm_cache=False, storage=storage, near_duplicate="off")
+    problems = []
+    expected = set()
+    expected_lock = threading.Lock()
+
+    def writer(t):
+        rng = random.Random(seed * 1000 + t)
+        for i in range(ops):
+            # 约三分之一的样例在线程间重复
+            key = f"shared {rng.randrange(ops)}" if i % 3 == 0 else f"writer {t} case {i}"
+            agent.add_case(key, "q", f"answer from {t}")
+            with expected_lock:
+                expected.add(key)
+            if i % 25 == 0:
+                agent.add_variable(f"var_{t}_{i}", "d", 0, 10, 1)
+                agent.set_constant(f"constant from {t}")
+                agent.add_key_value(f"key_{t}", i)
+
+    def batcher(t):
+        for i in range(ops // 10):
+            fail = i % 3 == 0
+            try:
+                with agent.batch():
+                    for j in range(5):
+                        agent.add_case(f"{'rolled back' if fail else 'batch'} {t} {i} {j}", "q", "a")
+                    if fail:
+                        raise RuntimeError("rollback")
+            except RuntimeError:
+                continue
+            with expected_lock:
+                expected.update(f"batch {t} {i} {j}" for j in range(5))
+
+    def generator(t):
+        for i in range(ops // 5):
+            response = agent.get_llm_response(f"stress prompt {t} {i}", FAKE_MODEL, use_cache=False)
+            case = agent._accept_case(response)
+            if case is not None and agent._screen_case(case):
+                agent.add_case_by_dict(case)
+            if case is not None:
+                with expected_lock:
+                    expected.add(case["metadata"])
+
+    def saver(t):
+        for i in range(ops // 20):
+            agent.save_metadata()
+            time.sleep(0.001)
+
+    roles = [writer, batcher, generator, saver]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(roles[t % len(roles)], t) for t in range(threads)]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                problems.append(f"线程异常：{e!r}")
+    elapsed = time.perf_counter() - start
+
+    keys = [case["metadata"] for case in agent.cases]
+    if len(keys) != len(set(keys)):
+        problems.append(f"样例重复：{len(keys)} 个样例，{len(set(keys))} 个不同的键")
+    if set(keys) != expected:
+        problems.append(f"样例与预期不一致：缺少 {len(expected - set(keys))} 个，多出 {len(set(keys) - expected)} 个")
+    if any(key.startswith("rolled back") for key in keys):
+        problems.append("回滚的批量修改留下了样例")
+
+    reloaded = MetadataAgent(name, model_name=FAKE_MODEL, llm_cache=False, storage=storage)
+    if [case["metadata"] for case in reloaded.cases] != keys:
+        problems.append("重新加载的样例与内存中不一致")
+    if [param["name"] for param in reloaded.variable] != [param["name"] for param in agent.variable]:
+        problems.append("重新加载的变量与内存中不一致")
+    if reloaded.constant != agent.constant:
+        problems.append("重新加载的基本常量与内存中不一致")
+
+    print(f"{threads} 个线程，{len(keys)} 个样例，{len(agent.variable)} 个变量，耗时 {elapsed:.2f}s，"
+          f"重复丢弃 {agent.case_dedup_stats['exact']} 次")
+    _cleanup(agent, storage)
+    return problems
+
+
+def _cleanup(agent: MetadataAgent, storage: str):
+    if storage == "sqlite":
+        agent.store.store.delete_metadata(agent.store.name)
+        return
+    agent.store.close()
+    prefix = os.path.splitext(agent.metadata_file)[0]
+    directory = os.path.dirname(agent.metadata_file)
+    for file_name in os.listdir(directory):
+        path = os.path.join(directory, file_name)
+        if path.startswith(prefix + ".") and path[len(prefix) + 1:].split(".")[0] in ("json", "journal", "lock"):
+            os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=300)
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    problems = run(args.threads, args.ops, args.storage, args.seed)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if not problems:
+        print("OK")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
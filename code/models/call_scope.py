@@ -0,0 +1,132 @@
+import contextlib
+import contextvars
+import threading
+import time
+
+# 当前的调用范围（截止时间与取消信号），随 contextvars 传入 asyncio 任务与 run_async 的 I/O 线程
+_current_scope = contextvars.ContextVar("llm_call_scope", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """调用范围的截止时间已到。"""
+
+
+class CallCancelled(Exception):
+    """调用范围已被取消。"""
+
+
+class CallScope:
+    """
+    一次任务（或一次请求）的截止时间与取消信号。
+    嵌套的范围继承外层：截止时间取两者中较早的，外层取消时内层同样视为已取消。
+    阻塞的 socket 读取无法从外部中断，因此取消是协作式的：请求在重试、退避、流式读取的每一步之间检查，
+    每次尝试的超时也被限制在剩余时间之内。
+    """
+
+    def __init__(self, timeout=None, parent=None):
+        """
+        Args:
+            timeout: 从现在起的最长秒数，None 表示只继承外层的截止时间
+            parent: 外层范围
+        """
+        self.parent = parent
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if parent is not None and parent.deadline is not None:
+            deadline = parent.deadline if deadline is None else min(deadline, parent.deadline)
+        self.deadline = deadline
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """取消本范围（以及所有内层范围）。"""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        scope = self
+        while scope is not None:
+            if scope._cancelled.is_set():
+                return True
+            scope = scope.parent
+        return False
+
+    def remaining(self):
+        """剩余秒数，没有截止时间时返回 None。"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        """已取消时抛出 CallCancelled，截止时间已到时抛出 DeadlineExceeded。"""
+        if self.cancelled:
+            raise CallCancelled("调用已取消")
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise DeadlineExceeded("已超过截止时间")
+
+    def clip(self, seconds):
+        """把超时时间限制在剩余时间之内。"""
+        remaining = self.remaining()
+        if remaining is None:
+            return seconds
+        return remaining if seconds is None else min(seconds, remaining)
+
+    def sleep(self, seconds):
+        """
+        可被取消的等待。等待时间超过剩余时间时不再等待，直接抛出 DeadlineExceeded。
+        """
+        self.check()
+        remaining = self.remaining()
+        if remaining is not None and seconds >= remaining:
+            raise DeadlineExceeded(f"等待 {seconds:.1f}s 会超过截止时间")
+        end = time.monotonic() + seconds
+        # 外层范围的取消信号不会唤醒本范围，因此分段等待
+        while True:
+            left = end - time.monotonic()
+            if left <= 0:
+                break
+            self._cancelled.wait(min(left, 0.1))
+            self.check()
+
+
+def current_scope():
+    """当前的调用范围，没有时返回 None。"""
+    return _current_scope.get()
+
+
+@contextlib.contextmanager
+def call_scope(timeout=None):
+    """
+    进入一个新的调用范围，范围内（包括其中创建的 asyncio 任务和 run_async 的 I/O 线程）的请求都受其约束。
+
+    Args:
+        timeout: 最长秒数，None 表示只继承外层的截止时间
+
+    Yields:
+        CallScope: 可以在其他线程中调用 cancel() 取消
+    """
+    scope = CallScope(timeout, _current_scope.get())
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+def set_current_scope(scope):
+    """把 scope 设为当前上下文的调用范围（用于 contextvars.Context.run，在另一个上下文中执行请求）。"""
+    _current_scope.set(scope)
+
+
+def check_current():
+    """当前调用范围已取消或超时时抛出异常，没有调用范围时什么也不做。"""
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.check()
+
+
+def sleep(seconds):
+    """在当前调用范围内可被取消的 time.sleep。"""
+    scope = _current_scope.get()
+    if scope is None:
+        time.sleep(seconds)
+    else:
+        scope.sleep(seconds)
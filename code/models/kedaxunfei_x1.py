@@ -1,21 +1,17 @@
-import requests
 import json
 
 # 定义厂商信息列表
 from api_keys import KEDAXUNFEI_URL, KEDAXUNFEI_API_KEY, KEDAXUNFEI_MODEL
+from call_scope import CallCancelled, DeadlineExceeded
+from provider_client import post_json, post_sse, run_async
 
 
-def llm_response(user_dialogue=None, system_prompt=None, history_messages=None):
+def _build_request(user_dialogue=None, system_prompt=None, history_messages=None):
     """
-    发送请求到LLM API并获取响应
-    
-    Args:
-        user_dialogue: 用户对话内容
-        prompt: 系统提示词
-        history_messages: 历史消息列表,格式为[{"role": "user", "content": "用户对话内容"}, {"role": "assistant", "content": "LLM的响应内容"}]
+    构造请求体与请求头
     
     Returns:
-        str: LLM的响应内容
+        tuple: (data, headers)
     """
     # 构造默认的messages
     default_messages = []
@@ -54,26 +50,79 @@ def llm_response(user_dialogue=None, system_prompt=None, history_messages=None):
         "Content-Type": "application/json"
     }
     
+    return data, headers
+
+
+def llm_response(user_dialogue=None, system_prompt=None, history_messages=None):
+    """
+    发送请求到LLM API并获取响应
+    
+    Args:
+        user_dialogue: 用户对话内容
+        prompt: 系统提示词
+        history_messages: 历史消息列表,格式为[{"role": "user", "content": "用户对话内容"}, {"role": "assistant", "content": "LLM的响应内容"}]
+    
+    Returns:
+        str: LLM的响应内容
+    """
+    data, headers = _build_request(user_dialogue, system_prompt, history_messages)
+    
     try:
-        # 发送POST请求
-        response = requests.post(
+        # 通过共享连接池发送POST请求（长连接复用，带超时）
+        response_data = post_json(
             KEDAXUNFEI_URL,
             headers=headers,
-            json=data
+            data=data
         )
-        response.raise_for_status()
         
         # 解析响应
-        response_data = response.json()
         choices = response_data["choices"]
         message = choices[0]["message"]
         
         
         return message["content"].strip()
         
+    except (DeadlineExceeded, CallCancelled):
+        # 调用范围超时或被取消，交给调用方处理
+        raise
     except Exception as e:
         print(f"Error: {str(e)}")
         return None
 
+
+async def llm_response_async(user_dialogue=None, system_prompt=None, history_messages=None):
+    """
+    llm_response 的异步版本，可在事件循环中并发发起多个请求
+    
+    Args:
+        与 llm_response 相同
+    
+    Returns:
+        str: LLM的响应内容
+    """
+    return await run_async(llm_response, user_dialogue=user_dialogue, system_prompt=system_prompt, history_messages=history_messages)
+
+
+def llm_response_stream(user_dialogue=None, system_prompt=None, history_messages=None):
+    """
+    以流式（SSE）方式请求LLM，逐段返回响应内容。调用方提前关闭生成器即可中止请求
+    
+    Args:
+        与 llm_response 相同
+    
+    Yields:
+        str: 新到达的响应内容片段
+    """
+    data, headers = _build_request(user_dialogue, system_prompt, history_messages)
+    data["stream"] = True
+    
+    for event in post_sse(KEDAXUNFEI_URL, headers=headers, data=data):
+        choices = event.get("choices") or []
+        if not choices:
+            continue
+        content = (choices[0].get("delta") or {}).get("content")
+        if content:
+            yield content
+
 if __name__ == "__main__":
     print(llm_response(user_dialogue="健身计划"))
\ No newline at end of file
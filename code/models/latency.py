@@ -0,0 +1,131 @@
+import bisect
+import threading
+import time
+
+from rate_limit import RetryBudget
+
+# 直方图的桶边界（秒）：50ms 到 20 分钟按 1.2 倍递增，相对误差不超过 20%
+BUCKET_BOUNDS = []
+_bound = 0.05
+while _bound < 1200:
+    BUCKET_BOUNDS.append(_bound)
+    _bound *= 1.2
+del _bound
+
+LATENCY_WINDOW = 300.0      # 直方图只反映最近一到两个窗口（秒）内的请求
+
+
+class LatencyHistogram:
+    """
+    单个模型最近请求耗时的直方图。按窗口轮换：分位数由当前窗口与上一个窗口合并计算，
+    更早的样本被丢弃，服务商变快或变慢后几分钟内即可反映出来。
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        """
+        Args:
+            window: 窗口长度（秒）
+        """
+        self.window = window
+        self.current = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.previous = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.rotated = time.monotonic()
+        self.total = 0              # 累计样本数（不随窗口轮换清零）
+        self._lock = threading.Lock()
+
+    def _rotate(self, now):
+        elapsed = now - self.rotated
+        if elapsed < self.window:
+            return
+        # 超过两个窗口没有样本时，上一个窗口也已过期
+        self.previous = self.current if elapsed < 2 * self.window else [0] * len(self.current)
+        self.current = [0] * len(self.current)
+        self.rotated = now
+
+    def record(self, seconds):
+        """记录一次请求的耗时。"""
+        with self._lock:
+            self._rotate(time.monotonic())
+            self.current[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+            self.total += 1
+
+    def count(self):
+        """最近窗口内的样本数。"""
+        with self._lock:
+            self._rotate(time.monotonic())
+            return sum(self.current) + sum(self.previous)
+
+    def percentile(self, q):
+        """
+        最近窗口内耗时的 q 分位数（取所在桶的上界），没有样本时返回 None。
+
+        Args:
+            q: 0 到 1 之间，例如 0.95
+        """
+        with self._lock:
+            self._rotate(time.monotonic())
+            counts = [a + b for a, b in zip(self.current, self.previous)]
+        total = sum(counts)
+        if total == 0:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            seen += count
+            if seen >= rank and count:
+                return BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else BUCKET_BOUNDS[-1] * 1.2
+        return BUCKET_BOUNDS[-1] * 1.2
+
+    def summary(self):
+        """{"samples", "p50", "p95", "p99"}，分位数单位为秒。"""
+        return {"samples": self.count(), "p50": self.percentile(0.5), "p95": self.percentile(0.95), "p99": self.percentile(0.99)}
+
+
+class HedgePolicy:
+    """
+    对冲请求的策略：请求耗时超过该模型最近耗时的 percentile 分位数后，再发出一个相同的请求，取先完成的结果。
+    额外的请求受预算限制（与重试预算同样的机制），服务商整体变慢时不会把流量翻倍。
+    """
+
+    def __init__(self, percentile=0.95, min_samples=20, min_delay=1.0, ratio=0.05, min_hedges_per_min=2, capacity=10):
+        """
+        Args:
+            percentile: 触发对冲的耗时分位数
+            min_samples: 样本数少于该值时不对冲（分位数还不可靠）
+            min_delay: 最短的对冲等待时间（秒），避免很快的请求也被对冲
+            ratio: 每个请求带来的对冲额度（0.05 表示额外请求最多约占 5%）
+            min_hedges_per_min: 保底的每分钟对冲次数
+            capacity: 额度上限
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.budget = RetryBudget(ratio, min_hedges_per_min, capacity)
+        self.hedged = 0             # 发出的对冲请求数
+        self.wins = 0               # 对冲请求先完成的次数
+        self.denied = 0             # 超过阈值但预算不足、未对冲的次数
+        self._lock = threading.Lock()
+
+    def hedge_delay(self, histogram):
+        """发出对冲请求前等待的秒数；样本不足时返回 None，表示不对冲。"""
+        if histogram.count() < self.min_samples:
+            return None
+        return max(self.min_delay, histogram.percentile(self.percentile))
+
+    def try_hedge(self):
+        """尝试消耗一次对冲额度，成功返回 True。"""
+        if self.budget.try_spend():
+            with self._lock:
+                self.hedged += 1
+            return True
+        with self._lock:
+            self.denied += 1
+        return False
+
+    def record_win(self):
+        with self._lock:
+            self.wins += 1
+
+    def stats(self):
+        with self._lock:
+            return {"hedged": self.hedged, "hedge_wins": self.wins, "hedge_denied": self.denied}
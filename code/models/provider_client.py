@@ -0,0 +1,449 @@
+import asyncio
+import contextvars
+import functools
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from call_scope import CallScope, current_scope, set_current_scope
+from latency import HedgePolicy, LatencyHistogram
+from rate_limit import RateLimiter, RetryBudget, backoff_delay, parse_retry_after
+
+# 连接池与超时的默认配置，可通过 configure() 修改
+POOL_CONNECTIONS = 4        # 每个主机缓存的连接池数量
+POOL_MAXSIZE = 32           # 每个连接池最多保持的长连接数量
+POOL_BLOCK = False          # 连接池耗尽时是否阻塞等待（False 表示临时新建连接）
+CONNECT_TIMEOUT = 10        # 建立连接的超时时间（秒）
+READ_TIMEOUT = 300          # 读取响应的超时时间（秒），推理模型的响应可能较慢
+MAX_WORKERS = 64            # 异步调用使用的 I/O 线程数量，即单进程最多同时在途的请求数
+MAX_RETRIES = 4             # 单个请求遇到 429/5xx/网络错误时最多重试的次数（同时受进程级重试预算限制）
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+DEFAULT_COMPLETION_TOKENS = 1024  # 请求未指定 max_tokens 时，限流预估使用的输出 token 数
+
+# 按 scheme://host:port 缓存的会话，同一主机的所有请求复用同一个连接池
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# 异步接口共用的 I/O 线程池
+_executor = None
+_executor_lock = threading.Lock()
+
+# 按主机划分的限流器与进程级重试预算
+_limiters = {}
+_limiters_lock = threading.Lock()
+_retry_budget = RetryBudget()
+
+# 按模型（请求体中的 "model"）划分的耗时直方图与对冲策略
+_latency = {}
+_hedge_policies = {}
+_hedge_defaults = None      # configure_hedging(models=None) 的参数，其他模型首次请求时按它创建策略
+_latency_lock = threading.Lock()
+
+
+def configure(pool_connections=None, pool_maxsize=None, pool_block=None, connect_timeout=None, read_timeout=None, max_workers=None, max_retries=None):
+    """
+    修改连接池与超时配置。已经创建的会话会被关闭，下次请求时按新配置重建。
+
+    Args:
+        pool_connections: 每个主机缓存的连接池数量
+        pool_maxsize: 每个连接池最多保持的长连接数量
+        pool_block: 连接池耗尽时是否阻塞等待
+        connect_timeout: 建立连接的超时时间（秒）
+        read_timeout: 读取响应的超时时间（秒）
+        max_workers: 异步调用使用的 I/O 线程数量
+        max_retries: 单个请求最多重试的次数
+    """
+    global POOL_CONNECTIONS, POOL_MAXSIZE, POOL_BLOCK, CONNECT_TIMEOUT, READ_TIMEOUT, MAX_WORKERS, MAX_RETRIES
+    if pool_connections is not None:
+        POOL_CONNECTIONS = pool_connections
+    if pool_maxsize is not None:
+        POOL_MAXSIZE = pool_maxsize
+    if pool_block is not None:
+        POOL_BLOCK = pool_block
+    if connect_timeout is not None:
+        CONNECT_TIMEOUT = connect_timeout
+    if read_timeout is not None:
+        READ_TIMEOUT = read_timeout
+    if max_workers is not None:
+        MAX_WORKERS = max_workers
+    if max_retries is not None:
+        MAX_RETRIES = max_retries
+    close_all()
+
+
+def configure_rate_limit(url, requests_per_min=None, tokens_per_min=None):
+    """
+    设置 url 所在服务商的限流（同一主机的所有模型共享）。
+
+    Args:
+        url: 服务商的请求地址
+        requests_per_min: 每分钟最多请求数，None 表示不限制
+        tokens_per_min: 每分钟最多 token 数，None 表示不限制
+    """
+    with _limiters_lock:
+        _limiters[_host_key(url)] = RateLimiter(requests_per_min, tokens_per_min)
+
+
+def get_rate_limiter(url):
+    """获取 url 所在服务商的限流器，未配置时只在收到 429 后暂停，不限制速率。"""
+    key = _host_key(url)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.setdefault(key, RateLimiter())
+    return limiter
+
+
+def configure_retry_budget(ratio=0.2, min_retries_per_min=30, capacity=100):
+    """重新设置进程级重试预算（所有服务商、所有 MetadataAgent 共享）。"""
+    global _retry_budget
+    _retry_budget = RetryBudget(ratio, min_retries_per_min, capacity)
+
+
+def get_retry_budget():
+    """获取进程级重试预算。"""
+    return _retry_budget
+
+
+def configure_hedging(models=None, percentile=0.95, min_samples=20, min_delay=1.0, ratio=0.05):
+    """
+    开启对冲请求（默认关闭）：非流式请求的耗时超过该模型最近耗时的 percentile 分位数后，再发出一个相同的请求，
+    取先完成的结果，另一个请求随之取消。每个模型有独立的耗时直方图与对冲额度。
+
+    Args:
+        models: 模型名称（请求体中的 "model"）或其列表，None 表示所有模型
+        percentile: 触发对冲的耗时分位数
+        min_samples: 样本数少于该值时不对冲
+        min_delay: 最短的对冲等待时间（秒）
+        ratio: 额外请求最多约占请求数的比例
+    """
+    global _hedge_defaults
+    options = {"percentile": percentile, "min_samples": min_samples, "min_delay": min_delay, "ratio": ratio}
+    with _latency_lock:
+        if models is None:
+            _hedge_defaults = options
+            _hedge_policies.clear()
+            return
+        for model in [models] if isinstance(models, str) else models:
+            _hedge_policies[model] = HedgePolicy(**options)
+
+
+def disable_hedging():
+    """关闭所有模型的对冲请求（耗时直方图保留）。"""
+    global _hedge_defaults
+    with _latency_lock:
+        _hedge_defaults = None
+        _hedge_policies.clear()
+
+
+def get_hedge_policy(model):
+    """获取模型的对冲策略，未开启时返回 None。"""
+    policy = _hedge_policies.get(model)
+    if policy is None and _hedge_defaults is not None:
+        with _latency_lock:
+            if _hedge_defaults is not None:
+                policy = _hedge_policies.setdefault(model, HedgePolicy(**_hedge_defaults))
+    return policy
+
+
+def get_latency_histogram(model):
+    """获取模型最近请求耗时的直方图（每次成功的非流式请求都会记录，与是否开启对冲无关）。"""
+    histogram = _latency.get(model)
+    if histogram is None:
+        with _latency_lock:
+            histogram = _latency.setdefault(model, LatencyHistogram())
+    return histogram
+
+
+def get_latency_stats():
+    """
+    各模型的耗时分位数与对冲次数。
+
+    Returns:
+        dict: 模型名称 → {"samples", "p50", "p95", "p99"}，开启对冲的模型另有 {"hedged", "hedge_wins", "hedge_denied"}
+    """
+    stats = {}
+    for model, histogram in list(_latency.items()):
+        stats[model] = histogram.summary()
+        policy = _hedge_policies.get(model)
+        if policy is not None:
+            stats[model].update(policy.stats())
+    return stats
+
+
+def estimate_tokens(data):
+    """粗略估计一次请求的 token 数（输入按字符数折算，加上输出上限）。"""
+    chars = sum(len(str(message.get("content") or "")) for message in data.get("messages", []))
+    return chars // 2 + (data.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def get_session(url):
+    """
+    获取 url 所在主机的共享会话（带长连接池）。
+
+    Args:
+        url: 请求地址
+
+    Returns:
+        requests.Session: 该主机对应的会话
+    """
+    key = _host_key(url)
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, pool_block=POOL_BLOCK)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[key] = session
+    return session
+
+
+def _send(url, headers, data, timeout, stream=False):
+    """
+    经过限流发送 POST 请求；遇到 429/5xx 或网络错误时按带抖动的指数退避重试（429 时遵循 Retry-After），
+    每次重试消耗进程级重试预算，预算耗尽或达到 MAX_RETRIES 时抛出最后一次的异常。
+    处于调用范围（call_scope）中时，每次尝试前检查取消与截止时间，连接 / 读取超时、限流等待和退避等待都不超过剩余时间。
+    非流式请求成功时把本次尝试的耗时记入该模型的耗时直方图。
+
+    Returns:
+        tuple: (requests.Response, 预估的 token 数)
+    """
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    limiter = get_rate_limiter(url)
+    tokens = estimate_tokens(data)
+    scope = current_scope()
+    attempt = 0
+    while True:
+        if scope is not None:
+            scope.check()
+        limiter.acquire(tokens, scope)
+        _retry_budget.record_request()
+        retry_after = None
+        attempt_timeout = timeout if scope is None else (scope.clip(timeout[0]), scope.clip(timeout[1]))
+        start = time.monotonic()
+        try:
+            response = get_session(url).post(url, headers=headers, json=data, timeout=attempt_timeout, stream=stream)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        else:
+            if response.status_code not in RETRYABLE_STATUS:
+                try:
+                    response.raise_for_status()
+                except requests.HTTPError:
+                    response.close()   # 流式响应不会被读完，不关闭则连接不会归还连接池
+                    raise
+                limiter.succeed()
+                if not stream:
+                    get_latency_histogram(data.get("model")).record(time.monotonic() - start)
+                return response, tokens
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if response.status_code == 429:
+                limiter.throttle(retry_after)
+            try:
+                response.raise_for_status()   # RETRYABLE_STATUS 均为错误码，这里一定会抛出
+            except requests.HTTPError as e:
+                error = e
+            response.close()
+        if scope is not None:
+            scope.check()   # 因截止时间而超时的请求不再重试
+        if attempt >= MAX_RETRIES or not _retry_budget.try_spend():
+            raise error
+        delay = backoff_delay(attempt, retry_after)
+        if scope is None:
+            time.sleep(delay)
+        else:
+            scope.sleep(delay)
+        attempt += 1
+
+
+def post_json(url, headers, data, timeout=None):
+    """
+    通过共享连接池发送 JSON POST 请求（带限流与退避重试；开启对冲时见 configure_hedging）。
+
+    Args:
+        url: 请求地址
+        headers: 请求头
+        data: 请求体（会被序列化为 JSON）
+        timeout: (连接超时, 读取超时)，为 None 时使用默认配置
+
+    Returns:
+        dict: 解析后的响应 JSON
+    """
+    policy = get_hedge_policy(data.get("model"))
+    if policy is not None:
+        return _post_json_hedged(policy, url, headers, data, timeout)
+    return _post_json_once(url, headers, data, timeout)
+
+
+def _post_json_once(url, headers, data, timeout):
+    response, tokens = _send(url, headers, data, timeout)
+    response_data = response.json()
+    usage = response_data.get("usage") if isinstance(response_data, dict) else None
+    if isinstance(usage, dict):
+        get_rate_limiter(url).record_usage(tokens, usage.get("total_tokens"))
+    return response_data
+
+
+def _start_in_thread(parent, func, *args):
+    """
+    在新的守护线程中执行 func，线程处于 parent 的一个内层调用范围中。
+    不使用共享 I/O 线程池：post_json 本身可能就在池中执行，池满时对冲请求会排队，失去意义。
+
+    Returns:
+        tuple: (Future, 该线程的 CallScope)
+    """
+    scope = CallScope(parent=parent)
+    future = Future()
+    context = contextvars.copy_context()
+    context.run(set_current_scope, scope)
+
+    def target():
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(context.run(func, *args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, daemon=True, name="llm-hedge").start()
+    return future, scope
+
+
+def _post_json_hedged(policy, url, headers, data, timeout):
+    """
+    对冲发送：先发出一个请求，耗时超过该模型的对冲阈值且预算允许时再发出一个相同的请求，返回先成功的结果，
+    取消另一个（已在读取中的请求无法中断，其结果被丢弃，耗时仍记入直方图）。两个请求都失败时抛出先失败的异常。
+    """
+    policy.budget.record_request()
+    delay = policy.hedge_delay(get_latency_histogram(data.get("model")))
+    if delay is None:
+        return _post_json_once(url, headers, data, timeout)
+    parent = current_scope()
+    future, scope = _start_in_thread(parent, _post_json_once, url, headers, data, timeout)
+    pending = {future: scope}
+    hedge = None
+    hedge_at = time.monotonic() + delay
+    errors = []
+    try:
+        while pending:
+            wait_time = None if hedge is not None else max(0.0, hedge_at - time.monotonic())
+            if parent is not None:
+                wait_time = parent.clip(0.1 if wait_time is None else min(wait_time, 0.1))
+            done, _ = wait(pending, timeout=wait_time, return_when=FIRST_COMPLETED)
+            if parent is not None:
+                parent.check()
+            for future in done:
+                pending.pop(future)
+                if future.exception() is None:
+                    if future is hedge:
+                        policy.record_win()
+                    return future.result()
+                errors.append(future.exception())
+            if hedge is None and pending and time.monotonic() >= hedge_at:
+                if policy.try_hedge():
+                    hedge, scope = _start_in_thread(parent, _post_json_once, url, headers, data, timeout)
+                    pending[hedge] = scope
+                else:
+                    hedge = False   # 预算不足，只等待第一个请求
+        raise errors[0]
+    finally:
+        for scope in pending.values():
+            scope.cancel()
+
+
+def post_sse(url, headers, data, timeout=None):
+    """
+    通过共享连接池发送流式（SSE）请求，逐个返回事件。
+    限流与重试只作用于建立连接、收到响应头之前；调用方提前关闭生成器、或调用范围被取消 / 超时时会关闭底层连接，服务端随之停止生成。
+
+    Args:
+        url: 请求地址
+        headers: 请求头
+        data: 请求体（需包含 "stream": true）
+        timeout: (连接超时, 读取超时)，读取超时作用于相邻两次数据之间
+
+    Yields:
+        dict: 每个 "data:" 行解析后的 JSON
+    """
+    response, _ = _send(url, headers, data, timeout, stream=True)
+    scope = current_scope()
+    with response:
+        response.encoding = "utf-8"
+        # chunk_size=None：数据到达即处理，不等待凑满缓冲区
+        for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+            if scope is not None:
+                scope.check()
+            if not line or not line.startswith("data:"):
+                continue
+            payload = line[len("data:"):].strip()
+            if payload == "[DONE]":
+                return
+            yield json.loads(payload)
+
+
+def get_executor():
+    """获取异步接口共用的 I/O 线程池。"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="llm-io")
+    return _executor
+
+
+async def run_async(func, *args, **kwargs):
+    """
+    在共享 I/O 线程池中执行阻塞的请求函数，使其可以被 await。
+    函数在当前上下文的副本中运行，并处于一个新的内层调用范围：外层的截止时间与取消对其有效；
+    await 被取消时（例如 asyncio.wait_for 超时）取消该范围，线程中的请求在下一个检查点停止。
+
+    Args:
+        func: 阻塞函数，例如各模型模块的 llm_response
+        *args, **kwargs: 传给 func 的参数
+
+    Returns:
+        func 的返回值
+    """
+    loop = asyncio.get_running_loop()
+    scope = CallScope(parent=current_scope())
+    context = contextvars.copy_context()
+    context.run(set_current_scope, scope)
+    try:
+        return await loop.run_in_executor(get_executor(), context.run, functools.partial(func, *args, **kwargs))
+    except asyncio.CancelledError:
+        scope.cancel()
+        raise
+
+
+
+async def post_json_async(url, headers, data, timeout=None):
+    """post_json 的异步版本，请求在共享 I/O 线程池中执行并复用同一连接池。"""
+    return await run_async(post_json, url, headers, data, timeout)
+
+
+def close_all():
+    """关闭所有共享会话与 I/O 线程池，释放连接。"""
+    global _executor
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
@@ -0,0 +1,213 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# 退避的默认参数（秒）
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+THROTTLE_COOLDOWN = 5.0     # 收到 429 但没有 Retry-After 时，整个服务商暂停的时间
+MIN_RATE_FACTOR = 0.1       # 自适应降速的下限（相对于配置速率）
+RECOVERY_STEP = 0.05        # 每次成功后恢复的速率比例
+
+
+class TokenBucket:
+    """
+    令牌桶（预约式）：每次先扣除令牌，余额不足时返回需要等待的时间，调用方等待后即可发送。
+    余额允许为负，因此单次请求超过桶容量时也不会永远等待。
+    """
+
+    def __init__(self, rate_per_min, capacity=None):
+        """
+        Args:
+            rate_per_min: 每分钟补充的令牌数
+            capacity: 桶容量，默认等于每分钟的令牌数
+        """
+        self.rate_per_min = rate_per_min
+        self.capacity = capacity if capacity is not None else rate_per_min
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate_per_min / 60.0)
+        self.updated = now
+
+    def reserve(self, amount=1):
+        """扣除 amount 个令牌，返回需要等待的秒数。"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens * 60.0 / self.rate_per_min
+
+    def adjust(self, amount):
+        """按实际用量修正余额：amount 为正表示补扣，为负表示退还。"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+    def set_rate(self, rate_per_min):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate_per_min = rate_per_min
+
+
+class RateLimiter:
+    """
+    单个服务商的限流器：每分钟请求数与每分钟 token 数两个令牌桶。
+    收到 429 时整个服务商暂停（遵循 Retry-After），并把请求速率减半；之后每次成功逐步恢复到配置值。
+    """
+
+    def __init__(self, requests_per_min=None, tokens_per_min=None):
+        """
+        Args:
+            requests_per_min: 每分钟最多请求数，None 表示不限制
+            tokens_per_min: 每分钟最多 token 数（输入+输出），None 表示不限制
+        """
+        self.requests_per_min = requests_per_min
+        self.tokens_per_min = tokens_per_min
+        self.requests = TokenBucket(requests_per_min) if requests_per_min else None
+        self.tokens = TokenBucket(tokens_per_min) if tokens_per_min else None
+        self.rate_factor = 1.0
+        self.paused_until = 0.0
+        self.throttled = 0          # 收到 429 的次数
+        self.waited = 0.0           # 因限流累计等待的秒数
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=0, scope=None):
+        """
+        等待直到可以发送一个约消耗 tokens 个 token 的请求。
+
+        Args:
+            tokens: 预估的 token 数
+            scope: 调用范围（call_scope.CallScope）。等待会超过其剩余时间时立即抛出 DeadlineExceeded，
+                等待期间被取消时抛出 CallCancelled；两种情况下都退还已预约的令牌
+        """
+        now = time.monotonic()
+        with self._lock:
+            wait = max(0.0, self.paused_until - now)
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if wait <= 0:
+            return
+        if scope is None:
+            time.sleep(wait)
+        else:
+            try:
+                scope.sleep(wait)
+            except Exception:
+                self._release(tokens)
+                raise
+        with self._lock:
+            self.waited += wait
+
+    def _release(self, tokens):
+        """退还 acquire 预约但没有发出的请求的令牌。"""
+        if self.requests is not None:
+            self.requests.adjust(-1)
+        if self.tokens is not None and tokens:
+            self.tokens.adjust(-tokens)
+
+    def record_usage(self, estimated, actual):
+        """用响应中的实际 token 数修正预估值。"""
+        if self.tokens is not None and actual is not None:
+            self.tokens.adjust(actual - estimated)
+
+    def throttle(self, retry_after=None):
+        """服务商返回 429：暂停发送并降低请求速率。"""
+        with self._lock:
+            self.throttled += 1
+            pause = retry_after if retry_after is not None else THROTTLE_COOLDOWN
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            self.rate_factor = max(MIN_RATE_FACTOR, self.rate_factor / 2)
+            factor = self.rate_factor
+        if self.requests is not None:
+            self.requests.set_rate(self.requests_per_min * factor)
+
+    def succeed(self):
+        """请求成功：逐步恢复请求速率。"""
+        if self.rate_factor >= 1.0:
+            return
+        with self._lock:
+            self.rate_factor = min(1.0, self.rate_factor + RECOVERY_STEP)
+            factor = self.rate_factor
+        if self.requests is not None:
+            self.requests.set_rate(self.requests_per_min * factor)
+
+
+class RetryBudget:
+    """
+    进程级重试预算：每发出一个请求存入 ratio 个重试额度，另外按 min_retries_per_min 的速度保底补充；
+    每次重试消耗 1 个额度，额度不足时放弃重试，避免服务商过载时重试把流量放大。
+    """
+
+    def __init__(self, ratio=0.2, min_retries_per_min=30, capacity=100):
+        """
+        Args:
+            ratio: 每个请求带来的重试额度（0.2 表示重试最多约占请求的 20%）
+            min_retries_per_min: 保底的每分钟重试次数
+            capacity: 额度上限
+        """
+        self.ratio = ratio
+        self.min_retries_per_min = min_retries_per_min
+        self.capacity = capacity
+        self.balance = float(capacity)
+        self.updated = time.monotonic()
+        self.spent = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.balance = min(self.capacity, self.balance + (now - self.updated) * self.min_retries_per_min / 60.0)
+        self.updated = now
+
+    def record_request(self):
+        with self._lock:
+            self.balance = min(self.capacity, self.balance + self.ratio)
+
+    def try_spend(self):
+        """尝试消耗一次重试额度，成功返回 True。"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.balance >= 1:
+                self.balance -= 1
+                self.spent += 1
+                return True
+            self.denied += 1
+            return False
+
+
+def backoff_delay(attempt, retry_after=None, base=None, cap=None):
+    """
+    带抖动的指数退避（full jitter）。服务商给出 Retry-After 时以其为准，再加少量抖动错开各线程。
+
+    Args:
+        attempt: 已失败的次数（从 0 开始）
+        retry_after: 服务商要求等待的秒数
+
+    Returns:
+        float: 需要等待的秒数
+    """
+    base = BACKOFF_BASE if base is None else base
+    cap = BACKOFF_CAP if cap is None else cap
+    if retry_after is not None:
+        return retry_after + random.uniform(0, base)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(value):
+    """解析 Retry-After 头（秒数或 HTTP 日期），无法解析时返回 None。"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
@@ -356,6 +356,120 @@ Using the information below, **deduce and output one brand-new metadata of the s
 	•	Do not wrap the output in code fences or explanatory text.
 """
 
+generate_cases_by_assignment_ch = """
+# 角色设定
+你是一名 **元数据推演大师**，擅长在既定常量框架内，按照给定的变量取值创造合理且可解的元数据。
+
+---
+
+## 任务
+基于下列信息，**演绎并输出一条同类元数据**，其中的泛化性变量必须**恰好**取“指定变量取值”中的值，并给出限定答案格式的 `question` 以及对应 `answer`。  
+
+---
+
+### 0. 输入信息
+- **元数据名称**  
+{metadata_name}
+
+- **元数据常量**  
+{metadata_constant}
+
+- **泛化性变量定义**  
+{variable}
+
+- **指定变量取值**  
+{variable_assignment}
+
+- **示例**  
+{metadata_example}
+
+- **额外常量**  
+{extra_constant}
+
+- **其他信息**  
+{extra_other_info}
+
+---
+
+### 1. 生成要求
+1. `metadata` **必须**体现全部指定变量取值，不得改动、遗漏或另取其他值。  
+2. `metadata` **必须**写出全部已知条件，保证依据常量可唯一确定解答。  
+3. `question` **仅**用于说明答案应呈现的格式，不得重复已知条件。  
+4. 若可直接推得答案，请填写到 `answer`；否则置为 `null`。  
+5. 文案应简洁、清晰、无歧义。
+
+---
+
+### 2. 输出格式（严格遵守）
+```json
+{{
+  "metadata": "<完整元数据描述>",
+  "question": "<答案格式说明>",
+  "answer": <Any | null>
+}}
+```
+
+- 仅输出 合法 JSON，不得添加其他键，也不得包裹代码块或说明文字。
+"""
+
+generate_cases_by_assignment_en = """
+# Role Definition
+You are a **Metadata Deduction Master**, adept at crafting coherent and solvable metadatas within a fixed constant framework for given variable values.
+
+---
+
+## Task
+Using the information below, **deduce and output one metadata of the same type** whose generalization variables take **exactly** the values in "Assigned Variable Values", along with a `question` that specifies the required answer format and the corresponding `answer`.
+
+---
+
+### 0. Input Information
+- **Metadata Name**  
+{metadata_name}
+
+- **Basic Metadata Constants**  
+{metadata_constant}
+
+- **Generalization Variable Definitions**  
+{variable}
+
+- **Assigned Variable Values**  
+{variable_assignment}
+
+- **Example**  
+{metadata_example}
+
+- **Additional Constants**  
+{extra_constant}
+
+- **Other Information**  
+{extra_other_info}
+
+---
+
+### 1. Generation Requirements
+1. The `metadata` **must** reflect every assigned variable value; do not change, omit or replace any of them.  
+2. The `metadata` **must** include all given conditions so that the solution is uniquely determined under the constants.  
+3. The `question` **only** describes how the answer should be formatted and must not repeat known conditions.  
+4. If the answer can be directly deduced, fill it in `answer`; otherwise set `answer` to `null`.  
+5. Wording should be concise, clear, and unambiguous.
+
+---
+
+### 2. Output Format (strictly follow)
+```json
+{{
+  "metadata": "<complete metadata description>",
+  "question": "<answer format specification>",
+  "answer": <Any | null>
+}}
+```
+
+	•	Output valid JSON only.
+	•	Do not add any keys other than metadata, question, and answer.
+	•	Do not wrap the output in code fences or explanatory text.
+"""
+
 get_answer_ch = """
 # 角色设定
 你是一名 **专业的“元数据解答助手”**，擅长准确地推理元数据答案。
@@ -530,6 +644,94 @@ You are a **professional “Metadata Answer Verification Assistant,”** skilled
 •	Do not add any keys other than those specified, and do not wrap the output in additional code fences or explanatory text.
 """
 
+check_answers_batch_ch = """
+# 角色设定
+你是一名 **专业的“元数据答案校验助手”**，擅长依据常量判断答案是否正确。
+
+---
+
+## 0. 输入信息
+- **元数据名称**  
+<METADATA_NAME>
+{metadata_name}
+</METADATA_NAME>
+
+- **元数据常量**  
+{metadata_constant}
+
+- **待核验样例列表**（JSON 数组，每项包含 index、metadata（元数据描述）、question（答案格式说明）、candidate_answer（待核验答案））  
+{cases}
+
+---
+
+## 1. 任务
+对列表中的 **每一个** 样例分别独立判断：
+1. 核对 candidate_answer 是否符合该样例的 question。  
+2. 按照“元数据常量”和该样例的 metadata 推理正确答案，并与 candidate_answer 比对：  
+   - 若两者一致，则判定为正确；  
+   - 否则为错误，并简述主要差异或错误原因。  
+3. 如答案格式不符，直接判定为错误并说明原因。  
+
+---
+
+## 2. 输出格式（严格遵守）
+```json
+{{
+  "results": [
+    {{"index": <样例的 index>, "is_correct": true/false, "message": "<20 字以内的简短说明>"}}
+  ]
+}}
+```
+
+•	results 中每个样例恰好出现一次，index 与输入一致。
+•	仅输出 合法 JSON。
+•	不得添加其他键，也不得包裹代码块或附加说明。
+"""
+
+check_answers_batch_en = """
+# Role Definition
+You are a **professional “Metadata Answer Verification Assistant,”** skilled at determining whether a given answer is correct based on the constants.
+
+---
+
+## 0. Input Information
+- **Metadata Name**  
+<METADATA_NAME>
+{metadata_name}
+</METADATA_NAME>
+
+- **Basic Metadata Constants**  
+{metadata_constant}
+
+- **Cases to Verify** (a JSON array; each item has index, metadata (the metadata description), question (the answer format specification) and candidate_answer)  
+{cases}
+
+---
+
+## 1. Task
+Judge **every** case in the list independently:
+1. Verify whether its candidate_answer conforms to its question.  
+2. Using the “Basic Metadata Constants” and the case's metadata, deduce the correct answer and compare it with the candidate:  
+   - If they match, mark the answer as correct.  
+   - Otherwise, mark it as incorrect and briefly state the main discrepancy or error.  
+3. If the answer format is invalid, immediately mark it as incorrect and explain the reason.
+
+---
+
+## 2. Output Format (strictly follow)
+```json
+{{
+  "results": [
+    {{"index": <index of the case>, "is_correct": true/false, "message": "<brief explanation within 20 characters>"}}
+  ]
+}}
+```
+
+•	Every case appears exactly once in results, with the same index as in the input.
+•	Output valid JSON only.
+•	Do not add any keys other than those specified, and do not wrap the output in additional code fences or explanatory text.
+"""
+
 generate_variables_by_analogy_ch = """
 # 角色
 你是 **“元数据元数据分析师”**，专长于从常量与示例中归纳可扩展的变量。
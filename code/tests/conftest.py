@@ -0,0 +1,8 @@
+import os
+import sys
+
+# 与 agent 中的模块一样以 code 目录为根导入（utils.x、agent.x），模型模块另外以 models 目录为根导入
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (CODE_DIR, os.path.join(CODE_DIR, "models")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
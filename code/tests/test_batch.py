@@ -0,0 +1,70 @@
+import copy
+import sys
+import types
+
+import pytest
+
+from agent import MetadataAgent as metadata_agent_module
+from agent.MetadataAgent import MetadataAgent
+from utils.variable_space import assignment_key
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def agent_factory(request, tmp_path, monkeypatch):
+    # 元数据写到临时目录（MetadataAgent 以模块所在目录下的 metadata/ 为存储位置）
+    monkeypatch.setattr(metadata_agent_module, "__file__", str(tmp_path / "MetadataAgent.py"))
+    monkeypatch.setitem(sys.modules, "models.batch_fake", types.ModuleType("models.batch_fake"))
+    agents = []
+
+    def make():
+        agent = MetadataAgent("batch", model_name="batch_fake", llm_cache=False, storage=request.param, near_duplicate="off")
+        agents.append(agent)
+        return agent
+
+    yield make
+    for agent in agents:
+        if hasattr(agent.store, "close"):
+            agent.store.close()
+
+
+def snapshot(agent):
+    return copy.deepcopy((agent.metadata_name, agent.constant, agent.variable, list(agent.cases), dict(agent.metadata)))
+
+
+def test_rollback_restores_appended_and_updated_cases(agent_factory):
+    agent = agent_factory()
+    agent.set_constant("c")
+    agent.add_variable("x", "x", 0, 3, 1)
+    for i in range(5):
+        agent.add_case(f"m {i}", "q", "a", {"x": i})
+    agent.get_assignment_index()
+    before = snapshot(agent)
+
+    with pytest.raises(RuntimeError):
+        with agent.batch():
+            agent.add_case("m 1", "q", "changed")             # 原地更新已有样例
+            agent.update_case(3, {"answer": "edited"})
+            agent.add_case("m new", "q", "a", {"x": 9})       # 追加新样例
+            agent.add_variable("x", "x", 0, 9, 1)
+            agent.add_variable("y", "y", 0, 1, 1)
+            agent.set_constant("c2")
+            agent.add_key_value("extra", 1)
+            raise RuntimeError
+
+    assert snapshot(agent) == before
+    assert agent.metadata["cases"] is agent.cases and agent.metadata["variable"] is agent.variable
+    assert agent.get_case_index().find("m new", "q") is None
+    assert agent.get_case_index().find("m 1", "q") == 1
+    agent.add_case("m other", "q", "a", {"x": 7})
+    assert "m new" not in [case["metadata"] for case in agent.cases]
+    # 回滚截掉的位置被新样例占用后，取值索引不能还指向被回滚的样例
+    assert agent.get_assignment_index() == {assignment_key({"x": x}): i for i, x in enumerate([0, 1, 2, 3, 4, 7])}
+
+
+def test_committed_batch_survives_reload(agent_factory):
+    agent = agent_factory()
+    agent.add_case("m 0", "q", "a")
+    with agent.batch():
+        agent.update_case(0, {"answer": "edited"})
+        agent.add_case("m 1", "q", "a")
+    assert [case["answer"] for case in agent_factory().cases] == ["edited", "a"]
@@ -0,0 +1,36 @@
+from utils.case_index import CaseIndex
+
+
+def make_cases():
+    return [
+        {"metadata": "1 2 3 4 5 6 7 8 0", "question": "最少移动几步？", "answer": 0},
+        {"metadata": "1 2 3 4 5 6 7 0 8", "question": "最少移动几步？", "answer": 1},
+        {"metadata": "1 2 3 4 5 6 7 0 8", "question": "最少移动几步？", "answer": 1},
+    ]
+
+
+def test_update_reindexes_edited_case():
+    cases = make_cases()
+    index = CaseIndex(cases)
+    assert index.find("1 2 3 4 5 6 7 0 8", "最少移动几步？") == 1
+    assert index.find_similar("1 2 3 4 5 6 7 8 0", "最少移动几步？")[0] == 0
+
+    cases[0]["metadata"] = "8 7 6 5 4 3 2 1 0"
+    index.update(0)
+    assert index.find("8 7 6 5 4 3 2 1 0", "最少移动几步？") == 0
+    assert index.find("1 2 3 4 5 6 7 8 0", "最少移动几步？") is None
+    assert index.find_similar("8 7 6 5 4 3 2 1 0", "最少移动几步？")[0] == 0
+
+    # 同一个键的第一个样例被修改后，该键指向剩下的相同样例
+    cases[1]["question"] = "输出移动序列"
+    index.update(1)
+    assert index.find("1 2 3 4 5 6 7 0 8", "最少移动几步？") == 2
+    assert index.find("1 2 3 4 5 6 7 0 8", "输出移动序列") == 1
+
+
+def test_update_moves_key_to_earliest_position():
+    cases = make_cases()
+    index = CaseIndex(cases)
+    cases[0].update(metadata="1 2 3 4 5 6 7 0 8")
+    index.update(0)
+    assert index.find("1 2 3 4 5 6 7 0 8", "最少移动几步？") == 0
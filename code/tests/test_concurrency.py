@@ -0,0 +1,80 @@
+import sys
+import threading
+import types
+
+import pytest
+
+from agent import MetadataAgent as metadata_agent_module
+from agent.MetadataAgent import MetadataAgent
+from utils.metadata_journal import MetadataJournal
+
+THREADS = 8
+OPS = 40
+
+
+@pytest.fixture
+def agent_factory(tmp_path, monkeypatch):
+    # 元数据写到临时目录（MetadataAgent 以模块所在目录下的 metadata/ 为存储位置）
+    monkeypatch.setattr(metadata_agent_module, "__file__", str(tmp_path / "MetadataAgent.py"))
+    monkeypatch.setitem(sys.modules, "models.concurrency_fake", types.ModuleType("models.concurrency_fake"))
+    agents = []
+
+    def make(storage):
+        agent = MetadataAgent("concurrency", model_name="concurrency_fake", llm_cache=False, storage=storage, near_duplicate="off")
+        agents.append(agent)
+        return agent
+
+    yield make
+    for agent in agents:
+        if hasattr(agent.store, "close"):
+            agent.store.close()
+
+
+def hammer(agent):
+    errors = []
+    barrier = threading.Barrier(THREADS)
+
+    def work(t):
+        try:
+            barrier.wait()
+            for i in range(OPS):
+                # 每个共享样例被所有线程添加，只能留下一个
+                agent.add_case(f"shared {i}", "q", "a")
+                agent.add_case(f"thread {t} case {i}", "q", f"a {t}")
+                if i % 10 == 0:
+                    agent.set_constant(f"constant from {t}")
+                    agent.add_key_value(f"key_{t}", i)
+                if t == 0 and i % 10 == 5:
+                    agent.save_metadata()
+        except Exception as e:   # 线程中的异常需要带回主线程
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(t,)) for t in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def expected_keys():
+    return {f"shared {i}" for i in range(OPS)} | {f"thread {t} case {i}" for t in range(THREADS) for i in range(OPS)}
+
+
+@pytest.mark.parametrize("storage", ["json", "sqlite"])
+def test_concurrent_writes_keep_cases_unique_and_replay(agent_factory, storage):
+    agent = agent_factory(storage)
+    hammer(agent)
+
+    keys = [case["metadata"] for case in agent.cases]
+    assert len(keys) == len(set(keys))
+    assert set(keys) == expected_keys()
+
+    if storage == "json":
+        replayed = MetadataJournal(agent.metadata_file).load()
+    else:
+        replayed = agent_factory(storage).metadata
+    assert [case["metadata"] for case in replayed["cases"]] == keys
+    assert replayed["constant"] == agent.constant
+    assert {key: replayed[key] for key in agent.metadata if key.startswith("key_")} == \
+        {key: value for key, value in agent.metadata.items() if key.startswith("key_")}
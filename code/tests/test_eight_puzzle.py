@@ -0,0 +1,36 @@
+from utils.answer_structure import check_answer_structure
+from utils.eight_puzzle import GOAL, EightPuzzleSolver
+
+START = (1, 2, 3, 4, 5, 6, 0, 7, 8)
+PROBLEM = (START, GOAL)
+
+
+def test_format_answer_fills_object_skeleton():
+    solver = EightPuzzleSolver()
+    solution = solver.solve(PROBLEM)
+    answer = solver.format_answer(solution, '{"moves": "_"}')
+    assert answer == {"moves": ["right", "right"]}
+    assert check_answer_structure('{"moves": "_"}', answer)[0] is True
+    assert solver.verify(PROBLEM, answer, solution) is True
+
+
+def test_format_answer_keeps_list_and_free_text_questions():
+    solver = EightPuzzleSolver()
+    solution = solver.solve(PROBLEM)
+    assert solver.format_answer(solution, '["_"]') == ["right", "right"]
+    assert solver.format_answer(solution, "输出移动序列（上、下、左、右）") == ["右", "右"]
+
+
+def test_format_answer_rejects_unfillable_skeleton():
+    solver = EightPuzzleSolver()
+    solution = solver.solve(PROBLEM)
+    assert solver.format_answer(solution, '{"moves": "_", "steps": "_"}') is None
+    assert solver.format_answer(solution, {"result": {"moves": "_"}}) is None
+
+
+def test_bare_list_does_not_conform_to_object_skeleton():
+    # 插件校验只看移动序列，格式骨架由预检查负责
+    solver = EightPuzzleSolver()
+    solution = solver.solve(PROBLEM)
+    assert solver.verify(PROBLEM, ["right", "right"], solution) is True
+    assert check_answer_structure('{"moves": "_"}', ["right", "right"])[0] is False
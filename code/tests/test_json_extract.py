@@ -0,0 +1,28 @@
+import random
+
+import pytest
+
+from utils import json_extract
+from utils.bench_json_extract import adversarial_inputs, legacy_extract_last_complete_json, random_text
+from utils.json_extract import extract_last_complete_json
+
+
+@pytest.mark.parametrize("window", [0, 1, 7, json_extract._SCAN_WINDOW])
+def test_matches_legacy_on_random_text(monkeypatch, window):
+    # window 为 0 时整段都由 _scan_rest 处理，较小的窗口覆盖窗口与批量扫描的衔接
+    monkeypatch.setattr(json_extract, "_SCAN_WINDOW", window)
+    rng = random.Random(window)
+    for _ in range(3000):
+        text = random_text(rng)
+        assert extract_last_complete_json(text) == legacy_extract_last_complete_json(text), text
+
+
+@pytest.mark.parametrize("name", ["braces_after", "empty_objects", "many_objects", "prose_after", "long_string"])
+def test_matches_legacy_on_adversarial_inputs(name):
+    text = adversarial_inputs(2000)[name]
+    assert extract_last_complete_json(text) == legacy_extract_last_complete_json(text)
+
+
+def test_object_followed_by_prose_is_not_extracted():
+    assert extract_last_complete_json('{"answer": 1} 以上就是答案。') is None
+    assert extract_last_complete_json('说明 {"answer": 1}\n') == {"answer": 1}
@@ -0,0 +1,21 @@
+from utils.json_repair import repair_json
+
+
+def test_salvages_object_followed_by_prose_with_braces():
+    text = '{"answer": {"moves": ["up"]}} 推理：集合 {x} 与 {y} 的映射。'
+    obj, info = repair_json(text, ["answer"])
+    assert obj == {"answer": {"moves": ["up"]}}
+    assert info == {"errors": ["extra_data"], "fixes": ["trailing_text"]}
+
+
+def test_trailing_text_takes_last_object_with_required_keys():
+    text = '{"answer": 1} 更正：{"answer": 2} 另见 {z}；{"note": "x"} 完。'
+    obj, info = repair_json(text, ["answer"])
+    assert obj == {"answer": 2}
+    assert info["fixes"] == ["trailing_text"]
+
+
+def test_trailing_text_is_not_used_when_normal_candidates_work():
+    obj, info = repair_json('{"answer": 1} 以上就是答案。', ["answer"])
+    assert obj == {"answer": 1}
+    assert info == {"errors": [], "fixes": []}
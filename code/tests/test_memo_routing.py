@@ -0,0 +1,32 @@
+import sys
+import types
+
+from agent import MetadataAgent as metadata_agent_module
+from agent.MetadataAgent import MetadataAgent
+from utils.model_router import ModelRouter
+from utils.verification_memo import VerificationMemo
+
+
+def install_model(monkeypatch, name, verdict):
+    module = types.ModuleType(f"models.{name}")
+    module.llm_response = lambda user_dialogue=None, **kwargs: '{"is_correct": %s, "message": ""}' % verdict
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+
+
+def test_memo_records_verdict_under_routed_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(metadata_agent_module, "__file__", str(tmp_path / "MetadataAgent.py"))
+    install_model(monkeypatch, "memo_cheap", "false")
+    install_model(monkeypatch, "memo_strong", "true")
+    # 检查阶段总是选择更便宜的 memo_strong，而不是 model_name
+    router = ModelRouter({"memo_cheap": {"cost": 10}, "memo_strong": {"cost": 1}}, {"check": ["memo_cheap", "memo_strong"]}, explore=0)
+    memo = VerificationMemo(str(tmp_path / "memo.sqlite3"))
+    agent = MetadataAgent("memo", model_name="memo_cheap", llm_cache=False, verification_memo=memo, local_solver=False, router=router)
+
+    assert agent._check_answer("m", "q", "a") is True
+    assert memo.get("memo_strong", agent.constant, "m", "q", "a") is True
+    assert memo.get("memo_cheap", agent.constant, "m", "q", "a") is None
+    assert agent._get_memo_verdict("m", "q", "a") is True
+
+    # 不使用路由器时只复用 model_name 自己的结论
+    plain = MetadataAgent("memo", model_name="memo_cheap", llm_cache=False, verification_memo=memo, local_solver=False)
+    assert plain._get_memo_verdict("m", "q", "a") is None
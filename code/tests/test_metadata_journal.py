@@ -0,0 +1,54 @@
+import json
+
+from utils.metadata_journal import MetadataJournal
+
+
+def case(i):
+    return {"metadata": f"m{i}", "question": "q", "answer": "a"}
+
+
+def append_case(journal, metadata, i):
+    metadata["cases"].append(case(i))
+    journal.append({"op": "set_item", "key": "cases", "index": i, "value": case(i)}, metadata)
+
+
+def write_two_cases(path):
+    journal = MetadataJournal(str(path))
+    metadata = {"metadata_name": "t", "cases": []}
+    journal.append({"op": "set", "key": "cases", "value": []}, metadata)   # 第一次写入时生成快照
+    for i in range(2):
+        append_case(journal, metadata, i)
+    journal.close()
+    return journal.path
+
+
+def test_appends_after_torn_line_survive_reload(tmp_path):
+    snapshot = tmp_path / "t.json"
+    journal_file = write_two_cases(snapshot)
+    with open(journal_file, "a", encoding="utf-8") as f:
+        f.write('{"op": "set_item", "key": "cases", "ind')   # 写入中途崩溃
+
+    journal = MetadataJournal(str(snapshot))
+    metadata = journal.load()
+    assert [c["metadata"] for c in metadata["cases"]] == ["m0", "m1"]
+    for i in range(2, 5):
+        append_case(journal, metadata, i)
+    journal.close()
+
+    reloaded = MetadataJournal(str(snapshot))
+    assert [c["metadata"] for c in reloaded.load()["cases"]] == ["m0", "m1", "m2", "m3", "m4"]
+    assert reloaded.recovery is None
+
+
+def test_complete_last_record_without_newline_is_kept(tmp_path):
+    snapshot = tmp_path / "t.json"
+    journal_file = write_two_cases(snapshot)
+    with open(journal_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"op": "set_item", "key": "cases", "index": 2, "value": case(2)}))
+
+    journal = MetadataJournal(str(snapshot))
+    metadata = journal.load()
+    append_case(journal, metadata, 3)
+    journal.close()
+
+    assert [c["metadata"] for c in MetadataJournal(str(snapshot)).load()["cases"]] == ["m0", "m1", "m2", "m3"]
@@ -0,0 +1,33 @@
+from utils.metadata_store import SQLiteBackend, SQLiteMetadataStore
+
+
+def _reload(path, name):
+    store = SQLiteMetadataStore(path)
+    try:
+        metadata = SQLiteBackend(store, name).load()
+        return metadata, [dict(case) for case in metadata["cases"]]
+    finally:
+        store.close()
+
+
+def test_case_extra_keys_survive_write_and_reload(tmp_path):
+    path = str(tmp_path / "metadata.sqlite3")
+    case = {"metadata": "m1", "question": "q1", "answer": "a1", "variables": {"n": 2}}
+
+    store = SQLiteMetadataStore(path)
+    backend = SQLiteBackend(store, "t")
+    backend.compact({"metadata_name": "t", "constant": "c", "variable": [], "cases": [case]})
+    backend.append({"op": "set_item", "key": "cases", "index": 1,
+                    "value": {"metadata": "m2", "question": "q2", "answer": "a2", "variables": {"n": 3}, "flags": ["near"]}},
+                   {"cases": [case, {}], "variable": []})
+    store.close()
+
+    _, cases = _reload(path, "t")
+    assert cases == [case, {"metadata": "m2", "question": "q2", "answer": "a2", "variables": {"n": 3}, "flags": ["near"]}]
+
+
+def test_search_cases_includes_extra_keys(tmp_path):
+    store = SQLiteMetadataStore(str(tmp_path / "metadata.sqlite3"))
+    SQLiteBackend(store, "t").compact({"metadata_name": "t", "cases": [{"metadata": "m", "question": "q", "answer": "a", "variables": {"n": 1}}]})
+    assert store.search_cases("m") == [{"name": "t", "position": 0, "metadata": "m", "question": "q", "answer": "a", "variables": {"n": 1}}]
+    store.close()
@@ -0,0 +1,32 @@
+import pytest
+import requests
+
+import provider_client
+
+
+class FakeResponse(requests.Response):
+    def __init__(self, status_code):
+        super().__init__()
+        self.status_code = status_code
+        self.url = "http://llm.test/v1/chat"
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+
+    def post(self, url, **kwargs):
+        return self.response
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_non_retryable_error_closes_response(monkeypatch, stream):
+    response = FakeResponse(400)
+    monkeypatch.setattr(provider_client, "get_session", lambda url: FakeSession(response))
+    with pytest.raises(requests.HTTPError):
+        provider_client._send("http://llm.test/v1/chat", {}, {"model": "m", "messages": []}, None, stream=stream)
+    assert response.closed
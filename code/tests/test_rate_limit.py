@@ -0,0 +1,38 @@
+import threading
+import time
+
+import pytest
+
+from call_scope import CallCancelled, CallScope, DeadlineExceeded
+from rate_limit import RateLimiter
+
+
+def test_acquire_raises_when_wait_exceeds_deadline_and_refunds():
+    limiter = RateLimiter(requests_per_min=60, tokens_per_min=1000)
+    limiter.throttle(retry_after=30)
+    requests_before, tokens_before = limiter.requests.tokens, limiter.tokens.tokens
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        limiter.acquire(100, CallScope(timeout=1.0))
+    assert time.monotonic() - start < 0.5
+    assert limiter.requests.tokens == pytest.approx(requests_before, abs=0.1)
+    assert limiter.tokens.tokens == pytest.approx(tokens_before, abs=1)
+    assert limiter.waited == 0
+
+
+def test_acquire_stops_waiting_when_scope_is_cancelled():
+    limiter = RateLimiter()
+    limiter.throttle(retry_after=5)
+    scope = CallScope()
+    threading.Timer(0.1, scope.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(CallCancelled):
+        limiter.acquire(scope=scope)
+    assert time.monotonic() - start < 1.0
+
+
+def test_acquire_waits_within_scope():
+    limiter = RateLimiter()
+    limiter.throttle(retry_after=0.1)
+    limiter.acquire(scope=CallScope(timeout=5))
+    assert limiter.waited > 0
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from utils.variable_space import SOBOL_BITS, VariableSpace, sobol_directions, sobol_points
+
+
+def direct_sobol(index, dims):
+    """逐个下标计算：灰码中每个为 1 的位异或对应的方向数。"""
+    directions = sobol_directions(dims)
+    gray = index ^ (index >> 1)
+    point = np.zeros(dims, dtype=np.uint64)
+    for bit in range(SOBOL_BITS):
+        if (gray >> bit) & 1:
+            point ^= directions[:, bit]
+    return point.astype(np.float64) / float(1 << SOBOL_BITS)
+
+
+@pytest.mark.parametrize("n, dims, skip", [(2, 2, 3), (1, 2, 4), (5, 3, 0), (7, 5, 9), (3, 4, 1000)])
+def test_sobol_window_matches_direct_computation(n, dims, skip):
+    expected = np.array([direct_sobol(i, dims) for i in range(skip, skip + n)])
+    assert np.array_equal(sobol_points(n, dims, skip=skip), expected)
+
+
+def test_sobol_known_points():
+    assert sobol_points(2, 2, skip=3).tolist() == [[0.25, 0.75], [0.375, 0.375]]
+
+
+def test_sobol_continues_from_previous_call():
+    variables = [{"name": "a", "min": 0, "max": 15, "step": 1}, {"name": "b", "min": 0, "max": 15, "step": 1}]
+    space = VariableSpace(variables)
+    chunks = np.vstack([space.sobol(3), space.sobol(2)])
+    assert np.array_equal(chunks, VariableSpace(variables).sobol(5))
+    assert len({tuple(row) for row in chunks}) == 5
+    assert len(VariableSpace(variables).sample(8, method="sobol", seed=0)) == 8
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+answer_structure.py
+在调用 LLM 检查答案之前，本地检查答案是否符合问题给出的格式骨架（与 update_question_with_answer 推导出的骨架同一结构）：
+  - 骨架为对象时，答案必须是对象且包含骨架的全部键，各键的值递归检查；
+  - 骨架为列表时，答案必须是列表：骨架元素结构相同（如 ["_", "_"]）时视为变长列表，每个答案元素都按第一个骨架元素检查；
+    结构不同（如 [0, ["_"]]）时视为定长元组，长度必须相同并逐个检查；空列表不限制元素；
+  - 骨架为标量（"_"、"int"、"list of moves" 等说明文字）时不限制答案。
+问题不是 JSON 结构（自由文本的格式说明）时无法判断，返回 None，由 LLM 检查。
+"""
+
+import json
+from typing import Any, Optional, Tuple
+
+
+def _as_structure(value: Any) -> Any:
+    """本身是 JSON 对象 / 列表的字符串按 JSON 解析。"""
+    if isinstance(value, str) and value.strip()[:1] in ("[", "{"):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+    return value
+
+
+def _shape(value: Any) -> Any:
+    if isinstance(value, (list, tuple)):
+        return [_shape(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    return None
+
+
+def _conforms(skeleton: Any, answer: Any, path: str) -> Tuple[bool, str]:
+    if isinstance(skeleton, dict):
+        if not isinstance(answer, dict):
+            return False, f"{path or '答案'}应为对象，实际为 {type(answer).__name__}"
+        for key, item in skeleton.items():
+            if key not in answer:
+                return False, f"{path or '答案'}缺少键 {key!r}"
+            ok, reason = _conforms(item, answer[key], f"{path}.{key}" if path else str(key))
+            if not ok:
+                return ok, reason
+        return True, ""
+    if isinstance(skeleton, (list, tuple)):
+        if not isinstance(answer, (list, tuple)):
+            return False, f"{path or '答案'}应为列表，实际为 {type(answer).__name__}"
+        if not skeleton:
+            return True, ""
+        shapes = [_shape(item) for item in skeleton]
+        if all(shape == shapes[0] for shape in shapes):
+            templates = [skeleton[0]] * len(answer)
+        elif len(answer) != len(skeleton):
+            return False, f"{path or '答案'}应有 {len(skeleton)} 个元素，实际为 {len(answer)} 个"
+        else:
+            templates = skeleton
+        for i, (template, item) in enumerate(zip(templates, answer)):
+            ok, reason = _conforms(template, item, f"{path}[{i}]")
+            if not ok:
+                return ok, reason
+        return True, ""
+    return True, ""
+
+
+def check_answer_structure(question: Any, answer: Any) -> Tuple[Optional[bool], str]:
+    """
+    检查答案是否符合问题的格式骨架。
+    :return: (是否符合, 不符合的原因)；问题不是 JSON 结构时为 (None, "")。答案为空时不符合。
+    """
+    question, answer = _as_structure(question), _as_structure(answer)
+    if not isinstance(question, (dict, list, tuple)):
+        return None, ""
+    if answer is None or answer == "":
+        return False, "答案为空"
+    return _conforms(question, answer, "")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+bench_json_extract.py
+对比 extract_last_complete_json 的旧实现（反向扫描 + 每个候选位置 json.loads(text[i:])）与
+utils/json_extract.py 中基于 raw_decode 的实现：
+  1) 在若干对抗性输入上测量耗时；
+  2) 随机生成文本做差分校验：新实现必须与旧实现返回相同的结果（包括都返回 None）。
+用法（在 code 目录下）：
+  python -m utils.bench_json_extract [--size 20000] [--repeat 3] [--fuzz 20000] [--seed 0]
+返回码：
+  0  差分校验通过
+  1  发现不一致
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from typing import Callable, Dict, List
+
+from utils.json_extract import extract_last_complete_json
+
+
+def legacy_extract_last_complete_json(text: str):
+    """旧实现（原 MetadataAgent.extract_last_complete_json），仅用于对比。"""
+    _CODE_BLOCK_RE = re.compile(r"```json\s*(.*?)\s*```", re.S)
+
+    def _try_load(blob: str):
+        try:
+            return json.loads(blob)
+        except json.JSONDecodeError:
+            return None
+
+    for block in reversed(_CODE_BLOCK_RE.findall(text)):
+        obj = _try_load(block)
+        if obj is not None:
+            return obj
+
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(len(text) - 1, -1, -1):
+        ch = text[i]
+        if in_string:
+            escape = (ch == '\\') and not escape
+            if ch == '"' and not escape:
+                in_string = False
+            continue
+        else:
+            if ch == '"':
+                in_string = True
+                continue
+
+        if ch == '}':
+            depth += 1
+        elif ch == '{':
+            depth -= 1
+            if depth == 0:
+                obj = _try_load(text[i:])
+                if obj is not None:
+                    return obj
+    return None
+
+
+def adversarial_inputs(size: int) -> Dict[str, str]:
+    """构造对抗性输入，size 为大致字符数。"""
+    answer = '{"is_correct": true, "message": "ok"}'
+    prose = "Consider the set {x} and the map {y}. "
+    return {
+        # 答案之后的推理里还有大量花括号且以 '}' 结尾：旧实现在每个 '{' 处复制并解析一次后缀
+        "braces_after": answer + " " + prose * (size // len(prose)) + "{z}",
+        # 大量空对象后跟一个非 JSON 的 {...}：同上
+        "empty_objects": "{}" * (size // 2) + " {x}",
+        # 很多小的合法对象，最后一个是答案（常见情况）
+        "many_objects": '{"step": 1} ' * (size // 12) + answer,
+        # 答案之后还有普通说明文字（旧实现扫描全文后返回 None）
+        "prose_after": answer + " because {1, 2, 3} holds." * (size // 26),
+        # 长字符串里有大量转义与括号
+        "long_string": '{"answer": "' + '\\"{}' * (size // 4) + '"}',
+        # 深度嵌套且不闭合（例如输出被截断）
+        "unclosed_nested": '{"a": ' * (size // 6) + "1",
+    }
+
+
+def random_text(rng: random.Random) -> str:
+    pieces = [
+        "{", "}", '"', "\\", " ", "\n", "x", ":", ",", "1", "[", "]",
+        '{"a": 1}', '{"b": {"c": [1, 2]}}', '{"s": "}{"}', '{"e": "\\"{"}',
+        "```json\n", "\n```", "```", "null", "true",
+        "Here is the answer: ", " Hope this helps.", "答案：", '{"说明": "括号{"}',
+    ]
+    return "".join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+
+
+def time_it(func: Callable[[str], object], text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="extract_last_complete_json 基准测试与差分校验。")
+    parser.add_argument("--size", type=int, default=20000, help="对抗性输入的大致字符数")
+    parser.add_argument("--repeat", type=int, default=3, help="每个输入重复次数（取最快一次）")
+    parser.add_argument("--fuzz", type=int, default=20000, help="差分校验的随机样本数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    print(f"{'input':<18}{'legacy (s)':>14}{'new (s)':>14}{'speedup':>10}")
+    for name, text in adversarial_inputs(args.size).items():
+        try:
+            legacy = time_it(legacy_extract_last_complete_json, text, args.repeat)
+        except RecursionError:
+            legacy = float("nan")
+        new = time_it(extract_last_complete_json, text, args.repeat)
+        print(f"{name:<18}{legacy:>14.5f}{new:>14.5f}{legacy / new if new else float('inf'):>9.1f}x")
+
+    rng = random.Random(args.seed)
+    mismatches: List[str] = []
+    for _ in range(args.fuzz):
+        text = random_text(rng)
+        try:
+            old = legacy_extract_last_complete_json(text)
+        except RecursionError:
+            continue
+        new = extract_last_complete_json(text)
+        if old != new:
+            mismatches.append(text)
+
+    print(f"\n差分校验：{args.fuzz} 个样本，不一致 {len(mismatches)} 个。")
+    for text in mismatches[:10]:
+        print(f"  {text!r}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
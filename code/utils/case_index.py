@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+case_index.py
+元数据样例的索引：
+  1) 精确去重：以规范化后的 (metadata, question) 为键的哈希表，查找为 O(1)；
+  2) 近似重复检测：对 metadata 和 question 分别计算字符 n-gram 的 MinHash 签名，按 metadata 签名用 LSH 分桶，
+     只与同桶的候选比较签名；两部分估计的 Jaccard 相似度都达到阈值才算近似重复
+     （只有 metadata 不同的样例是不同的问题实例，例如只差一步的两个 8 拼图状态）。
+索引绑定一个样例列表，列表只追加时增量更新；样例被原地修改后调用 update(i) 更新该位置。
+MinHash 签名在第一次查询近似重复时才计算。
+"""
+
+import json
+import re
+import unicodedata
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+NEAR_DUPLICATE_THRESHOLD = 0.8  # 估计的 Jaccard 相似度不低于该值视为近似重复
+NUM_PERM = 64                   # MinHash 签名长度
+BANDS = 16                      # LSH 分段数，每段 NUM_PERM // BANDS 行
+SHINGLE_SIZE = 5                # 字符 n-gram 的长度（对中文同样适用）
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(value: Any) -> str:
+    """规范化文本：非字符串（以及本身是 JSON 的字符串）统一序列化为 JSON，再做 NFKC、大小写折叠并合并空白。"""
+    if isinstance(value, str) and value.lstrip()[:1] in ("[", "{"):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            pass
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    value = unicodedata.normalize("NFKC", value).casefold()
+    return _WHITESPACE_RE.sub(" ", value).strip()
+
+
+def case_key(metadata: Any, question: Any) -> Tuple[str, str]:
+    """样例的精确去重键。"""
+    return normalize_text(metadata), normalize_text(question)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """字符 n-gram 集合，文本短于 size 时整体作为一个元素。"""
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        # 乘法移位哈希 ((a * x + b) mod 2^64) >> 32 作为 num_perm 个近似独立的置换，a 为 64 位随机奇数
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        high = rng.randint(0, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+        low = rng.randint(0, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+        self._a = (high << np.uint64(32)) | low | np.uint64(1)
+        self._b = rng.randint(0, 1 << 32, size=(num_perm, 1), dtype=np.uint64) << np.uint64(32)
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.uint64)
+        return tuple(((self._a * hashes + self._b) >> np.uint64(32)).min(axis=1).tolist())
+
+
+def estimate_similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    """由两个 MinHash 签名估计 Jaccard 相似度。"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class CaseIndex:
+    def __init__(self, cases: List[Dict[str, Any]], threshold: float = NEAR_DUPLICATE_THRESHOLD,
+                 num_perm: int = NUM_PERM, bands: int = BANDS):
+        """
+        :param cases: 被索引的样例列表（直接引用，之后对它的追加会被增量索引）。
+        :param threshold: 近似重复的相似度阈值。
+        :param num_perm: MinHash 签名长度。
+        :param bands: LSH 分段数，需要整除 num_perm。
+        """
+        self.cases = cases
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._hasher = MinHasher(num_perm)
+        self._keys = {}          # 规范化键 -> 第一个出现的位置
+        self._key_list = []      # 每个位置的规范化键，用于发现样例被原地修改
+        self._signatures = []    # 每个位置的 (metadata 签名, question 签名)
+        self._buckets = {}       # (分段, metadata 签名的分段) -> 位置列表
+
+    def __len__(self):
+        return len(self._key_list)
+
+    def rebuild(self):
+        """样例列表被删减或原地修改后重建索引。"""
+        self._keys.clear()
+        self._key_list.clear()
+        self._signatures.clear()
+        self._buckets.clear()
+        self._sync()
+
+    def update(self, i: int, case: Optional[Dict[str, Any]] = None):
+        """
+        位置 i 的样例被原地修改（或替换为 case）后更新该位置的键与签名。
+        :param case: 新的样例，为 None 时读取 self.cases[i]。
+        """
+        if i >= len(self._key_list):
+            self._sync()
+            return
+        if case is None:
+            case = self.cases[i]
+        old_key = self._key_list[i]
+        key = case_key(case.get("metadata"), case.get("question"))
+        if key == old_key:
+            return
+        self._key_list[i] = key
+        if self._keys.get(old_key) == i:
+            # 该键改为指向剩下的第一个相同样例
+            del self._keys[old_key]
+            for j, other in enumerate(self._key_list):
+                if other == old_key:
+                    self._keys[old_key] = j
+                    break
+        if self._keys.get(key, i) >= i:
+            self._keys[key] = i
+        if i < len(self._signatures):
+            for band_key in self._band_keys(self._signatures[i][0]):
+                self._buckets[band_key].remove(i)
+            self._signatures[i] = self._signature(key)
+            for band_key in self._band_keys(self._signatures[i][0]):
+                self._buckets.setdefault(band_key, []).append(i)
+
+    def _sync(self):
+        if len(self.cases) < len(self._key_list):
+            self.rebuild()
+            return
+        for i in range(len(self._key_list), len(self.cases)):
+            key = case_key(self.cases[i].get("metadata"), self.cases[i].get("question"))
+            self._key_list.append(key)
+            self._keys.setdefault(key, i)
+
+    def find(self, metadata: Any, question: Any) -> Optional[int]:
+        """返回规范化后与 (metadata, question) 相同的已有样例位置，不存在时返回 None。"""
+        self._sync()
+        key = case_key(metadata, question)
+        index = self._keys.get(key)
+        if index is not None and case_key(self.cases[index].get("metadata"), self.cases[index].get("question")) != key:
+            # 样例被原地修改过
+            self.rebuild()
+            index = self._keys.get(key)
+        return index
+
+    def find_similar(self, metadata: Any, question: Any) -> Optional[Tuple[int, float]]:
+        """
+        查找近似重复的已有样例。
+        :return: (位置, 估计的相似度)，相似度取 metadata 与 question 两者中较低的一个，返回相似度最高的样例；
+                 没有达到阈值的样例时返回 None。
+        """
+        self._sync()
+        self._sync_signatures()
+        meta_sig, question_sig = self._signature(case_key(metadata, question))
+        candidates = set()
+        for band_key in self._band_keys(meta_sig):
+            candidates.update(self._buckets.get(band_key, ()))
+        best = None
+        for i in candidates:
+            other_meta_sig, other_question_sig = self._signatures[i]
+            score = min(estimate_similarity(meta_sig, other_meta_sig), estimate_similarity(question_sig, other_question_sig))
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (i, score)
+        return best
+
+    def _signature(self, key: Tuple[str, str]):
+        return self._hasher.signature(key[0]), self._hasher.signature(key[1])
+
+    def _sync_signatures(self):
+        for i in range(len(self._signatures), len(self._key_list)):
+            signatures = self._signature(self._key_list[i])
+            self._signatures.append(signatures)
+            for band_key in self._band_keys(signatures[0]):
+                self._buckets.setdefault(band_key, []).append(i)
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
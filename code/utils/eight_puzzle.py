@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+eight_puzzle.py
+8 拼图（8_metadata）的本地求解 / 校验插件。
+状态是 3×3 网格按行展开的 9 元组，0 表示空格；移动指空格的移动方向（up / down / left / right，或 上 / 下 / 左 / 右）。
+  - 求解：A*（曼哈顿距离），逆序数奇偶性不同的状态直接判为无解；
+  - 预计算表：从标准目标状态 [[1, 2, 3], [4, 5, 6], [7, 8, 0]] 出发做一次 BFS，记录全部 9! 个排列（其中 181,440 个可解）
+    到目标的最短步数（int8，-1 为无解），查表求解和校验都是微秒级。表为可选项：
+        python -m utils.eight_puzzle --build-table agent/cache/solver_tables
+  - 校验：候选答案的每一步都合法、最终到达目标，且步数等于最短步数（最短路径不唯一，不要求与求解结果相同）；
+    也接受按“滑块移动方向”书写的答案。无解的状态要求答案表示无解。
+"""
+
+import argparse
+import heapq
+import json
+import math
+import os
+import re
+import time
+from collections import deque
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from utils.solver_registry import SolverPlugin
+
+GOAL = (1, 2, 3, 4, 5, 6, 7, 8, 0)
+MOVES = {"up": -3, "down": 3, "left": -1, "right": 1}
+OPPOSITE = {"up": "down", "down": "up", "left": "right", "right": "left"}
+MOVE_ALIASES = {"up": "up", "down": "down", "left": "left", "right": "right", "u": "up", "d": "down", "l": "left", "r": "right",
+                "上": "up", "下": "down", "左": "left", "右": "right"}
+MOVE_NAMES_CH = {"up": "上", "down": "下", "left": "左", "right": "右"}
+UNSOLVABLE = "unsolvable"
+UNSOLVABLE_CH = "无解"
+ANSWER_KEYS = ("moves", "answer", "solution")   # 对象形式的答案中存放移动序列的键
+TABLE_FILE = "8_puzzle.npy"
+
+_GRID_RE = re.compile(r"\[\s*\[([^\[\]]*)\]\s*,\s*\[([^\[\]]*)\]\s*,\s*\[([^\[\]]*)\]\s*\]")
+_MOVE_RE = re.compile(r"up|down|left|right|[上下左右]", re.IGNORECASE)
+_LETTER_MOVES_RE = re.compile(r"^[UDLR\s,，、;]+$", re.IGNORECASE)
+_UNSOLVABLE_RE = re.compile(r"unsolvable|no solution|not solvable|impossible|无解|不存在|不可解|无法到达", re.IGNORECASE)
+_FACTORIALS = [math.factorial(i) for i in range(9)]
+
+
+def parse_grids(text: Any) -> List[Tuple[int, ...]]:
+    """提取文本中所有 3×3 网格（0–8 各出现一次）。"""
+    if not isinstance(text, str):
+        text = json.dumps(text)
+    grids = []
+    for rows in _GRID_RE.findall(text):
+        cells = re.findall(r"-?\d+", ",".join(rows))
+        if len(cells) == 9 and sorted(int(cell) for cell in cells) == list(range(9)):
+            grids.append(tuple(int(cell) for cell in cells))
+    return grids
+
+
+def is_solvable(start: Tuple[int, ...], goal: Tuple[int, ...] = GOAL) -> bool:
+    """3×3 网格中，两个状态可以互相到达当且仅当（忽略空格的）逆序数奇偶性相同。"""
+    def parity(state):
+        tiles = [tile for tile in state if tile]
+        return sum(a > b for i, a in enumerate(tiles) for b in tiles[i + 1:]) % 2
+    return parity(start) == parity(goal)
+
+
+def neighbors(state: Tuple[int, ...]):
+    blank = state.index(0)
+    row, col = divmod(blank, 3)
+    for move, offset in MOVES.items():
+        if (move == "up" and row == 0) or (move == "down" and row == 2) or (move == "left" and col == 0) or (move == "right" and col == 2):
+            continue
+        target = blank + offset
+        cells = list(state)
+        cells[blank], cells[target] = cells[target], 0
+        yield move, tuple(cells)
+
+
+def apply_moves(state: Tuple[int, ...], moves: List[str]) -> Optional[Tuple[int, ...]]:
+    """依次移动空格，遇到非法移动时返回 None。"""
+    for move in moves:
+        for name, nxt in neighbors(state):
+            if name == move:
+                state = nxt
+                break
+        else:
+            return None
+    return state
+
+
+def rank(state: Tuple[int, ...]) -> int:
+    """排列的字典序编号（Lehmer 码），范围 0 … 9!-1。"""
+    result = 0
+    for i, value in enumerate(state):
+        result += sum(other < value for other in state[i + 1:]) * _FACTORIALS[8 - i]
+    return result
+
+
+def build_table() -> np.ndarray:
+    """从 GOAL 出发 BFS，返回按 rank 编号的最短步数表（-1 为无解）。"""
+    table = np.full(math.factorial(9), -1, dtype=np.int8)
+    table[rank(GOAL)] = 0
+    queue = deque([(GOAL, 0)])
+    while queue:
+        state, distance = queue.popleft()
+        for _, nxt in neighbors(state):
+            index = rank(nxt)
+            if table[index] < 0:
+                table[index] = distance + 1
+                queue.append((nxt, distance + 1))
+    return table
+
+
+def astar(start: Tuple[int, ...], goal: Tuple[int, ...] = GOAL) -> Optional[Tuple[str, ...]]:
+    """A* 搜索（曼哈顿距离），返回最短移动序列，无解时返回 None。"""
+    if not is_solvable(start, goal):
+        return None
+    target = {tile: divmod(i, 3) for i, tile in enumerate(goal)}
+
+    def heuristic(state):
+        return sum(abs(r - target[tile][0]) + abs(c - target[tile][1]) for i, tile in enumerate(state) if tile for r, c in [divmod(i, 3)])
+
+    frontier = [(heuristic(start), 0, start)]
+    parents = {start: None}
+    costs = {start: 0}
+    while frontier:
+        _, cost, state = heapq.heappop(frontier)
+        if state == goal:
+            moves = []
+            while parents[state] is not None:
+                state, move = parents[state]
+                moves.append(move)
+            return tuple(reversed(moves))
+        if cost > costs[state]:
+            continue
+        for move, nxt in neighbors(state):
+            if cost + 1 < costs.get(nxt, cost + 2):
+                costs[nxt] = cost + 1
+                parents[nxt] = (state, move)
+                heapq.heappush(frontier, (cost + 1 + heuristic(nxt), cost + 1, nxt))
+    return None
+
+
+def _answer_value(answer: Any) -> Any:
+    """对象形式的答案取出移动序列所在的值：moves / answer / solution 键，或只有一个键时的值。"""
+    if isinstance(answer, dict):
+        key = next((key for key in ANSWER_KEYS if key in answer), None)
+        if key is None and len(answer) == 1:
+            key = next(iter(answer))
+        return answer if key is None else answer[key]
+    return answer
+
+
+def parse_moves(answer: Any) -> Optional[List[str]]:
+    """把候选答案解析为移动序列，无法解析时返回 None。"""
+    if isinstance(answer, str):
+        text = answer.strip()
+        if text[:1] in ("[", "{", '"'):
+            try:
+                answer = json.loads(text)
+            except json.JSONDecodeError:
+                pass
+    answer = _answer_value(answer)
+    if isinstance(answer, (list, tuple)):
+        moves = [MOVE_ALIASES.get(str(move).strip().lower(), None) for move in answer]
+        return None if None in moves else moves
+    if not isinstance(answer, str):
+        return None
+    if _LETTER_MOVES_RE.match(answer) and not _MOVE_RE.search(answer):
+        return [MOVE_ALIASES[letter.lower()] for letter in answer if letter.isalpha()]
+    return [MOVE_ALIASES[move.lower()] for move in _MOVE_RE.findall(answer)]
+
+
+def is_unsolvable_answer(answer: Any) -> bool:
+    if answer is None:
+        return True
+    if isinstance(answer, dict):
+        answer = _answer_value(answer)
+        if answer is None:
+            return True
+    return isinstance(answer, str) and bool(_UNSOLVABLE_RE.search(answer))
+
+
+class EightPuzzleSolver(SolverPlugin):
+    name = "8_metadata"
+
+    def __init__(self, table: np.ndarray = None):
+        """:param table: build_table() 的结果；为 None 时用 A* 求解（在进程池中运行）。"""
+        self.table = table
+        self.use_process_pool = table is None
+
+    def __getstate__(self):
+        # 进程池中只运行 A*，不传输预计算表
+        state = dict(self.__dict__)
+        state["table"] = None
+        return state
+
+    def parse(self, metadata: Any, question: Any) -> Optional[Tuple[Tuple[int, ...], Tuple[int, ...]]]:
+        """
+        metadata 中只有一个网格时，它是初始状态，目标为 GOAL；有两个网格时，若其中恰好一个是 GOAL 则另一个是初始状态，
+        否则依次为初始状态和目标状态。其他情况返回 None（由 LLM 处理）。
+        """
+        grids = parse_grids(metadata)
+        if len(grids) == 1:
+            # 只给出目标状态时，初始状态在文字描述中，无法解析
+            return None if grids[0] == GOAL else (grids[0], GOAL)
+        if len(grids) == 2:
+            if (grids[0] == GOAL) != (grids[1] == GOAL):
+                return (grids[1] if grids[0] == GOAL else grids[0]), GOAL
+            return grids[0], grids[1]
+        return None
+
+    def solve(self, problem) -> Optional[Tuple[str, ...]]:
+        start, goal = problem
+        if self.table is None or goal != GOAL:
+            return astar(start, goal)
+        distance = int(self.table[rank(start)])
+        if distance < 0:
+            return None
+        moves, state = [], start
+        while distance > 0:
+            for move, nxt in neighbors(state):
+                if self.table[rank(nxt)] == distance - 1:
+                    moves.append(move)
+                    state, distance = nxt, distance - 1
+                    break
+        return tuple(moves)
+
+    def verify(self, problem, answer: Any, solution: Any) -> Optional[bool]:
+        start, goal = problem
+        if solution is None:
+            return is_unsolvable_answer(answer)
+        if is_unsolvable_answer(answer):
+            return False
+        moves = parse_moves(answer)
+        if moves is None or len(moves) != len(solution):
+            return False
+        # 也接受按滑块移动方向书写的答案
+        return apply_moves(start, moves) == goal or apply_moves(start, [OPPOSITE[move] for move in moves]) == goal
+
+    def format_answer(self, solution: Any, question: Any) -> Any:
+        """
+        问题中出现中文方向词时输出中文。问题是 JSON 格式骨架时按骨架输出：
+        列表骨架直接输出移动序列，只有一个键的对象骨架（如 {"moves": "_"}）把移动序列填入该键，
+        其他骨架（多个键、嵌套结构）无法填入，返回 None。
+        """
+        skeleton = question
+        if isinstance(question, str) and question.strip()[:1] in ("[", "{"):
+            try:
+                skeleton = json.loads(question)
+            except json.JSONDecodeError:
+                pass
+        text = question if isinstance(question, str) else json.dumps(question, ensure_ascii=False)
+        chinese = re.search(r"[上下左右]", text) is not None
+        if solution is None:
+            answer = UNSOLVABLE_CH if chinese else UNSOLVABLE
+        else:
+            answer = [MOVE_NAMES_CH[move] if chinese else move for move in solution]
+        if isinstance(skeleton, dict):
+            if len(skeleton) != 1 or isinstance(next(iter(skeleton.values())), dict):
+                return None
+            return {next(iter(skeleton)): answer}
+        return answer
+
+
+def create_solver(table_dir: str = None) -> EightPuzzleSolver:
+    """table_dir 中存在预计算表时加载，否则使用 A*。"""
+    path = None if table_dir is None else os.path.join(table_dir, TABLE_FILE)
+    if path is not None and os.path.exists(path):
+        return EightPuzzleSolver(np.load(path))
+    return EightPuzzleSolver()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建 8 拼图的预计算最短步数表")
+    parser.add_argument("--build-table", metavar="DIR", required=True, help="表文件所在目录")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    table = build_table()
+    os.makedirs(args.build_table, exist_ok=True)
+    np.save(os.path.join(args.build_table, TABLE_FILE), table)
+    print(f"可解状态 {int((table >= 0).sum())} 个，最大步数 {int(table.max())}，耗时 {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+json_extract.py
+从 LLM 响应文本中提取最后一个完整的 JSON 对象。
+
+1. 优先使用最后一个可以解析的 ```json``` 代码块；
+2. 否则从后往前定位以最后一个 '}' 结尾的对象（文本在该对象之后只能有空白）。
+结果与原实现（反向扫描，在每个候选位置 json.loads(text[i:])）完全一致，但所有候选都用 JSONDecoder.raw_decode
+在原文本的偏移处直接解码，不反复复制后缀；不可能是对象起点的 '{'（后面不是引号或 '}'）会被直接跳过。
+反向扫描先在末尾的一小段里逐个查看引号和括号（常见情况下对象就在末尾），超出这一段后改为按引号整体切分、
+用 accumulate 一次算出括号深度，只在深度回到 0 的 '{' 处回到 Python 层，长字符串和大量括号不再逐个处理。
+"""
+
+import json
+import re
+from itertools import accumulate
+from typing import Any, Optional
+
+_CODE_BLOCK_RE = re.compile(r"```json\s*(.*?)\s*```", re.S)
+_OBJECT_START_RE = re.compile(r'\{[ \t\n\r]*["}]')   # 合法 JSON 对象的开头
+_REVERSED_CODE_RE = re.compile(r'[{}"]')             # 反向扫描时字符串外需要关注的字符
+_BRACE_RE = re.compile(r"[{}]")
+_NON_MARK_BYTES = bytes(b for b in range(256) if b not in b'{}"')
+_MARK_STEP = [0] * 256                               # 反向扫描时 '}' 加深、'{' 变浅
+_MARK_STEP[ord("}")], _MARK_STEP[ord("{")] = 1, -1
+_JSON_WHITESPACE = " \t\n\r"
+_SCAN_WINDOW = 256                                   # 逐个查看引号和括号的末尾长度
+_DECODER = json.JSONDecoder()
+
+
+def extract_last_complete_json(text: str) -> Any:
+    """
+    提取文本中的最后一个完整的JSON对象
+    """
+    if not text:
+        return None
+
+    # ---------- 1) 先看 ```json``` 代码块 ----------
+    for match in reversed(list(_CODE_BLOCK_RE.finditer(text))):
+        obj = _decode_at(text, match.start(1), match.end(1))
+        if obj is not None:
+            return obj                    # 嵌套无限制
+
+    # ---------- 2) 文本以 '}' 结尾：从后往前定位 {...} ----------
+    # （json.loads(text[i:]) 要求对象之后只有空白，其余情况原实现扫描全文后返回 None）
+    tail = len(text.rstrip(_JSON_WHITESPACE))
+    if tail and text[tail - 1] == "}":
+        return _trailing_object(text, tail)
+    return None
+
+
+def _decode_at(text: str, start: int, end: Optional[int] = None) -> Any:
+    """
+    在原文本的 start 处解码一个 JSON 值。
+    :param end: 要求值恰好在该位置结束；为 None 时不限制。
+    """
+    try:
+        obj, obj_end = _DECODER.raw_decode(text, start)
+    except (ValueError, RecursionError):
+        return None
+    if end is not None and obj_end != end:
+        return None
+    return obj
+
+
+def _trailing_object(text: str, tail: int) -> Optional[dict]:
+    """
+    反向扫描找到以 text[tail-1] 结尾的对象。状态机与候选起点的顺序与原实现完全一致：
+    字符串外遇到 '}' 深度加一、'{' 深度减一，深度为 0 的 '{' 是候选起点，解码失败则继续向左。
+    （反向扫描时，字符串内的 '"' 总是结束字符串：原实现的转义判断对 '"' 本身恒为 False。）
+    末尾 _SCAN_WINDOW 个字符内借助正则只在引号和括号处停下；没有找到时交给 _scan_rest 批量处理剩余部分。
+    """
+    start = max(0, tail - _SCAN_WINDOW)
+    window = text[start:tail][::-1]
+    depth = 0
+    j = 0                                 # 已处理到 window[j]（之前的部分不在字符串内）
+    while True:
+        m = _REVERSED_CODE_RE.search(window, j)
+        if m is None:
+            break
+        ch = m.group()
+        if ch == '"':
+            # 忽略字符串内部的大括号
+            end = window.find('"', m.end()) + 1
+            if end == 0:
+                break                     # 字符串可能延伸到窗口之外
+            j = end
+            continue
+        j = m.end()
+        if ch == '}':
+            depth += 1
+        else:
+            depth -= 1
+            i = tail - j                  # 对应原文本中的位置
+            if depth == 0 and _OBJECT_START_RE.match(text, i):   # 找到闭合
+                obj = _decode_at(text, i, tail)
+                if obj is not None:
+                    return obj            # 支持任意嵌套
+                # 否则继续向左找上一层可能的 '{'
+    if start == 0:
+        return None                       # 窗口已覆盖全文（或停在未闭合的字符串里）
+    return _scan_rest(text, tail, tail - j, depth)
+
+
+def _scan_rest(text: str, tail: int, end: int, depth: int) -> Optional[dict]:
+    """
+    从 text[end-1] 起继续反向扫描，depth 为此时的括号深度。
+    反转后按引号切开：偶数段在字符串外，奇数段在字符串内（引号个数为奇数时最后一段是未闭合的字符串，之后没有候选）。
+    字符串外的各段以 '"' 连接后只保留括号与引号（UTF-8 中其他字符的编码不含这三个字节），用 accumulate 算出深度，
+    再用 list.index 找到深度为 0 的 '{'，只有这些位置才换算回原文本中的偏移。
+    """
+    parts = text[:end][::-1].split('"')
+    outside = parts[::2]
+    marks = '"'.join(outside).encode("utf-8", "surrogatepass").translate(None, _NON_MARK_BYTES)
+    depths = list(accumulate(map(_MARK_STEP.__getitem__, marks), initial=depth))   # depths[k + 1]：marks[k] 之后
+    part = 0                              # 候选所在的 outside 段
+    part_start = 0                        # 该段在 marks 中的起点
+    checked = 0                           # marks 中已数过引号的位置
+    offset = 0                            # 该段在反转文本中的起点
+    positions = None                      # 该段中括号的位置
+    k = 0
+    while True:
+        try:
+            k = depths.index(0, k + 1)
+        except ValueError:
+            return None
+        mark = k - 1
+        if marks[mark] != 0x7B:
+            continue                      # 从负深度回到 0 的 '}'，或其后的段分隔
+        skipped = marks.count(b'"', checked, mark)
+        if skipped:
+            offset += sum(map(len, parts[2 * part:2 * (part + skipped)])) + 2 * skipped
+            part += skipped
+            part_start = marks.rfind(b'"', checked, mark) + 1
+            positions = None
+        checked = mark
+        if positions is None:
+            positions = [m.start() for m in _BRACE_RE.finditer(outside[part])]
+        i = end - 1 - offset - positions[mark - part_start]
+        if _OBJECT_START_RE.match(text, i):
+            obj = _decode_at(text, i, tail)
+            if obj is not None:
+                return obj
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+json_repair.py
+在本地修复“几乎合法”的 JSON 对象，避免仅因格式问题重新调用 LLM。
+能处理的问题（前四类与 utils/validate_json.py 的 COMMON_ERROR_HINTS 同名）：
+  - trailing_comma：对象/数组末尾多余的逗号；
+  - single_quotes：用单引号包裹的键或字符串；
+  - unquoted_key：未加引号的键名；
+  - control_character：字符串中未转义的换行、制表符等控制字符；
+  - python_literal：Python 的 None / True / False；
+  - invalid_escape：字符串中非法的反斜杠转义。
+修复后仍无法解析时，再按 parse_structure 的顺序（json.loads → ast.literal_eval → 单引号替换）兜底。
+最后处理对象之后还有说明文字、且说明文字里的括号打乱了配对的情况（trailing_text）：
+正向扫描出所有完整的顶层对象，从最后一个开始取满足要求的。
+"""
+
+import ast
+import json
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils.validate_json import classify_common_error
+
+_FENCED_BLOCK_RE = re.compile(r"```(?:json|python)?\s*(.*?)\s*```", re.S | re.I)
+_IDENTIFIER_RE = re.compile(r"[^\W\d]\w*")   # 与 str.isalpha 一致，包括中文等非 ASCII 字母
+_PYTHON_LITERALS = {"None": "null", "True": "true", "False": "false"}
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+_VALID_ESCAPES = set('"\\/bfnrtu')
+_OBJECT_START_RE = re.compile(r'\{[ \t\n\r]*["}]')   # 合法 JSON 对象的开头
+_DECODER = json.JSONDecoder()
+
+
+def parse_structure(text: str) -> Any:
+    """
+    将字符串解析成对应的 Python 数据结构（list / dict / str / int / …）。
+
+    解析顺序：
+    1. json.loads（标准 JSON）
+    2. ast.literal_eval（Python 字面量）
+    3. 单引号→双引号替换后再次尝试 json.loads
+    """
+    # 已经是 Python 对象，直接返回
+    if not isinstance(text, str):
+        return text
+
+    # 尝试严格 JSON
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    # 尝试 Python 字面量
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        pass
+
+    # 把单引号替换为双引号再试一次 JSON
+    text_fixed = re.sub(r"'", r'"', text)
+    try:
+        return json.loads(text_fixed)
+    except json.JSONDecodeError:
+        pass
+
+    # 全部失败，说明格式无法识别
+    raise ValueError("无法将输入解析为有效的数据结构")
+
+
+def repair_json(text: str, required_keys: Optional[List[str]] = None) -> Tuple[Optional[dict], Dict[str, List[str]]]:
+    """
+    从 LLM 响应中找出最后一个近似 JSON 的对象并尝试修复。
+    :param required_keys: 对象中必须包含（且不为 None）的键，不满足的候选会被跳过。
+    :return: (对象, 信息)。对象为修复后的 dict，失败时为 None；
+             信息为 {"errors": 原始解析错误的类别, "fixes": 实际应用的修复}。
+    """
+    info = {"errors": [], "fixes": []}
+    if not text:
+        return None, info
+
+    for blob in _candidate_blobs(text):
+        try:
+            obj = json.loads(blob)
+        except json.JSONDecodeError as e:
+            errors = classify_common_error(e.msg) or ["other"]
+        except RecursionError:
+            continue
+        else:
+            if _accepted(obj, required_keys):
+                return obj, info
+            continue
+
+        fixed, fixes = normalize_json(blob)
+        try:
+            obj = json.loads(fixed)
+        except (json.JSONDecodeError, RecursionError):
+            obj = None
+        if not isinstance(obj, dict):
+            # 兜底：Python 字面量等
+            try:
+                obj = parse_structure(blob)
+            except (ValueError, TypeError, MemoryError, RecursionError):
+                obj = None
+            fixes = ["parse_structure"]
+        if _accepted(obj, required_keys):
+            info["errors"] = errors
+            info["fixes"] = fixes
+            return obj, info
+
+    for obj in reversed(_top_level_objects(text)):
+        if _accepted(obj, required_keys):
+            info["errors"] = ["extra_data"]
+            info["fixes"] = ["trailing_text"]
+            return obj, info
+    return None, info
+
+
+def normalize_json(blob: str) -> Tuple[str, List[str]]:
+    """
+    单次扫描，把近似 JSON 的文本改写为严格 JSON。
+    :return: (改写后的文本, 应用的修复类别列表)
+    """
+    out = []
+    fixes = []
+    quote = None          # 当前字符串使用的引号，None 表示在字符串之外
+    i = 0
+    n = len(blob)
+
+    def fix(name):
+        if name not in fixes:
+            fixes.append(name)
+
+    while i < n:
+        ch = blob[i]
+
+        if quote is not None:
+            if ch == "\\":
+                nxt = blob[i + 1:i + 2]
+                if quote == "'" and nxt == "'":
+                    out.append("'")
+                    i += 2
+                    continue
+                if nxt in _VALID_ESCAPES and nxt:
+                    out.append(blob[i:i + 2])
+                    i += 2
+                    continue
+                out.append("\\\\")
+                fix("invalid_escape")
+            elif ch == quote:
+                out.append('"')
+                quote = None
+            elif ch == '"':
+                out.append('\\"')   # 单引号字符串中的双引号
+            elif ch < " ":
+                out.append(_CONTROL_ESCAPES.get(ch, "\\u%04x" % ord(ch)))
+                fix("control_character")
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch == '"' or ch == "'":
+            if ch == "'":
+                fix("single_quotes")
+            quote = ch
+            out.append('"')
+            i += 1
+        elif ch == ",":
+            j = i + 1
+            while j < n and blob[j] in " \t\n\r":
+                j += 1
+            if j < n and blob[j] in "}]":
+                fix("trailing_comma")
+            else:
+                out.append(ch)
+            i += 1
+        elif ch.isalpha() or ch == "_":
+            word = _IDENTIFIER_RE.match(blob, i).group()
+            j = i + len(word)
+            while j < n and blob[j] in " \t\n\r":
+                j += 1
+            if j < n and blob[j] == ":":
+                out.append(json.dumps(word))
+                fix("unquoted_key")
+            elif word in _PYTHON_LITERALS:
+                out.append(_PYTHON_LITERALS[word])
+                fix("python_literal")
+            else:
+                out.append(word)      # 包括 null / true / false
+            i += len(word)
+        else:
+            out.append(ch)
+            i += 1
+
+    return "".join(out), fixes
+
+
+def _accepted(obj: Any, required_keys: Optional[List[str]]) -> bool:
+    return isinstance(obj, dict) and all(obj.get(key, None) is not None for key in required_keys or [])
+
+
+def _candidate_blobs(text: str) -> Iterator[str]:
+    """按优先级给出可能是目标对象的文本片段，不重复。"""
+    seen = set()
+
+    def once(blob):
+        if blob and blob not in seen:
+            seen.add(blob)
+            return True
+        return False
+
+    # 1) 代码块（从最后一个开始）
+    for block in reversed(_FENCED_BLOCK_RE.findall(text)):
+        block = block.strip()
+        if block.startswith("{") and once(block):
+            yield block
+
+    end = text.rfind("}")
+    if end == -1:
+        return
+    # 2) 与最后一个 '}' 配对的 '{'（不区分字符串内外，说明文字里的引号不影响配对）
+    depth = 0
+    for i in range(end, -1, -1):
+        ch = text[i]
+        if ch == "}":
+            depth += 1
+        elif ch == "{":
+            depth -= 1
+            if depth == 0:
+                if once(text[i:end + 1]):
+                    yield text[i:end + 1]
+                break
+    # 3) 第一个 '{' 到最后一个 '}'
+    start = text.find("{")
+    if start != -1 and once(text[start:end + 1]):
+        yield text[start:end + 1]
+
+
+def _top_level_objects(text: str) -> List[dict]:
+    """
+    正向扫描文本中所有完整的顶层对象：成功解码的对象整体跳过（只保留最外层），
+    解码失败的候选只前进一个字符，以便找到其内部的完整对象。每个候选起点最多解码一次。
+    """
+    objects = []
+    last_close = text.rfind("}")
+    pos = 0
+    while True:
+        match = _OBJECT_START_RE.search(text, pos, last_close + 1)
+        if match is None:
+            return objects
+        start = match.start()
+        try:
+            obj, pos = _DECODER.raw_decode(text, start)
+        except (ValueError, RecursionError):
+            pos = start + 1
+            continue
+        objects.append(obj)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+json_stream.py
+增量 JSON 提取器：逐块接收流式响应，一旦出现一个完整、合法且包含全部必需键的顶层 JSON 对象就立即返回，
+调用方据此提前结束流式请求。
+"""
+
+import json
+from typing import Any, Dict, Iterable, Optional
+
+
+class IncrementalJSONExtractor:
+    def __init__(self, required_keys: Optional[Iterable[str]] = None):
+        """
+        :param required_keys: 对象中必须包含的键；为空时任意合法的 JSON 对象都满足要求。
+        """
+        self.required_keys = list(required_keys or [])
+        self.result: Optional[Dict[str, Any]] = None
+        self.text = ""          # 已接收的全部文本（找到对象后截断到对象结尾）
+        self._pos = 0           # 下一个待扫描的字符位置
+        self._start = -1        # 当前顶层对象的起点
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """
+        接收一段新文本。
+        :return: 找到满足要求的对象时返回该对象，否则返回 None。
+        """
+        if self.result is not None or not chunk:
+            return self.result
+        self.text += chunk
+        return self._scan()
+
+    def _scan(self) -> Optional[Dict[str, Any]]:
+        text = self.text
+        i = self._pos
+        while i < len(text):
+            ch = text[i]
+            if self._depth == 0:
+                # 对象之外的文字不跟踪字符串状态，避免说明文字里的引号干扰
+                if ch == "{":
+                    self._depth = 1
+                    self._start = i
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    obj = self._try_load(text[self._start:i + 1])
+                    if obj is not None:
+                        self.result = obj
+                        self.text = text[:i + 1]
+                        self._pos = i + 1
+                        return obj
+                    # 不是合法对象：从该起点的下一个字符重新扫描，内部可能还有完整对象
+                    i = self._start
+            i += 1
+        self._pos = i
+        return None
+
+    def _try_load(self, blob: str) -> Optional[Dict[str, Any]]:
+        try:
+            obj = json.loads(blob)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(obj, dict):
+            return None
+        if any(obj.get(key, None) is None for key in self.required_keys):
+            return None
+        return obj
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+llm_cache.py
+基于 SQLite 的 LLM 响应持久化缓存。
+键为 (模型名称, 完整消息列表, 采样参数) 的 SHA-256 摘要，按 TTL 过期，并在条目数或总字节数
+超过上限时按最近访问时间（LRU）淘汰。多个进程可以安全地共享同一个缓存文件（WAL 模式）。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_TTL = 30 * 24 * 3600  # 30 天
+EVICT_EVERY = 200             # 每写入多少条检查一次淘汰
+
+
+def make_cache_key(model_name: str, messages: List[Dict[str, Any]], params: Optional[Dict[str, Any]] = None) -> str:
+    """根据模型名称、完整消息列表和采样参数计算缓存键。"""
+    payload = json.dumps(
+        {"model": model_name, "messages": messages, "params": params or {}},
+        ensure_ascii=False, sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES, ttl: Optional[float] = DEFAULT_TTL):
+        """
+        :param path: SQLite 文件路径。
+        :param max_entries: 最多保留的条目数。
+        :param max_bytes: 最多保留的响应总字节数。
+        :param ttl: 条目有效期（秒），为 None 时不过期。
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+
+    def get(self, model_name: str, messages: List[Dict[str, Any]], params: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """读取缓存的响应，未命中或已过期时返回 None。"""
+        key = make_cache_key(model_name, messages, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, model_name: str, messages: List[Dict[str, Any]], response: str, params: Optional[Dict[str, Any]] = None):
+        """写入（或覆盖）一条响应。"""
+        key = make_cache_key(model_name, messages, params)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, response, len(response.encode("utf-8")), now, now),
+            )
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict(now)
+
+    def delete(self, model_name: str, messages: List[Dict[str, Any]], params: Optional[Dict[str, Any]] = None):
+        """删除一条响应。"""
+        key = make_cache_key(model_name, messages, params)
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def evict(self):
+        """立即执行一次过期与 LRU 淘汰。"""
+        with self._lock:
+            self._evict(time.time())
+
+    def _evict(self, now: float):
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # 按最近访问时间从旧到新删除，直到同时满足条目数与字节数上限
+        removed_count, removed_bytes = 0, 0
+        cutoff = None
+        cursor = self._conn.execute("SELECT last_access, size FROM responses ORDER BY last_access")
+        for last_access, size in cursor:
+            if count - removed_count <= self.max_entries and total - removed_bytes <= self.max_bytes:
+                break
+            removed_count += 1
+            removed_bytes += size
+            cutoff = last_access
+        cursor.close()
+        if cutoff is not None:
+            self._conn.execute("DELETE FROM responses WHERE last_access <= ?", (cutoff,))
+
+    def clear(self):
+        """清空缓存。"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计与当前占用。"""
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": count, "bytes": total}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+metadata_journal.py
+元数据的追加式日志（JSONL）持久化。
+每次修改只向 metadata/<name>.journal.jsonl 追加一行记录，日志超过一定大小后再压缩（整体写回）
+到原来的 metadata/<name>.json 快照并清空日志；加载时读取快照后按顺序重放日志。
+记录都是“写入最终值”，因此在快照已包含部分记录时重放也能得到相同结果：
+  {"op": "set", "key": k, "value": v}                      metadata[k] = v
+  {"op": "set_item", "key": k, "index": i, "value": v}     metadata[k][i] = v（i 等于长度时追加）
+  {"op": "batch", "records": [...]}                        一次批量修改，占一行，要么全部重放要么（行不完整时）全部忽略
+并发与崩溃安全：
+  - 快照先写入同目录下的临时文件并 fsync，再原子替换；替换前把旧快照保留为 <name>.json.bak；
+  - 读写都持有 <name>.lock 上的建议性文件锁；写入前发现其他进程改过文件时先读取磁盘上的最新状态，
+    把本次追加的下标平移到其后再写入（读-合并-写），并把合并结果返回给调用方；
+  - 快照损坏（例如旧版本写入中途崩溃留下的截断文件）时把它改名为 <name>.json.corrupt-<时间戳> 保留，
+    改用 .bak 加日志恢复，恢复信息记录在 recovery 属性中。
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from utils.file_lock import FileLock
+
+JOURNAL_SUFFIX = ".journal.jsonl"
+LOCK_SUFFIX = ".lock"
+BACKUP_SUFFIX = ".bak"
+COMPACT_MIN_BYTES = 1024 * 1024  # 日志至少达到该大小才压缩
+COMPACT_RATIO = 1.0              # 日志大小超过快照大小的该倍数时压缩，使压缩的总开销与追加量成正比
+
+
+def journal_path(snapshot_path: str) -> str:
+    """快照文件对应的日志文件路径。"""
+    return os.path.splitext(snapshot_path)[0] + JOURNAL_SUFFIX
+
+
+def lock_path(snapshot_path: str) -> str:
+    """快照文件对应的锁文件路径。"""
+    return os.path.splitext(snapshot_path)[0] + LOCK_SUFFIX
+
+
+def coalesce_records(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """去掉会被之后的整体写入（set）覆盖的记录。"""
+    last_set = {}
+    for i, record in enumerate(records):
+        if record["op"] == "set":
+            last_set[record["key"]] = i
+    return [record for i, record in enumerate(records) if i >= last_set.get(record["key"], -1)]
+
+
+def list_lengths(metadata: Dict[str, Any]) -> Dict[str, int]:
+    """元数据中各列表值的长度。"""
+    return {key: len(value) for key, value in metadata.items() if isinstance(value, list)}
+
+
+def rebase_records(records: List[Dict[str, Any]], synced_lengths: Dict[str, int], disk_lengths: Dict[str, int]) -> List[Dict[str, Any]]:
+    """
+    其他进程在本进程上次同步之后追加了元素时，把记录中本进程新追加元素的下标（不小于同步时的长度）
+    平移到磁盘上已有元素之后；对已有元素的原地修改保持原下标（后写入者生效）。
+    """
+    offsets = {key: length - synced_lengths.get(key, 0) for key, length in disk_lengths.items()}
+    rebased = []
+    for record in records:
+        key = record.get("key")
+        if record["op"] == "set":
+            offsets[key] = 0   # 之后的下标都相对于本次整体写入的值
+        elif record["op"] == "set_item" and offsets.get(key) and record["index"] >= synced_lengths.get(key, 0):
+            record = dict(record, index=record["index"] + offsets[key])
+        rebased.append(record)
+    return rebased
+
+
+def apply_record(metadata: Dict[str, Any], record: Dict[str, Any]):
+    """把一条日志记录应用到元数据字典上。"""
+    op = record.get("op")
+    if op == "set":
+        metadata[record["key"]] = record["value"]
+    elif op == "batch":
+        for sub_record in record["records"]:
+            apply_record(metadata, sub_record)
+    elif op == "set_item":
+        items = metadata.setdefault(record["key"], [])
+        index = record["index"]
+        if index < len(items):
+            items[index] = record["value"]
+        elif index == len(items):
+            items.append(record["value"])
+        else:
+            raise ValueError(f"日志记录的下标越界：{record['key']}[{index}]，当前长度 {len(items)}")
+    else:
+        raise ValueError(f"未知的日志记录类型：{op}")
+
+
+def _file_state(path: str):
+    """用于发现文件被其他进程修改的 (inode, 大小, 修改时间)，文件不存在时为 None。"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class MetadataJournal:
+    def __init__(self, snapshot_path: str, compact_min_bytes: int = COMPACT_MIN_BYTES, compact_ratio: float = COMPACT_RATIO):
+        """
+        :param snapshot_path: 快照文件路径，即 metadata/<name>.json。
+        :param compact_min_bytes: 日志至少达到该大小才压缩。
+        :param compact_ratio: 日志大小超过快照大小的该倍数时压缩。
+        """
+        self.snapshot_path = snapshot_path
+        self.path = journal_path(snapshot_path)
+        self.lock = FileLock(lock_path(snapshot_path))
+        self.compact_min_bytes = compact_min_bytes
+        self.compact_ratio = compact_ratio
+        self.snapshot_bytes = 0
+        self.journal_bytes = 0
+        self.recovery = None            # 最近一次从损坏快照恢复的信息
+        self._file = None
+        self._synced = None             # 上次与磁盘同步后的文件状态
+        self._synced_lengths = {}       # 上次与磁盘同步时各列表的长度
+
+    def load(self) -> Dict[str, Any]:
+        """
+        读取快照并重放日志，返回元数据字典；两者都不存在时返回空字典。
+        快照损坏时保留损坏的文件并从 .bak 恢复（见 recovery）；日志最后一行不完整（写入中途崩溃）时截断该行。
+        """
+        with self.lock:
+            metadata = self._read()
+            self._mark_synced(metadata)
+        return metadata
+
+    def _read(self) -> Dict[str, Any]:
+        metadata = {}
+        recovering = False
+        self.snapshot_bytes = 0
+        if os.path.exists(self.snapshot_path):
+            try:
+                metadata = self._read_snapshot(self.snapshot_path)
+                self.snapshot_bytes = os.path.getsize(self.snapshot_path)
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                metadata = self._recover(e)
+                recovering = True
+
+        self.journal_bytes = 0
+        if os.path.exists(self.path):
+            self._truncate_torn_tail()
+            with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+                lines = f.readlines()
+            for lineno, line in enumerate(lines, 1):
+                if not line.strip():
+                    continue
+                try:
+                    apply_record(metadata, json.loads(line))
+                except json.JSONDecodeError as e:
+                    if lineno == len(lines):
+                        print(f"Warning: 忽略 {self.path} 末尾不完整的记录")
+                        break
+                    if not recovering:
+                        self._start_recovery(e, self._preserve(self.path, copy=True), None)
+                        recovering = True
+                    self.recovery["skipped_records"] += 1
+                except (ValueError, KeyError, TypeError):
+                    if not recovering:
+                        raise
+                    # 从较旧的 .bak 恢复或跳过损坏的行后，部分记录可能依赖丢失的修改
+                    self.recovery["skipped_records"] += 1
+            self.journal_bytes = os.path.getsize(self.path)
+
+        if recovering:
+            print(f"Warning: 已恢复 {self.snapshot_path}：{self.recovery}")
+            # 立即写出恢复后的快照，其他进程读取到的也是恢复后的状态
+            self._compact(metadata)
+        return metadata
+
+    def _truncate_torn_tail(self):
+        """
+        日志最后一行没有换行符（写入中途崩溃）时：记录不完整则截断到上一条完整记录，完整则补上换行符。
+        否则之后以追加模式写入的记录会接在这一行后面，两条记录都无法解析（需持有锁）。
+        """
+        with open(self.path, "rb+") as f:
+            if f.seek(0, os.SEEK_END) == 0:
+                return
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b"\n":
+                return
+            f.seek(0)
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            try:
+                json.loads(data[end:].decode("utf-8"))
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                print(f"Warning: 截断 {self.path} 末尾不完整的记录（{len(data) - end} 字节）")
+                f.truncate(end)
+            else:
+                f.write(b"\n")
+
+    @staticmethod
+    def _read_snapshot(path: str) -> Dict[str, Any]:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _preserve(path: str, copy: bool = False) -> str:
+        """把损坏的文件改名（或复制）为 <path>.corrupt-<时间戳> 保留，返回新路径。"""
+        corrupt_path = f"{path}.corrupt-{time.strftime('%Y%m%d%H%M%S')}"
+        if copy:
+            shutil.copy2(path, corrupt_path)
+        else:
+            os.replace(path, corrupt_path)
+        return corrupt_path
+
+    def _start_recovery(self, error: Exception, corrupt_path: str, source: Optional[str]):
+        self.recovery = {"error": str(error), "corrupt_path": corrupt_path, "source": source, "skipped_records": 0}
+
+    def _recover(self, error: Exception) -> Dict[str, Any]:
+        """快照无法解析：把它改名保留，再尝试从上一个快照 .bak 恢复（之后照常重放日志）。"""
+        corrupt_path = self._preserve(self.snapshot_path)
+        metadata, source = {}, None
+        backup_path = self.snapshot_path + BACKUP_SUFFIX
+        if os.path.exists(backup_path):
+            try:
+                metadata, source = self._read_snapshot(backup_path), backup_path
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                pass
+        self._start_recovery(error, corrupt_path, source)
+        return metadata
+
+    def append(self, record: Dict[str, Any], metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        追加一条记录；日志过大时把 metadata 压缩为快照。
+        :param record: 日志记录。
+        :param metadata: 应用该记录之后的完整元数据，仅在压缩时使用。
+        :return: 发现其他进程的修改时返回合并后的完整元数据，调用方应改用它；否则返回 None。
+        """
+        return self._append([record], metadata)
+
+    def append_batch(self, records: List[Dict[str, Any]], metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        把一组记录合并为一行追加，重放时整体生效或整体忽略。
+        :param records: 按发生顺序排列的日志记录。
+        :param metadata: 应用这些记录之后的完整元数据，仅在压缩时使用。
+        :return: 同 append。
+        """
+        records = coalesce_records(records)
+        if not records:
+            return None
+        return self._append(records, metadata)
+
+    def _append(self, records: List[Dict[str, Any]], metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            merged = None
+            if self._disk_state() != self._synced:
+                # 读-合并-写：以磁盘上的最新状态为准，本次追加的元素排在其他进程追加的元素之后
+                self.close()  # 日志可能已被其他进程压缩删除
+                merged = self._read()
+                records = rebase_records(records, self._synced_lengths, list_lengths(merged))
+                for record in records:
+                    apply_record(merged, record)
+                metadata = merged
+
+            record = records[0] if len(records) == 1 else {"op": "batch", "records": records}
+            line = json.dumps(record, ensure_ascii=False) + "\n"
+            if self._file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+            self.journal_bytes += len(line.encode("utf-8"))
+            # 快照还不存在时立即写出，保证每个元数据都有可直接读取的 <name>.json
+            if not self.snapshot_bytes or self.journal_bytes >= max(self.compact_min_bytes, self.snapshot_bytes * self.compact_ratio):
+                self._compact(metadata)
+            self._mark_synced(metadata)
+            return merged
+
+    def compact(self, metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        把完整元数据写为快照，然后清空日志。
+        :return: 发现其他进程的修改时，写入的是磁盘上的最新状态（本进程的修改都已在日志中），返回该状态；否则返回 None。
+        """
+        with self.lock:
+            merged = None
+            if self._disk_state() != self._synced:
+                self.close()
+                merged = metadata = self._read()
+            self._compact(metadata)
+            self._mark_synced(metadata)
+            return merged
+
+    def _compact(self, metadata: Dict[str, Any]):
+        """先写同目录下的临时文件并 fsync，保留旧快照为 .bak，再原子替换快照并删除日志（需持有锁）。"""
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.snapshot_path) + ".", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(metadata, f, ensure_ascii=False, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, 0o644)
+            if os.path.exists(self.snapshot_path):
+                self._backup()
+            os.replace(tmp_path, self.snapshot_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.snapshot_bytes = os.path.getsize(self.snapshot_path)
+
+        # 快照已包含全部记录；即使清空前崩溃，重放“写入最终值”的记录也不会改变结果
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.journal_bytes = 0
+
+    def _backup(self):
+        """把当前快照保留为 .bak（优先用硬链接，不复制数据）。"""
+        backup_path = self.snapshot_path + BACKUP_SUFFIX
+        tmp_path = backup_path + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.link(self.snapshot_path, tmp_path)
+        except OSError:
+            shutil.copy2(self.snapshot_path, tmp_path)
+        os.replace(tmp_path, backup_path)
+
+    def _disk_state(self):
+        return _file_state(self.snapshot_path), _file_state(self.path)
+
+    def _mark_synced(self, metadata: Dict[str, Any]):
+        self._synced = self._disk_state()
+        self._synced_lengths = list_lengths(metadata)
+
+    def rename(self, name: str, metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        把元数据改存到同一目录下的 <name>.json：先压缩为旧快照再重命名，并删除新名称下遗留的日志。
+        :param metadata: 当前的完整元数据。
+        :return: 同 compact。
+        """
+        new_snapshot_path = os.path.join(os.path.dirname(self.snapshot_path), name + ".json")
+        with self.lock:
+            merged = self.compact(metadata)
+            new_journal = MetadataJournal(new_snapshot_path, self.compact_min_bytes, self.compact_ratio)
+            with new_journal.lock:
+                os.replace(self.snapshot_path, new_snapshot_path)
+                if os.path.exists(new_journal.path):
+                    os.remove(new_journal.path)  # 新名称下遗留的日志不属于当前元数据
+        self.snapshot_path = new_snapshot_path
+        self.path = new_journal.path
+        self.lock = new_journal.lock
+        self._synced = self._disk_state()
+        return merged
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
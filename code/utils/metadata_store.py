@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+metadata_store.py
+基于 SQLite 的元数据存储后端。
+所有元数据集保存在同一个数据库中：
+  metadata   每个元数据集一行（名称、元数据名称、基本常量、其他键）
+  variables  泛化性变量，按 (元数据集, 位置) 存储
+  cases      样例，按 (元数据集, 位置) 存储，并记录规范化 (metadata, question) 的哈希；
+             metadata / question / answer 以外的键（如 variables）保存在 extra 列中
+索引：metadata.name（唯一）、cases(set_id, case_hash)、cases(case_hash)。
+打开元数据集时样例以 SQLiteCaseList 按页懒加载，不需要把全部样例读入内存；也可以跨元数据集查询。
+原有的 metadata/<name>.json 格式仍可通过 import_json / export_json 导入导出。
+
+MetadataAgent 通过 SQLiteBackend 使用本模块，它与 MetadataJournal（JSON 快照 + 日志）提供相同的接口：
+load / append / append_batch / compact / rename / close。
+"""
+
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import MutableSequence
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils.case_index import CaseIndex, case_key
+from utils.metadata_journal import rebase_records
+
+PAGE_SIZE = 1000      # 每次从数据库读取的样例数
+CACHED_PAGES = 8      # 每个样例列表缓存的页数
+_HEADER_KEYS = ("metadata_name", "constant")
+_CASE_COLUMNS = ("metadata", "question", "answer")
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def case_hash(metadata: Any, question: Any) -> str:
+    """规范化 (metadata, question) 的哈希，与 CaseIndex 的精确去重规则一致。"""
+    return hashlib.sha1(json.dumps(case_key(metadata, question), ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _case_from_row(metadata: str, question: str, answer: str, extra: str) -> Dict[str, Any]:
+    case = {"metadata": json.loads(metadata), "question": json.loads(question), "answer": json.loads(answer)}
+    case.update(json.loads(extra))
+    return case
+
+
+class SQLiteMetadataStore:
+    def __init__(self, path: str):
+        """
+        :param path: SQLite 文件路径。
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            " id INTEGER PRIMARY KEY,"
+            " name TEXT NOT NULL UNIQUE,"
+            " metadata_name TEXT,"
+            " constant TEXT,"
+            " extra TEXT NOT NULL DEFAULT '{}');"
+            "CREATE TABLE IF NOT EXISTS variables ("
+            " set_id INTEGER NOT NULL REFERENCES metadata(id) ON DELETE CASCADE,"
+            " position INTEGER NOT NULL,"
+            " name TEXT,"
+            " data TEXT NOT NULL,"
+            " PRIMARY KEY (set_id, position));"
+            "CREATE TABLE IF NOT EXISTS cases ("
+            " set_id INTEGER NOT NULL REFERENCES metadata(id) ON DELETE CASCADE,"
+            " position INTEGER NOT NULL,"
+            " case_hash TEXT NOT NULL,"
+            " metadata TEXT,"
+            " question TEXT,"
+            " answer TEXT,"
+            " extra TEXT NOT NULL DEFAULT '{}',"
+            " PRIMARY KEY (set_id, position));"
+            "CREATE INDEX IF NOT EXISTS idx_cases_set_hash ON cases(set_id, case_hash);"
+            "CREATE INDEX IF NOT EXISTS idx_cases_hash ON cases(case_hash);"
+        )
+        # 早期版本的 cases 表没有 extra 列
+        if "extra" not in [row[1] for row in self._conn.execute("PRAGMA table_info(cases)")]:
+            self._conn.execute("ALTER TABLE cases ADD COLUMN extra TEXT NOT NULL DEFAULT '{}'")
+
+    # ---------- 元数据集 ----------
+    def get_set_id(self, name: str, create: bool = False) -> Optional[int]:
+        """元数据集的 id；不存在时按 create 创建或返回 None。"""
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM metadata WHERE name = ?", (name,)).fetchone()
+            if row is not None:
+                return row[0]
+            if not create:
+                return None
+            # 其他进程可能同时创建同名的元数据集
+            self._conn.execute("INSERT OR IGNORE INTO metadata (name) VALUES (?)", (name,))
+            return self._conn.execute("SELECT id FROM metadata WHERE name = ?", (name,)).fetchone()[0]
+
+    def list_metadata(self) -> List[Dict[str, Any]]:
+        """列出所有元数据集及其变量、样例数量。"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT m.name, m.metadata_name,"
+                " (SELECT COUNT(*) FROM variables v WHERE v.set_id = m.id),"
+                " (SELECT COUNT(*) FROM cases c WHERE c.set_id = m.id)"
+                " FROM metadata m ORDER BY m.name"
+            ).fetchall()
+        return [{"name": r[0], "metadata_name": r[1], "variables": r[2], "cases": r[3]} for r in rows]
+
+    def delete_metadata(self, name: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM metadata WHERE name = ?", (name,))
+
+    def rename_metadata(self, old_name: str, new_name: str):
+        """重命名元数据集；新名称已存在时覆盖。"""
+        with self._lock, self._transaction():
+            self._conn.execute("DELETE FROM metadata WHERE name = ?", (new_name,))
+            self._conn.execute("UPDATE metadata SET name = ? WHERE name = ?", (new_name, old_name))
+
+    def load_header(self, set_id: int) -> Dict[str, Any]:
+        """读取样例以外的全部键（元数据名称、基本常量、泛化性变量及其他键）。"""
+        with self._lock:
+            metadata_name, constant, extra = self._conn.execute(
+                "SELECT metadata_name, constant, extra FROM metadata WHERE id = ?", (set_id,)).fetchone()
+            variables = [json.loads(r[0]) for r in self._conn.execute(
+                "SELECT data FROM variables WHERE set_id = ? ORDER BY position", (set_id,))]
+        header = {}
+        if metadata_name is not None:
+            header["metadata_name"] = metadata_name
+        if constant is not None:
+            header["constant"] = constant
+        header["variable"] = variables
+        header.update(json.loads(extra))
+        return header
+
+    # ---------- 样例 ----------
+    def count_cases(self, set_id: int) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cases WHERE set_id = ?", (set_id,)).fetchone()[0]
+
+    def get_cases_page(self, set_id: int, offset: int, limit: int = PAGE_SIZE) -> List[Dict[str, Any]]:
+        """按位置顺序分页读取样例。"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT metadata, question, answer, extra FROM cases WHERE set_id = ? AND position >= ? ORDER BY position LIMIT ?",
+                (set_id, offset, limit)).fetchall()
+        return [_case_from_row(m, q, a, e) for m, q, a, e in rows]
+
+    def find_case_positions(self, set_id: int, digest: str) -> List[int]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute(
+                "SELECT position FROM cases WHERE set_id = ? AND case_hash = ? ORDER BY position", (set_id, digest))]
+
+    def find_cases_by_hash(self, digest: str) -> List[Tuple[str, int]]:
+        """跨元数据集查找与给定哈希相同的样例，返回 (元数据集名称, 位置) 列表。"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT m.name, c.position FROM cases c JOIN metadata m ON m.id = c.set_id WHERE c.case_hash = ? ORDER BY m.name, c.position",
+                (digest,)).fetchall()
+
+    def search_cases(self, text: str = None, name: str = None, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        跨元数据集查询样例。
+        :param text: metadata 或 question 中包含的文本，为 None 时不过滤。
+        :param name: 只查询该元数据集，为 None 时查询全部。
+        :return: 每项包含 name、position 与样例内容。
+        """
+        sql = "SELECT m.name, c.position, c.metadata, c.question, c.answer, c.extra FROM cases c JOIN metadata m ON m.id = c.set_id WHERE 1 = 1"
+        params = []
+        if name is not None:
+            sql += " AND m.name = ?"
+            params.append(name)
+        if text is not None:
+            sql += " AND (c.metadata LIKE ? OR c.question LIKE ?)"
+            params.extend([f"%{text}%"] * 2)
+        sql += " ORDER BY m.name, c.position LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{"name": n, "position": p, **_case_from_row(m, q, a, e)} for n, p, m, q, a, e in rows]
+
+    # ---------- 写入 ----------
+    def apply_records(self, set_id: int, records: List[Dict[str, Any]], synced_lengths: Dict[str, int] = None) -> bool:
+        """
+        在一个事务中应用 MetadataJournal 格式的日志记录。
+        :param synced_lengths: 调用方上次读取时 cases / variable 的长度；其他进程在此之后追加过时，
+                               把本次新追加元素的下标平移到已有元素之后（见 rebase_records）。
+        :return: 是否发生了平移（调用方的内存状态已过期，应重新加载）。
+        """
+        with self._lock, self._transaction():
+            rebased = False
+            if synced_lengths is not None:
+                disk_lengths = self._lengths(set_id)
+                if any(disk_lengths[key] != synced_lengths.get(key, 0) for key in disk_lengths):
+                    records = rebase_records(records, synced_lengths, disk_lengths)
+                    rebased = True
+            for record in records:
+                self._apply(set_id, record)
+            return rebased
+
+    def _lengths(self, set_id: int) -> Dict[str, int]:
+        return {
+            "cases": self._conn.execute("SELECT COUNT(*) FROM cases WHERE set_id = ?", (set_id,)).fetchone()[0],
+            "variable": self._conn.execute("SELECT COUNT(*) FROM variables WHERE set_id = ?", (set_id,)).fetchone()[0],
+        }
+
+    def _apply(self, set_id: int, record: Dict[str, Any]):
+        op, key = record["op"], record.get("key")
+        if op == "batch":
+            for sub_record in record["records"]:
+                self._apply(set_id, sub_record)
+        elif op == "set" and key == "cases":
+            self._set_cases(set_id, record["value"])
+        elif op == "set" and key == "variable":
+            self._conn.execute("DELETE FROM variables WHERE set_id = ?", (set_id,))
+            for position, param in enumerate(record["value"]):
+                self._write_variable(set_id, position, param)
+        elif op == "set_item" and key == "cases":
+            self._write_case(set_id, record["index"], record["value"])
+        elif op == "set_item" and key == "variable":
+            self._write_variable(set_id, record["index"], record["value"])
+        elif op == "set" and key in _HEADER_KEYS:
+            self._conn.execute(f"UPDATE metadata SET {key} = ? WHERE id = ?", (record["value"], set_id))
+        elif op in ("set", "set_item"):
+            # 其他键保存在 extra（JSON）中
+            extra = json.loads(self._conn.execute("SELECT extra FROM metadata WHERE id = ?", (set_id,)).fetchone()[0])
+            if op == "set":
+                extra[key] = record["value"]
+            else:
+                items = extra.setdefault(key, [])
+                if record["index"] < len(items):
+                    items[record["index"]] = record["value"]
+                else:
+                    items.append(record["value"])
+            self._conn.execute("UPDATE metadata SET extra = ? WHERE id = ?", (_dumps(extra), set_id))
+        else:
+            raise ValueError(f"未知的日志记录类型：{op}")
+
+    def _set_cases(self, set_id: int, cases):
+        if isinstance(cases, SQLiteCaseList) and cases.set_id == set_id and cases.store is self:
+            # 同一个懒加载列表：只需写回本次修改过的样例
+            cases.flush()
+            return
+        self._conn.execute("DELETE FROM cases WHERE set_id = ?", (set_id,))
+        for position, case in enumerate(cases):
+            self._write_case(set_id, position, case)
+
+    def _write_case(self, set_id: int, position: int, case: Dict[str, Any]):
+        metadata, question, answer = case.get("metadata"), case.get("question"), case.get("answer")
+        extra = {key: value for key, value in case.items() if key not in _CASE_COLUMNS}
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cases (set_id, position, case_hash, metadata, question, answer, extra) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (set_id, position, case_hash(metadata, question), _dumps(metadata), _dumps(question), _dumps(answer), _dumps(extra)))
+
+    def _write_variable(self, set_id: int, position: int, param: Dict[str, Any]):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO variables (set_id, position, name, data) VALUES (?, ?, ?, ?)",
+            (set_id, position, param.get("name"), _dumps(param)))
+
+    def write_metadata(self, set_id: int, metadata: Dict[str, Any], synced_lengths: Dict[str, int] = None) -> bool:
+        """
+        整体写入一个元数据集（覆盖已有内容）。
+        :param synced_lengths: 同 apply_records；其他进程在此之后追加过时不写入，返回 False。
+        """
+        records = [{"op": "set", "key": key, "value": value} for key, value in metadata.items()]
+        with self._lock, self._transaction():
+            if synced_lengths is not None and self._lengths(set_id) != synced_lengths:
+                return False
+            self._conn.execute("UPDATE metadata SET metadata_name = NULL, constant = NULL, extra = '{}' WHERE id = ?", (set_id,))
+            for record in records:
+                self._apply(set_id, record)
+            return True
+
+    @contextmanager
+    def _transaction(self):
+        """写事务；嵌套调用时并入外层事务。"""
+        if self._conn.in_transaction:
+            yield
+            return
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    # ---------- JSON 导入导出 ----------
+    def import_json(self, path: str, name: str = None) -> str:
+        """
+        把 metadata/<name>.json 格式的文件导入为一个元数据集（覆盖同名元数据集）。
+        :param name: 元数据集名称，默认取文件名（不含扩展名）。
+        :return: 元数据集名称。
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        name = name or os.path.splitext(os.path.basename(path))[0]
+        self.write_metadata(self.get_set_id(name, create=True), metadata)
+        return name
+
+    def export_json(self, name: str, path: str):
+        """把一个元数据集导出为 metadata/<name>.json 格式。"""
+        set_id = self.get_set_id(name)
+        if set_id is None:
+            raise KeyError(f"元数据集不存在：{name}")
+        metadata = self.load_header(set_id)
+        metadata["cases"] = list(SQLiteCaseList(self, set_id))
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, path)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def get_metadata_store(path: str) -> "SQLiteMetadataStore":
+    """获取指定路径的共享数据库连接（同一进程内复用）。"""
+    path = os.path.abspath(path)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = SQLiteMetadataStore(path)
+        return _stores[path]
+
+
+class SQLiteCaseList(MutableSequence):
+    """
+    懒加载的样例列表：按页从数据库读取，只在内存中保留最近的几页和本次会话中通过下标取出或修改过的样例。
+    通过下标取出的样例可以原地修改，写回数据库由 SQLiteBackend 应用日志记录时完成；
+    迭代与切片得到的样例只用于读取。只支持在末尾追加，不支持删除。
+    """
+
+    def __init__(self, store: SQLiteMetadataStore, set_id: int, page_size: int = PAGE_SIZE):
+        self.store = store
+        self.set_id = set_id
+        self.page_size = page_size
+        self._length = store.count_cases(set_id)
+        self._overlay = {}               # 位置 -> 取出或修改过、尚未写回的样例
+        self._pages = OrderedDict()      # 页号 -> 该页的样例（LRU）
+        self._lock = threading.RLock()   # 保护 _overlay / _pages / _length，列表可在多个线程间共享
+
+    def __len__(self):
+        return self._length
+
+    def _position(self, index: int) -> int:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("样例下标越界")
+        return index
+
+    def _read(self, position: int) -> Dict[str, Any]:
+        page_no = position // self.page_size
+        with self._lock:
+            page = self._pages.get(page_no)
+            if page is None:
+                page = self.store.get_cases_page(self.set_id, page_no * self.page_size, self.page_size)
+                self._pages[page_no] = page
+                if len(self._pages) > CACHED_PAGES:
+                    self._pages.popitem(last=False)
+            else:
+                self._pages.move_to_end(page_no)
+            return page[position - page_no * self.page_size]
+
+    def __getitem__(self, index):
+        with self._lock:
+            if isinstance(index, slice):
+                return [self._peek(i) for i in range(*index.indices(self._length))]
+            position = self._position(index)
+            case = self._overlay.get(position)
+            if case is None:
+                # 取出的对象可能被原地修改，保留到写回为止
+                case = copy.deepcopy(self._read(position))
+                self._overlay[position] = case
+            return case
+
+    def _peek(self, position: int) -> Dict[str, Any]:
+        case = self._overlay.get(position)
+        return case if case is not None else self._read(position)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            raise NotImplementedError("SQLiteCaseList 不支持切片赋值")
+        with self._lock:
+            self._overlay[self._position(index)] = value
+
+    def __delitem__(self, index):
+        raise NotImplementedError("SQLiteCaseList 不支持删除样例")
+
+    def insert(self, index, value):
+        with self._lock:
+            if index != self._length:
+                raise NotImplementedError("SQLiteCaseList 只支持在末尾追加")
+            self._overlay[self._length] = value
+            self._length += 1
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.iter_from(0)
+
+    def iter_from(self, start: int) -> Iterator[Dict[str, Any]]:
+        """从 start 开始按页迭代样例，不占用页缓存。"""
+        position = start
+        while position < self._length:
+            page = self.store.get_cases_page(self.set_id, position, self.page_size)
+            if not page:
+                # 尚未写回的追加样例只在内存中
+                yield self._overlay[position]
+                position += 1
+                continue
+            for case in page:
+                if position >= self._length:
+                    return
+                yield self._overlay.get(position, case)
+                position += 1
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __deepcopy__(self, memo):
+        clone = SQLiteCaseList.__new__(SQLiteCaseList)
+        clone.store = self.store
+        clone.set_id = self.set_id
+        clone.page_size = self.page_size
+        with self._lock:
+            clone._length = self._length
+            clone._overlay = copy.deepcopy(self._overlay, memo)
+        clone._pages = OrderedDict()
+        clone._lock = threading.RLock()
+        return clone
+
+    def find_case(self, metadata: Any, question: Any) -> Optional[int]:
+        """通过哈希索引查找规范化后相同的样例位置（未写回的修改优先）。"""
+        key = case_key(metadata, question)
+        with self._lock:
+            overlay = list(self._overlay.items())
+        positions = [p for p, case in overlay if case_key(case.get("metadata"), case.get("question")) == key]
+        digest = case_hash(metadata, question)
+        for position in self.store.find_case_positions(self.set_id, digest):
+            if position not in self._overlay and position < self._length:
+                positions.append(position)
+                break
+        return min(positions) if positions else None
+
+    def persisted(self, position: int):
+        """位置 position 的样例已写回数据库。"""
+        with self._lock:
+            self._overlay.pop(position, None)
+            self._pages.pop(position // self.page_size, None)
+
+    def flush(self):
+        """把所有未写回的样例写入数据库（需在 store 的事务中调用）。"""
+        with self._lock:
+            for position in sorted(self._overlay):
+                self.store._write_case(self.set_id, position, self._overlay[position])
+            self._overlay.clear()
+            self._pages.clear()
+
+
+class SQLiteCaseIndex(CaseIndex):
+    """SQLiteCaseList 的索引：精确去重使用数据库中的哈希索引，近似重复检测按页迭代样例。"""
+
+    def find(self, metadata: Any, question: Any) -> Optional[int]:
+        return self.cases.find_case(metadata, question)
+
+    def _sync(self):
+        if len(self.cases) < len(self._key_list):
+            self.rebuild()
+            return
+        for case in self.cases.iter_from(len(self._key_list)):
+            key = case_key(case.get("metadata"), case.get("question"))
+            self._keys.setdefault(key, len(self._key_list))
+            self._key_list.append(key)
+
+
+class SQLiteBackend:
+    """MetadataAgent 使用的 SQLite 后端，接口与 MetadataJournal 相同。"""
+
+    def __init__(self, store: SQLiteMetadataStore, name: str):
+        """
+        :param store: 元数据数据库。
+        :param name: 元数据集名称（与 JSON 文件名相同的规范化名称）。
+        """
+        self.store = store
+        self.name = name
+        self.path = store.path
+        self.set_id = store.get_set_id(name)
+        self.created = self.set_id is None   # 新建的元数据集在第一次写入时整体写入（与 JSON 快照一致）
+        if self.created:
+            self.set_id = store.get_set_id(name, create=True)
+        self.cases = None
+        self._synced_lengths = {}
+
+    def load(self) -> Dict[str, Any]:
+        """读取元数据；样例以懒加载列表返回。新建的元数据集返回空字典。"""
+        metadata = self.store.load_header(self.set_id)
+        self.cases = SQLiteCaseList(self.store, self.set_id)
+        self._synced_lengths = {"cases": len(self.cases), "variable": len(metadata["variable"])}
+        if not self.cases and not metadata.get("variable") and len(metadata) == 1:
+            return {}
+        metadata["cases"] = self.cases
+        return metadata
+
+    def append(self, record: Dict[str, Any], metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self.append_batch([record], metadata)
+
+    def append_batch(self, records: List[Dict[str, Any]], metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """应用日志记录；其他进程同时追加过样例或变量时返回重新加载的元数据，否则返回 None。"""
+        if self.created:
+            # 新建的元数据集：同时写入元数据名称等其他键（不整体覆盖，其他进程可能已经写入了样例）
+            records = [{"op": "set", "key": key, "value": value} for key, value in metadata.items()
+                       if not isinstance(value, (list, SQLiteCaseList))] + records
+            self.created = False
+        if self.store.apply_records(self.set_id, records, self._synced_lengths):
+            return self.load()
+        self._synced_lengths = {"cases": len(metadata.get("cases", [])), "variable": len(metadata.get("variable", []))}
+        cases = metadata.get("cases")
+        if isinstance(cases, SQLiteCaseList):
+            for record in records:
+                for sub_record in record["records"] if record["op"] == "batch" else [record]:
+                    if sub_record["op"] == "set_item" and sub_record["key"] == "cases":
+                        cases.persisted(sub_record["index"])
+
+    def compact(self, metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        整体写回全部键（样例只写回未保存的修改）。
+        其他进程同时追加过样例或变量时不覆盖（本进程的修改都已写入），返回重新加载的元数据。
+        """
+        if not self.store.write_metadata(self.set_id, metadata, None if self.created else self._synced_lengths):
+            return self.load()
+        self.created = False
+        self._synced_lengths = {"cases": len(metadata.get("cases", [])), "variable": len(metadata.get("variable", []))}
+
+    def rename(self, new_name: str, metadata: Dict[str, Any]):
+        """重命名元数据集（覆盖同名的元数据集）。返回值同 compact。"""
+        merged = self.compact(metadata)
+        self.store.rename_metadata(self.name, new_name)
+        self.name = new_name
+        return merged
+
+    def close(self):
+        pass
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+model_router.py
+按流水线阶段（翻译、归纳常量、演绎样例、生成答案、检查答案、类比变量、校验变量）为每次LLM调用选择模型。
+每个候选模型的期望代价 = (配置的单价 × 预估 token 数 + latency_weight × 最近耗时) / 该阶段最近的可用率，
+选择期望代价最低的模型：便宜且快的模型在其结果可用时承担高频的检查答案等阶段，
+只有在便宜模型的结果经常不可用（解析失败、校验失败、请求失败）的阶段，更强的模型才划算。
+可用率与耗时按指数衰减统计，反映最近的表现；某个模型连续失败时视为降级，冷却期内不再选择，由下一个候选模型接替。
+配置文件（agent/config/model_router.json）：
+  {"models": {"glm-4-air": {"cost": 1.0}, ...},              # cost 为每 1K token 的相对单价，可选 latency 为没有样本时的预估耗时
+   "stages": {"check": ["glm-4-air", "kedaxunfei-x1"],        # 各阶段的候选模型（同等代价时靠前者优先），未列出的阶段使用全部模型；
+              "induction": {"kedaxunfei-x1": 0.9, "glm-4-air": 0.3}, ...},  # 也可以给出各模型在该阶段的先验可用率（难度不同的阶段）
+   "latency_weight": 0.05, ...}                              # 其余键为 ModelRouter 的参数
+"""
+
+import json
+import random
+import threading
+import time
+from typing import Dict, Iterable, List, Union
+
+ROUTER_STAGES = ("translate", "induction", "deduction", "answer", "check", "analogy", "judge")
+DEFAULT_LATENCY = 10.0          # 没有耗时样本、配置中也没有 latency 时的预估耗时（秒）
+DEFAULT_COMPLETION_TOKENS = 1024
+MIN_ACCEPTANCE = 0.05           # 可用率的下限，避免期望代价无穷大
+
+
+class ModelRouter:
+    def __init__(self, models: Dict[str, dict], stages: Dict[str, Union[List[str], Dict[str, float]]] = None, latency_weight: float = 0.05,
+                 decay: float = 0.95, prior_acceptance: float = 0.8, prior_weight: float = 3.0,
+                 failure_threshold: int = 3, cooldown: float = 60.0, explore: float = 0.05, seed: int = None):
+        """
+        :param models: 模型名称 → {"cost": 每 1K token 的相对单价, "latency": 没有样本时的预估耗时}。
+        :param stages: 阶段 → 候选模型列表，或候选模型 → 该阶段的先验可用率；未列出的阶段使用全部模型。
+        :param latency_weight: 每秒耗时折算的代价（与 cost 同一单位）。
+        :param decay: 统计的衰减系数，每记录一次结果，以前的结果权重乘以该值。
+        :param prior_acceptance: 没有样本时假定的可用率，样本增多后逐渐被实际可用率取代。
+        :param prior_weight: 先验相当于的样本数。
+        :param failure_threshold: 连续请求失败多少次后视为降级。
+        :param cooldown: 降级的冷却时间（秒），之后重新参与选择。
+        :param explore: 随机选择一个健康候选模型的概率，使长期未被选择的模型的统计得以更新。
+        """
+        if not models:
+            raise ValueError("ModelRouter 至少需要一个模型")
+        unknown = [model for candidates in (stages or {}).values() for model in candidates if model not in models]
+        if unknown:
+            raise ValueError(f"阶段的候选模型未在 models 中配置：{', '.join(sorted(set(unknown)))}")
+        self.models = {name: dict(config or {}) for name, config in models.items()}
+        self.stages = {stage: list(candidates) for stage, candidates in (stages or {}).items()}
+        self._priors = {(stage, model): prior for stage, candidates in (stages or {}).items()
+                        if isinstance(candidates, dict) for model, prior in candidates.items()}
+        self.latency_weight = latency_weight
+        self.decay = decay
+        self.prior_acceptance = prior_acceptance
+        self.prior_weight = prior_weight
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.explore = explore
+        self._random = random.Random(seed)
+        # (阶段, 模型) → {"attempts", "accepted"}（衰减后的计数）与 {"results", "chosen"}（累计次数）
+        self._results = {}
+        # 模型 → 请求健康状况：{"calls", "errors", "latency", "consecutive_errors", "degraded_until"}
+        self._health = {name: {"calls": 0, "errors": 0, "latency": None, "consecutive_errors": 0, "degraded_until": 0.0} for name in self.models}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, path: str, **kwargs) -> "ModelRouter":
+        """从 JSON 配置文件创建，kwargs 覆盖文件中的参数。"""
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        config.update(kwargs)
+        return cls(**config)
+
+    def candidates(self, stage: str) -> List[str]:
+        """阶段的候选模型（按配置顺序）。"""
+        return self.stages.get(stage) or list(self.models)
+
+    def _stage_stats(self, stage: str, model: str) -> dict:
+        return self._results.setdefault((stage, model), {"attempts": 0.0, "accepted": 0.0, "results": 0, "chosen": 0})
+
+    def acceptance(self, stage: str, model: str) -> float:
+        """模型在该阶段最近的可用率（带先验）。"""
+        stats = self._results.get((stage, model), {"attempts": 0.0, "accepted": 0.0})
+        prior = self._priors.get((stage, model), self.prior_acceptance)
+        return (stats["accepted"] + prior * self.prior_weight) / (stats["attempts"] + self.prior_weight)
+
+    def expected_cost(self, stage: str, model: str, prompt_chars: int = 0) -> float:
+        """得到一个可用结果的期望代价。"""
+        config = self.models[model]
+        latency = self._health[model]["latency"]
+        if latency is None:
+            latency = config.get("latency", DEFAULT_LATENCY)
+        tokens = prompt_chars // 2 + DEFAULT_COMPLETION_TOKENS
+        cost = config.get("cost", 1.0) * tokens / 1000 + self.latency_weight * latency
+        return cost / max(self.acceptance(stage, model), MIN_ACCEPTANCE)
+
+    def choose(self, stage: str, prompt_chars: int = 0, exclude: Iterable[str] = ()) -> str:
+        """
+        为一次调用选择模型。
+        :param prompt_chars: 提示词的字符数，用于预估 token 数。
+        :param exclude: 本次请求中已经失败的模型，有其他候选时不再选择（请求内的回退）。
+        :return: 模型名称；全部候选都已降级时返回最早恢复的一个。
+        """
+        candidates = self.candidates(stage)
+        candidates = [model for model in candidates if model not in exclude] or candidates
+        now = time.monotonic()
+        with self._lock:
+            healthy = [model for model in candidates if self._health[model]["degraded_until"] <= now]
+            if not healthy:
+                model = min(candidates, key=lambda m: self._health[m]["degraded_until"])
+            elif len(healthy) > 1 and self._random.random() < self.explore:
+                model = self._random.choice(healthy)
+            else:
+                model = min(healthy, key=lambda m: (self.expected_cost(stage, m, prompt_chars), candidates.index(m)))
+            self._stage_stats(stage, model)["chosen"] += 1
+        return model
+
+    def record_call(self, model: str, seconds: float, error: bool):
+        """记录一次实际发出的请求（缓存命中不记录）：成功时更新耗时，连续失败达到阈值时降级。"""
+        if model not in self._health:
+            return
+        with self._lock:
+            health = self._health[model]
+            health["calls"] += 1
+            if error:
+                health["errors"] += 1
+                health["consecutive_errors"] += 1
+                if health["consecutive_errors"] >= self.failure_threshold:
+                    health["degraded_until"] = time.monotonic() + self.cooldown
+                    health["consecutive_errors"] = 0
+                return
+            health["consecutive_errors"] = 0
+            health["latency"] = seconds if health["latency"] is None else 0.8 * health["latency"] + 0.2 * seconds
+
+    def record_result(self, stage: str, model: str, accepted: bool):
+        """记录一次调用的结果是否可用（请求失败也记为不可用）。"""
+        if model not in self.models:
+            return
+        with self._lock:
+            stats = self._stage_stats(stage, model)
+            stats["attempts"] = stats["attempts"] * self.decay + 1
+            stats["accepted"] = stats["accepted"] * self.decay + (1 if accepted else 0)
+            stats["results"] += 1
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        :return: {"models": 模型 → 请求健康状况（degraded 为是否处于降级冷却期）,
+                  "stages": 阶段 → 模型 → {"chosen", "results", "acceptance", "expected_cost"}}
+        """
+        now = time.monotonic()
+        with self._lock:
+            models = {name: {"calls": health["calls"], "errors": health["errors"], "latency": health["latency"],
+                             "degraded": health["degraded_until"] > now} for name, health in self._health.items()}
+            stages = {}
+            for (stage, model), stats in self._results.items():
+                stages.setdefault(stage, {})[model] = {
+                    "chosen": stats["chosen"], "results": stats["results"],
+                    "acceptance": round(self.acceptance(stage, model), 3), "expected_cost": round(self.expected_cost(stage, model), 3)}
+        return {"models": models, "stages": stages}
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+solver_registry.py
+按元数据名称注册的本地求解 / 校验插件。
+对于可以用确定性算法求解的元数据（例如 8 拼图），答案由本地代码给出，答案检查也由本地代码完成，不再调用 LLM。
+  - SolverPlugin：插件接口。parse 把 (metadata, question) 解析为可哈希的问题实例，无法解析时返回 None（退回 LLM）；
+    solve 求解；verify 校验候选答案；format_answer 按问题要求的格式输出答案。
+  - SOLVER_MODULES：元数据名称 → 插件模块，模块提供 create_solver(table_dir)，首次使用时才导入；
+    也可以用 register_solver 在运行时注册。
+  - SolverPool：在进程池中运行求解，结果按 (插件名称, 问题实例) 做 LRU 缓存；
+    插件的 use_process_pool 为 False（例如已经加载了预计算表）时直接在当前进程中求解。
+"""
+
+import asyncio
+import copy
+import importlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Union
+
+SOLVER_MODULES = {
+    "8_metadata": "utils.eight_puzzle",
+}
+SOLVER_CACHE_SIZE = 100000   # SolverPool 缓存的求解结果数量
+
+
+class SolverPlugin:
+    name = None
+    use_process_pool = True  # 求解是否值得放到进程池中（查表等微秒级的求解应设为 False）
+
+    def parse(self, metadata: Any, question: Any) -> Optional[Hashable]:
+        """把样例解析为可哈希（且可 pickle）的问题实例；无法解析时返回 None，由 LLM 处理。"""
+        raise NotImplementedError
+
+    def solve(self, problem: Hashable) -> Any:
+        """求解问题实例。必须是确定性的，结果会被缓存。"""
+        raise NotImplementedError
+
+    def verify(self, problem: Hashable, answer: Any, solution: Any) -> Optional[bool]:
+        """
+        校验候选答案；无法判断时返回 None，由 LLM 处理。
+        :param solution: solve 的结果（由 SolverPool 求解并缓存）。
+        """
+        return answer == self.format_answer(solution, None)
+
+    def format_answer(self, solution: Any, question: Any) -> Any:
+        """把求解结果转换为样例中的答案；无法按问题要求的格式输出时返回 None（退回 LLM 生成答案）。"""
+        return solution
+
+
+_factories: Dict[str, Union[str, Callable[..., SolverPlugin]]] = dict(SOLVER_MODULES)
+_solvers: Dict[tuple, Optional[SolverPlugin]] = {}
+_solvers_lock = threading.Lock()
+
+
+def register_solver(metadata_name: str, factory: Union[str, Callable[..., SolverPlugin]]):
+    """
+    注册插件。
+    :param factory: 插件模块路径（模块提供 create_solver(table_dir)），或以 table_dir 为参数返回插件的可调用对象。
+    """
+    with _solvers_lock:
+        _factories[metadata_name] = factory
+        for key in [key for key in _solvers if key[0] == metadata_name]:
+            del _solvers[key]
+
+
+def get_solver(metadata_name: str, table_dir: str = None) -> Optional[SolverPlugin]:
+    """
+    返回元数据对应的插件，没有注册时返回 None。
+    :param table_dir: 插件预计算表所在目录（插件自行决定是否使用）。
+    """
+    key = (metadata_name, table_dir)
+    with _solvers_lock:
+        if key not in _solvers:
+            factory = _factories.get(metadata_name, None)
+            if isinstance(factory, str):
+                factory = importlib.import_module(factory).create_solver
+            solver = None if factory is None else factory(table_dir)
+            if solver is not None and solver.name is None:
+                solver.name = metadata_name
+            _solvers[key] = solver
+        return _solvers[key]
+
+
+def _solve_in_worker(plugin: SolverPlugin, problem: Hashable):
+    return plugin.solve(problem)
+
+
+class SolverPool:
+    def __init__(self, max_workers: int = None, cache_size: int = SOLVER_CACHE_SIZE):
+        """
+        :param max_workers: 进程池大小，None 为 CPU 核数。
+        :param cache_size: 缓存的求解结果数量。
+        """
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        self.stats = {"hits": 0, "local": 0, "pool": 0}
+
+    def _get_cached(self, plugin: SolverPlugin, problem: Hashable):
+        key = (plugin.name, problem)
+        with self._lock:
+            if key not in self._cache:
+                return False, None
+            self._cache.move_to_end(key)
+            self.stats["hits"] += 1
+            return True, copy.deepcopy(self._cache[key])
+
+    def _put(self, plugin: SolverPlugin, problem: Hashable, solution: Any):
+        with self._lock:
+            self._cache[(plugin.name, problem)] = copy.deepcopy(solution)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def solve(self, plugin: SolverPlugin, problem: Hashable) -> Any:
+        hit, solution = self._get_cached(plugin, problem)
+        if hit:
+            return solution
+        if plugin.use_process_pool:
+            self.stats["pool"] += 1
+            solution = self._get_executor().submit(_solve_in_worker, plugin, problem).result()
+        else:
+            self.stats["local"] += 1
+            solution = plugin.solve(problem)
+        self._put(plugin, problem, solution)
+        return solution
+
+    async def solve_async(self, plugin: SolverPlugin, problem: Hashable) -> Any:
+        hit, solution = self._get_cached(plugin, problem)
+        if hit:
+            return solution
+        if plugin.use_process_pool:
+            self.stats["pool"] += 1
+            solution = await asyncio.wrap_future(self._get_executor().submit(_solve_in_worker, plugin, problem))
+        else:
+            self.stats["local"] += 1
+            solution = plugin.solve(problem)
+        self._put(plugin, problem, solution)
+        return solution
+
+    def solve_many(self, plugin: SolverPlugin, problems: List[Hashable]) -> List[Any]:
+        """批量求解，未命中缓存的问题实例并行提交到进程池。"""
+        results, pending = [None] * len(problems), {}
+        for i, problem in enumerate(problems):
+            hit, solution = self._get_cached(plugin, problem)
+            if hit:
+                results[i] = solution
+            else:
+                pending.setdefault(problem, []).append(i)
+        if plugin.use_process_pool and len(pending) > 1:
+            executor = self._get_executor()
+            futures = {problem: executor.submit(_solve_in_worker, plugin, problem) for problem in pending}
+            self.stats["pool"] += len(futures)
+            solved = {problem: future.result() for problem, future in futures.items()}
+        else:
+            solved = {problem: self.solve(plugin, problem) for problem in pending}
+        for problem, positions in pending.items():
+            self._put(plugin, problem, solved[problem])
+            for i in positions:
+                results[i] = copy.deepcopy(solved[problem])
+        return results
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_solver_pool() -> SolverPool:
+    """进程内共享的 SolverPool（进程池在第一次需要时才创建）。"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SolverPool()
+        return _pool
@@ -55,23 +55,41 @@ def is_potential_json_string(s: str, strict_startend: bool = False) -> bool:
         return t.startswith("{") or t.startswith("[")
 
 
-def explain_common_error(msg: str) -> str:
+# 常见解析错误的分类与对应提示（按检查顺序）
+COMMON_ERROR_HINTS = {
+    "unquoted_key": "键名应使用双引号（单引号或未加引号会报错）。",
+    "control_character": "字符串中可能包含未转义的控制字符（如换行应写为 \\n）。",
+    "extra_data": "顶层 JSON 后面存在多余内容（可能是多个 JSON 串未用数组包裹）。",
+    "unterminated_string": "字符串未正确闭合（缺少结尾的双引号或转义错误）。",
+    "trailing_comma": "JSON 不允许尾随逗号，请去掉最后一个元素后的逗号。",
+    "empty_or_bom": "文件可能为空、只有 BOM，或以非法字符开头。",
+    "single_quotes": "可能误用了单引号或缺少冒号分隔键值。",
+}
+
+
+def classify_common_error(msg: str) -> List[str]:
+    """把 json.JSONDecodeError 的 msg 归类为 COMMON_ERROR_HINTS 中的若干类别。"""
     m = msg.lower()
-    hints = []
+    classes = []
     if "expecting property name enclosed in double quotes" in m:
-        hints.append("键名应使用双引号（单引号或未加引号会报错）。")
+        classes.append("unquoted_key")
     if "invalid control character" in m:
-        hints.append("字符串中可能包含未转义的控制字符（如换行应写为 \\n）。")
+        classes.append("control_character")
     if "extra data" in m:
-        hints.append("顶层 JSON 后面存在多余内容（可能是多个 JSON 串未用数组包裹）。")
+        classes.append("extra_data")
     if "unterminated string" in m:
-        hints.append("字符串未正确闭合（缺少结尾的双引号或转义错误）。")
+        classes.append("unterminated_string")
     if "trailing comma" in m:
-        hints.append("JSON 不允许尾随逗号，请去掉最后一个元素后的逗号。")
+        classes.append("trailing_comma")
     if "expecting value" in m and "line 1 column 1" in m:
-        hints.append("文件可能为空、只有 BOM，或以非法字符开头。")
+        classes.append("empty_or_bom")
     if "single quotes" in m or "expecting ':' delimiter" in m:
-        hints.append("可能误用了单引号或缺少冒号分隔键值。")
+        classes.append("single_quotes")
+    return classes
+
+
+def explain_common_error(msg: str) -> str:
+    hints = [COMMON_ERROR_HINTS[c] for c in classify_common_error(msg)]
     if hints:
         return "可能原因：" + "；".join(hints)
     return ""
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+variable_space.py
+泛化性变量（min / max / step）张成的参数空间及其采样。
+每个变量取 min, min+step, …, ≤max 共 n_i 个取值（下称“档位”），空间中的一个点是各变量档位组成的向量，
+按混合进制（最后一个变量变化最快）编号为 0 … size-1。组合数可以达到数百万甚至更多，所有方法都只按需生成，
+不展开整个空间：
+  - grid：按编号分块枚举；
+  - random：均匀随机；
+  - lhs：拉丁超立方，每个变量的 n 个样本分别落在 n 个等宽分层中；
+  - sobol：Sobol 低差异序列（带随机数字移位），超过内置方向数的维度用拉丁超立方补齐；
+  - stratified：把每个变量分为 k 段（k^d 不超过样本数），每个单元格内均匀抽取相同数量的样本。
+CoverageTracker 记录已有样例的具体取值和粗粒度单元格（每个变量最多 bins 段），用于统计覆盖率并在采样时跳过已覆盖的取值。
+"""
+
+import itertools
+import json
+import math
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_BATCH = 10000        # grid 每块的点数
+COVERAGE_BINS = 10           # 覆盖率统计中每个变量最多划分的段数
+SOBOL_BITS = 32
+# Sobol 方向数（Joe & Kuo, new-joe-kuo-6.21201 的前 20 行）：(s, a, m_1 … m_s)，第 1 维为 van der Corput 序列
+SOBOL_DIRECTIONS = [
+    (1, 0, (1,)),
+    (2, 1, (1, 3)),
+    (3, 1, (1, 3, 1)),
+    (3, 2, (1, 1, 1)),
+    (4, 1, (1, 1, 3, 3)),
+    (4, 4, (1, 3, 5, 13)),
+    (5, 2, (1, 1, 5, 5, 17)),
+    (5, 4, (1, 1, 5, 5, 5)),
+    (5, 7, (1, 1, 7, 11, 19)),
+    (5, 11, (1, 1, 5, 1, 1)),
+    (5, 13, (1, 1, 1, 3, 11)),
+    (5, 14, (1, 3, 5, 5, 31)),
+    (6, 1, (1, 3, 3, 9, 7, 49)),
+    (6, 13, (1, 1, 1, 15, 21, 21)),
+    (6, 16, (1, 3, 1, 13, 27, 49)),
+    (6, 19, (1, 1, 1, 15, 7, 5)),
+    (6, 22, (1, 3, 1, 15, 13, 25)),
+    (6, 25, (1, 1, 5, 5, 19, 61)),
+    (7, 1, (1, 3, 7, 11, 23, 15, 103)),
+    (7, 4, (1, 3, 7, 13, 13, 15, 69)),
+]
+
+
+def _as_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _is_integral(value: float) -> bool:
+    return float(value).is_integer()
+
+
+def assignment_key(assignment: Dict[str, Any]) -> str:
+    """变量取值字典的规范化键（按变量名排序，整数值的浮点数按整数处理）。"""
+    normalized = {}
+    for name, value in assignment.items():
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        normalized[str(name)] = value
+    return json.dumps(normalized, ensure_ascii=False, sort_keys=True)
+
+
+def sobol_directions(dims: int, bits: int = SOBOL_BITS) -> np.ndarray:
+    """前 dims 维的 Sobol 方向数，形状 (dims, bits)。"""
+    directions = np.zeros((dims, bits), dtype=np.uint64)
+    directions[0] = [1 << (bits - 1 - k) for k in range(bits)]
+    for dim in range(1, dims):
+        s, a, m = SOBOL_DIRECTIONS[dim - 1]
+        v = [0] * (bits + 1)
+        for k in range(1, bits + 1):
+            if k <= s:
+                v[k] = m[k - 1] << (bits - k)
+            else:
+                v[k] = v[k - s] ^ (v[k - s] >> s)
+                for j in range(1, s):
+                    if (a >> (s - 1 - j)) & 1:
+                        v[k] ^= v[k - j]
+        directions[dim] = v[1:]
+    return directions
+
+
+def sobol_points(n: int, dims: int, skip: int = 0, seed: Optional[int] = None) -> np.ndarray:
+    """
+    Sobol 序列第 skip … skip+n-1 个点（灰码顺序），形状 (n, dims)，取值在 [0, 1)。
+    :param seed: 不为 None 时对每一维做随机数字移位（异或同一个随机整数），保持低差异性质。
+    """
+    directions = sobol_directions(dims)
+    index = np.arange(skip, skip + n, dtype=np.uint64)
+    gray = index ^ (index >> np.uint64(1))
+    points = np.zeros((n, dims), dtype=np.uint64)
+    # 只需处理到所有灰码中的最高位；中间某一位在窗口内全为 0 时不能提前结束
+    top = int(gray.max()).bit_length() if n else 0
+    for bit in range(min(top, SOBOL_BITS)):
+        mask = ((gray >> np.uint64(bit)) & np.uint64(1)).astype(bool)
+        if mask.any():
+            points[mask] ^= directions[:, bit]
+    if seed is not None:
+        shift = np.random.default_rng(seed).integers(0, 1 << SOBOL_BITS, size=dims, dtype=np.uint64)
+        points ^= shift
+    return points.astype(np.float64) / float(1 << SOBOL_BITS)
+
+
+class VariableSpace:
+    def __init__(self, variables: List[Dict[str, Any]]):
+        """
+        :param variables: 泛化性变量列表（MetadataAgent.variable 的格式）。min / max / step 不是数字、
+                          step 不为正或 max < min 的变量记录在 skipped 中，不参与采样。
+        """
+        self.names = []
+        self.skipped = []
+        mins, steps, counts, integral = [], [], [], []
+        for param in variables:
+            low, high, step = (_as_number(param.get(key)) for key in ("min", "max", "step"))
+            if low is None or high is None or step is None or step <= 0 or high < low:
+                self.skipped.append(param.get("name"))
+                continue
+            self.names.append(param.get("name"))
+            mins.append(low)
+            steps.append(step)
+            counts.append(int(math.floor((high - low) / step + 1e-9)) + 1)
+            integral.append(_is_integral(low) and _is_integral(step))
+        self.mins = np.array(mins, dtype=np.float64)
+        self.steps = np.array(steps, dtype=np.float64)
+        self.counts = np.array(counts, dtype=np.int64)      # 每个变量的档位数
+        self.integral = integral
+        self.dims = len(self.names)
+        self.size = math.prod(counts) if counts else 0     # 组合总数（Python 整数，不会溢出）
+        # 混合进制的位权，最后一个变量变化最快
+        self._radix = [math.prod(counts[i + 1:]) for i in range(self.dims)]
+        self._fits_int64 = self.size < (1 << 63)
+        self._sobol_next = 0
+
+    def __len__(self):
+        return self.size
+
+    # ---------- 编号与取值 ----------
+    def decode(self, indices) -> np.ndarray:
+        """编号 → 档位，返回形状 (n, dims) 的 int64 数组。"""
+        if self._fits_int64:
+            rest = np.asarray(indices, dtype=np.int64)
+        else:
+            rest = np.array([int(i) for i in indices], dtype=object)
+        levels = np.empty((len(rest), self.dims), dtype=np.int64)
+        for dim in range(self.dims):
+            levels[:, dim] = rest // self._radix[dim]
+            rest = rest % self._radix[dim]
+        return levels
+
+    def encode(self, levels: np.ndarray) -> List[int]:
+        """档位 → 编号（Python 整数列表）。"""
+        levels = np.asarray(levels, dtype=np.int64).reshape(-1, self.dims)
+        if self._fits_int64:
+            return (levels * np.array(self._radix, dtype=np.int64)).sum(axis=1).tolist()
+        return [sum(int(level) * radix for level, radix in zip(row, self._radix)) for row in levels]
+
+    def values(self, levels: np.ndarray) -> np.ndarray:
+        """档位 → 取值，形状 (n, dims) 的 float64 数组。"""
+        return np.round(self.mins + np.asarray(levels, dtype=np.float64) * self.steps, 10)
+
+    def assignments(self, levels: np.ndarray) -> List[Dict[str, Any]]:
+        """档位 → 变量赋值字典列表（min 与 step 都是整数的变量取 int）。"""
+        result = []
+        for row in self.values(levels).tolist():
+            result.append({name: int(value) if integral else value for name, value, integral in zip(self.names, row, self.integral)})
+        return result
+
+    def levels_of(self, assignments: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        变量赋值 → 档位。缺少变量、取值不是数字、不在 min/max 范围或不在步长网格上的赋值被丢弃。
+        :return: 形状 (m, dims) 的 int64 数组。
+        """
+        rows = []
+        for assignment in assignments:
+            row = [_as_number(assignment.get(name)) if isinstance(assignment, dict) else None for name in self.names]
+            if None not in row:
+                rows.append(row)
+        if not rows or not self.dims:
+            return np.empty((0, self.dims), dtype=np.int64)
+        exact = (np.array(rows, dtype=np.float64) - self.mins) / self.steps
+        levels = np.rint(exact)
+        valid = (np.abs(exact - levels) < 1e-6).all(axis=1) & (levels >= 0).all(axis=1) & (levels < self.counts).all(axis=1)
+        return levels[valid].astype(np.int64)
+
+    # ---------- 采样 ----------
+    def grid(self, start: int = 0, stop: Optional[int] = None, batch_size: int = DEFAULT_BATCH) -> Iterator[np.ndarray]:
+        """按编号顺序分块枚举 [start, stop) 内的全部组合，每块为形状 (≤batch_size, dims) 的档位数组。"""
+        stop = self.size if stop is None else min(stop, self.size)
+        for begin in range(start, stop, batch_size):
+            end = min(begin + batch_size, stop)
+            yield self.decode(np.arange(begin, end, dtype=np.int64) if self._fits_int64 else range(begin, end))
+
+    def random(self, n: int, seed: Optional[int] = None) -> np.ndarray:
+        """均匀随机抽取 n 个组合（可能重复）。"""
+        rng = np.random.default_rng(seed)
+        return rng.integers(0, self.counts, size=(n, self.dims), dtype=np.int64)
+
+    def lhs(self, n: int, seed: Optional[int] = None) -> np.ndarray:
+        """拉丁超立方：每个变量的 n 个样本分别落在 [0,1) 的 n 个等宽分层中，各变量的分层顺序独立打乱。"""
+        rng = np.random.default_rng(seed)
+        strata = rng.permuted(np.tile(np.arange(n), (self.dims, 1)), axis=1).T
+        return self._to_levels((strata + rng.random((n, self.dims))) / n)
+
+    def sobol(self, n: int, seed: Optional[int] = None, skip: Optional[int] = None) -> np.ndarray:
+        """
+        Sobol 低差异序列。连续调用时从上次结束的位置继续（skip 为 None 时），因此多次取点合起来仍是低差异的。
+        维度超过内置方向数时，其余维度用拉丁超立方补齐。
+        """
+        if skip is None:
+            skip, self._sobol_next = self._sobol_next, self._sobol_next + n
+        sobol_dims = min(self.dims, len(SOBOL_DIRECTIONS) + 1)
+        unit = sobol_points(n, sobol_dims, skip=skip, seed=seed)
+        if sobol_dims < self.dims:
+            rng = np.random.default_rng(seed)
+            extra = self.dims - sobol_dims
+            strata = rng.permuted(np.tile(np.arange(n), (extra, 1)), axis=1).T
+            unit = np.hstack([unit, (strata + rng.random((n, extra))) / n])
+        return self._to_levels(unit)
+
+    def stratified(self, n: int, seed: Optional[int] = None) -> np.ndarray:
+        """
+        分层抽样：每个变量分为 k 段（不超过其档位数，且单元格总数 ≤ n），
+        每个单元格先抽 n // 单元格数 个样本，余下的样本随机分配到不同的单元格。
+        """
+        rng = np.random.default_rng(seed)
+        if self.dims == 0 or n <= 0:
+            return np.empty((0, self.dims), dtype=np.int64)
+        k = max(1, int(math.floor(n ** (1.0 / self.dims) + 1e-9)))
+        strata = np.minimum(self.counts, k)
+        cells = int(np.prod(strata))
+        per_cell, extra = divmod(n, cells)
+        cell_ids = np.concatenate([np.repeat(np.arange(cells), per_cell), rng.choice(cells, size=extra, replace=False)])
+        # 单元格编号 → 各变量的段号
+        segment = np.empty((len(cell_ids), self.dims), dtype=np.int64)
+        rest = cell_ids
+        for dim in range(self.dims - 1, -1, -1):
+            segment[:, dim] = rest % strata[dim]
+            rest = rest // strata[dim]
+        low = segment * self.counts // strata
+        high = (segment + 1) * self.counts // strata
+        levels = low + np.floor(rng.random(low.shape) * (high - low)).astype(np.int64)
+        return levels[rng.permutation(len(levels))]
+
+    def sample(self, n: int, method: str = "lhs", seed: Optional[int] = None,
+               coverage: Optional["CoverageTracker"] = None, max_rounds: int = 20) -> np.ndarray:
+        """
+        抽取 n 个互不相同的组合，coverage 不为 None 时跳过已覆盖的具体取值。
+        随机类方法按需多抽几轮补足，grid 按编号顺序跳过已覆盖的组合；空间不足时返回的数量少于 n。
+        :param method: grid / random / lhs / sobol / stratified。
+        """
+        if self.dims == 0 or n <= 0:
+            return np.empty((0, self.dims), dtype=np.int64)
+        seen = set()
+        chosen = []
+
+        def take(levels):
+            for index, row in zip(self.encode(levels), levels):
+                if len(chosen) >= n:
+                    return
+                if index in seen or (coverage is not None and coverage.is_covered_index(index)):
+                    continue
+                seen.add(index)
+                chosen.append(row)
+
+        if method == "grid":
+            for block in self.grid():
+                take(block)
+                if len(chosen) >= n:
+                    break
+        else:
+            draw = {"random": self.random, "lhs": self.lhs, "sobol": self.sobol, "stratified": self.stratified}.get(method)
+            if draw is None:
+                raise ValueError(f"未知的采样方法：{method}")
+            rng = np.random.default_rng(seed)
+            for _ in range(max_rounds):
+                missing = n - len(chosen)
+                if missing <= 0 or len(seen) + (len(coverage) if coverage is not None else 0) >= self.size:
+                    break
+                take(draw(max(missing, 1) * (2 if chosen else 1), seed=int(rng.integers(1 << 31))))
+        if not chosen:
+            return np.empty((0, self.dims), dtype=np.int64)
+        return np.array(chosen, dtype=np.int64)
+
+    def _to_levels(self, unit: np.ndarray) -> np.ndarray:
+        return np.minimum(np.floor(unit * self.counts).astype(np.int64), self.counts - 1)
+
+
+class CoverageTracker:
+    def __init__(self, space: VariableSpace, bins: int = COVERAGE_BINS):
+        """
+        :param space: 参数空间。
+        :param bins: 粗粒度单元格中每个变量最多划分的段数（档位数更少时按档位划分）。
+        """
+        self.space = space
+        self.bins = np.minimum(space.counts, bins) if space.dims else np.empty(0, dtype=np.int64)
+        self.total_cells = math.prod(int(b) for b in self.bins) if space.dims else 0
+        self._indices = set()          # 已覆盖的具体取值（编号）
+        self._cells = {}               # 单元格（各变量的段号）-> 样例数
+        self._marginal = [np.zeros(int(b), dtype=np.int64) for b in self.bins]
+
+    def __len__(self):
+        return len(self._indices)
+
+    def add(self, levels: np.ndarray) -> int:
+        """记录一批档位，返回其中新覆盖的具体取值数量。"""
+        levels = np.asarray(levels, dtype=np.int64).reshape(-1, self.space.dims)
+        if not len(levels):
+            return 0
+        before = len(self._indices)
+        self._indices.update(self.space.encode(levels))
+        segments = levels * self.bins // self.space.counts
+        for dim, counts in enumerate(self._marginal):
+            counts += np.bincount(segments[:, dim], minlength=len(counts))
+        for cell in map(tuple, segments.tolist()):
+            self._cells[cell] = self._cells.get(cell, 0) + 1
+        return len(self._indices) - before
+
+    def add_assignments(self, assignments: List[Dict[str, Any]]) -> int:
+        """记录一批变量赋值（无法对应到档位的赋值被忽略）。"""
+        return self.add(self.space.levels_of(assignments))
+
+    def is_covered_index(self, index: int) -> bool:
+        return index in self._indices
+
+    def is_covered(self, levels: np.ndarray) -> np.ndarray:
+        """每个组合是否已经覆盖。"""
+        return np.array([index in self._indices for index in self.space.encode(levels)], dtype=bool)
+
+    def uncovered_cells(self, limit: int = 100) -> List[Dict[str, Tuple[Any, Any]]]:
+        """最多 limit 个尚无样例的单元格，每个单元格给出各变量的取值范围 (下界, 上界)。"""
+        result = []
+        # 已覆盖的单元格不超过样例数，因此最多检查 limit + 样例数 个单元格
+        for cell in itertools.product(*(range(int(b)) for b in self.bins)):
+            if len(result) >= limit:
+                break
+            if cell in self._cells:
+                continue
+            segment = np.array(cell, dtype=np.int64)
+            low = segment * self.space.counts // self.bins
+            high = (segment + 1) * self.space.counts // self.bins - 1
+            lows, highs = self.space.assignments(low[None])[0], self.space.assignments(high[None])[0]
+            result.append({name: (lows[name], highs[name]) for name in self.space.names})
+        return result
+
+    def summary(self) -> Dict[str, Any]:
+        """覆盖率统计：具体取值数、单元格覆盖率以及每个变量各段的覆盖率。"""
+        return {
+            "assignments": len(self._indices),
+            "space_size": self.space.size,
+            "cells_covered": len(self._cells),
+            "cells_total": self.total_cells,
+            "cell_coverage": len(self._cells) / self.total_cells if self.total_cells else 0.0,
+            "marginal": {name: float((counts > 0).mean()) for name, counts in zip(self.space.names, self._marginal)},
+            "skipped_variables": self.space.skipped,
+        }
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+verification_memo.py
+基于 SQLite 的答案检查结论备忘录。
+键为 (模型名称, 基本常量, metadata, question, answer) 各自的 SHA-256 指纹，值为 _check_answer 的结论。
+常量或样例任意一部分改变后指纹不同，对应的样例需要重新检查；其余样例直接复用结论，
+因此重新检查的调用次数只与改动的样例数量成正比。多个进程可以安全地共享同一个文件（WAL 模式）。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+def fingerprint(value: Any) -> str:
+    """值的指纹：字符串直接取摘要，其他值按排序键的 JSON 取摘要。"""
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+class VerificationMemo:
+    def __init__(self, path: str):
+        """:param path: SQLite 文件路径。"""
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            " model TEXT NOT NULL,"
+            " constant_hash TEXT NOT NULL,"
+            " metadata_hash TEXT NOT NULL,"
+            " question_hash TEXT NOT NULL,"
+            " answer_hash TEXT NOT NULL,"
+            " verdict INTEGER NOT NULL,"
+            " checked_at REAL NOT NULL,"
+            " PRIMARY KEY (model, constant_hash, metadata_hash, question_hash, answer_hash))"
+        )
+
+    @staticmethod
+    def make_key(model_name: str, constant: Any, metadata: Any, question: Any, answer: Any) -> tuple:
+        return (model_name, fingerprint(constant), fingerprint(metadata), fingerprint(question), fingerprint(answer))
+
+    def get(self, model_name: str, constant: Any, metadata: Any, question: Any, answer: Any) -> Optional[bool]:
+        """读取检查结论，没有记录时返回 None。"""
+        key = self.make_key(model_name, constant, metadata, question, answer)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT verdict FROM verdicts WHERE model = ? AND constant_hash = ? AND metadata_hash = ? AND question_hash = ? AND answer_hash = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return bool(row[0])
+
+    def put(self, model_name: str, constant: Any, metadata: Any, question: Any, answer: Any, verdict: bool):
+        """写入（或覆盖）一条检查结论。"""
+        key = self.make_key(model_name, constant, metadata, question, answer)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?, ?)", key + (int(bool(verdict)), time.time()))
+
+    def delete_constant(self, model_name: str, constant: Any) -> int:
+        """删除某个常量下的全部结论，返回删除的条数。"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM verdicts WHERE model = ? AND constant_hash = ?", (model_name, fingerprint(constant)))
+            return cursor.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM verdicts")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()